@@ -0,0 +1,62 @@
+"""Compara a quantidade de conexões HTTP (e, portanto, de handshakes TLS) abertas com um transporte por cliente, como
+nas versões anteriores, e com o pool de conexões compartilhado por servidor.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_connections.py [threads] [operacoes_por_thread]
+
+Cada thread consulta a atividade atual, carrega o formulário e atualiza um campo, utilizando os três serviços do ECM,
+contra o servidor ECM falso executado localmente.
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from zeep import Client
+from zeep.transports import Transport
+
+from totvsecm import SoapService as soap_module
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import ClientRegistry
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+class RegistroAnterior(ClientRegistry):
+    """Registro das versões anteriores, em que cada cliente possui seu próprio transporte e sua própria sessão HTTP."""
+
+    def _create_client(self, server, service_name):
+        return Client(self.wsdl_url(server, service_name), transport=Transport(cache=self._wsdl_cache(server)))
+
+
+def executar(url, threads, operacoes):
+    def operar(i):
+        for _ in range(operacoes):
+            service = BaseService(url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+            service.atividade_atual
+            service.carregar_solicitacao()
+            service.atualizar_formulario({'campo1': 'alterado %d' % i})
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(operar, range(threads)))
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    operacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print('%d threads, %d operações por thread' % (threads, operacoes))
+    for nome, registro in (('anterior', RegistroAnterior()), ('compartilhado', ClientRegistry())):
+        with FakeEcmServer() as server, patch.object(soap_module, 'registry', registro):
+            server.ecm.active_states[1] = [1]
+            server.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+            server.ecm.card_data[1] = {'campo%d' % i: 'valor %d' % i for i in range(20)}
+            inicio = time.perf_counter()
+            executar(server.url, threads, operacoes)
+            duracao = time.perf_counter() - inicio
+            print('%-14s %5d conexões  %6.2f s' % (nome, server.connections, duracao))
+            registro.clear()
+
+
+if __name__ == '__main__':
+    main()
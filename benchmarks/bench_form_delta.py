@@ -0,0 +1,56 @@
+"""Compara o tamanho e a latência do envio do formulário completo e apenas dos campos alterados em movimentar.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_form_delta.py [campos] [tamanho_kb] [repeticoes]
+
+O formulário possui campos de texto rico do tamanho informado, e apenas um campo é alterado em cada movimentação.
+"""
+
+import statistics
+import sys
+import time
+
+from totvsecm.BaseService import BaseService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def movimentar_completo(service, origem, destino, **campos_atualizar):
+    """Movimentação das versões anteriores, que enviava o formulário completo."""
+    service.carregar_solicitacao()
+    if service.atividade_atual[0] != origem:
+        raise Exception('O processo não está na atividade de origem esperada.')
+    formulario = dict(service.formulario, **campos_atualizar)
+    service.atualizar_formulario(formulario)
+    return service.avancar(destino, manager_mode=True)
+
+
+def movimentar_alteracoes(service, origem, destino, **campos_atualizar):
+    return service.movimentar(origem, destino, **campos_atualizar)
+
+
+def main():
+    campos = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    tamanho = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    repeticoes = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with FakeEcmServer() as server:
+        ecm = server.ecm
+        ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        ecm.card_data[1] = {'campo%d' % i: '<p>%s</p>' % ('x' * 1024 * tamanho) for i in range(campos)}
+        print('%d campos de %d KB' % (campos, tamanho))
+
+        for nome, movimentar in (('completo', movimentar_completo), ('alteracoes', movimentar_alteracoes)):
+            latencias = []
+            for i in range(repeticoes):
+                ecm.active_states[1] = [1]
+                service = BaseService(server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+                inicio = time.perf_counter()
+                movimentar(service, 1, 5, campo0='<p>alterado %d</p>' % i)
+                latencias.append(time.perf_counter() - inicio)
+            enviado = len(ecm.requests[len(ecm.calls) - 1 - ecm.calls[::-1].index('updateCardData')])
+            print('%-10s updateCardData %8.1f KB  movimentar p50 %6.1f ms' % (
+                nome, enviado / 1024, statistics.median(latencias) * 1000))
+
+
+if __name__ == '__main__':
+    main()
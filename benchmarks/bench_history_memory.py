@@ -0,0 +1,82 @@
+"""Compara a memória ocupada pelos históricos tratados como dicionários, como registros e em colunas.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_history_memory.py [quantidade_solicitacoes] [tarefas_por_solicitacao]
+
+Os históricos são gerados localmente, no formato retornado pelo zeep, e a memória é medida com tracemalloc.
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from totvsecm.BaseService import BaseService
+from totvsecm.Records import HistoricoColunar
+
+
+def gerar_historicos(quantidade, tarefas):
+    """Gera os históricos das solicitações, com poucos responsáveis repetidos, como nos históricos reais."""
+    responsaveis = ['usuario%d' % i for i in range(50)]
+    return [[SimpleNamespace(tasks=[SimpleNamespace(
+        taskCompletionDate=datetime(2020, 1, 1) + timedelta(days=i), taskCompletionHour=3600 * 8 + i,
+        choosedSequence=str(i % 20), taskObservation='Observação da tarefa %d' % i,
+        colleagueId=responsaveis[(numero + i) % 50],
+        historCompleteColleague='Usuário %d\nEnviada para %d' % ((numero + i) % 50, i % 20))])
+        for i in range(tarefas)] for numero in range(quantidade)]
+
+
+def tratar_como_dicionarios(historico):
+    """Tratamento do histórico das versões anteriores, com um dicionário por tarefa."""
+    rs = list()
+    for etapa in historico:
+        for task in etapa.tasks:
+            data_hora = task.taskCompletionDate + timedelta(seconds=task.taskCompletionHour) \
+                if task.taskCompletionDate else None
+            data_hora_formatada = data_hora.strftime('%d/%m/%Y %H:%M') if task.taskCompletionDate \
+                else u'Tarefa não finalizada'
+            rs.append({
+                'data_hora': data_hora,
+                'data_hora_formatada': data_hora_formatada,
+                'proxima_atividade': int(task.choosedSequence),
+                'observacao': task.taskObservation,
+                'colleague_id': task.colleagueId,
+                'texto': task.historCompleteColleague,
+                'nome_responsavel': task.historCompleteColleague.split('\n')[0]
+            })
+    return rs
+
+
+def colunas(historicos):
+    rs = HistoricoColunar()
+    for numero, historico in enumerate(historicos):
+        rs.adicionar(numero, historico)
+    return rs
+
+
+def medir(nome, funcao, historicos):
+    """Executa o tratamento e imprime o tempo e a memória retida pelo resultado."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao(historicos)
+    duracao = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-12s %8.1f MB %8.2f s' % (nome, memoria / 1024 / 1024, duracao))
+    return resultado
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tarefas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    historicos = gerar_historicos(quantidade, tarefas)
+    print('%d solicitações com %d tarefas' % (quantidade, tarefas))
+    medir('dicionarios', lambda hs: [tratar_como_dicionarios(h) for h in hs], historicos)
+    medir('registros', lambda hs: [BaseService._tratar_historico(h) for h in hs], historicos)
+    medir('colunas', colunas, historicos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Mede o tempo de importação dos módulos da biblioteca, no formato do relatório de python -X importtime.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_import.py [modulo ...] [--repeticoes 5] [--maior 15] [--limite 50]
+
+Cada módulo é importado num interpretador novo. O relatório mostra a mediana do tempo total de importação, os módulos
+mais pesados da última execução e as dependências pesadas (zeep, lxml, requests e httpx) carregadas na importação. Com
+--limite, o comando termina com erro se algum módulo demorar mais que o limite, em milissegundos.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULOS = ('totvsecm', 'totvsecm.BaseService', 'totvsecm.AsyncBaseService')
+DEPENDENCIAS = ('zeep', 'lxml', 'requests', 'httpx')
+
+
+def importar(modulo):
+    """Importa o módulo num interpretador novo, retornando as linhas do relatório e as dependências carregadas.
+
+    Returns:
+        tuple: Tempo acumulado do módulo e lista de (próprio, acumulado, nome) dos módulos importados por ele, em
+            microssegundos, e as dependências pesadas carregadas.
+    """
+    codigo = 'import sys, %s; print(" ".join(m for m in %r if m in sys.modules))' % (modulo, DEPENDENCIAS)
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], capture_output=True, text=True,
+                              check=True)
+    linhas = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        if nome.strip() == modulo:
+            # O relatório é emitido ao fim de cada importação: as linhas anteriores mais indentadas, desde a última
+            # importação de primeiro nível (como as do site), são os módulos importados pelo próprio módulo.
+            return int(acumulado), linhas + [(int(proprio), int(acumulado), nome.rstrip())], processo.stdout.split()
+        if nome.startswith('  '):
+            linhas.append((int(proprio), int(acumulado), nome.rstrip()))
+        else:
+            linhas = []
+    raise ValueError('O módulo %s não consta do relatório de importação.' % modulo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de importação dos módulos da biblioteca.')
+    parser.add_argument('modulos', nargs='*', help='Módulos importados: %s (padrão).' % ', '.join(MODULOS))
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--maior', type=int, default=15, help='Quantidade de módulos mais pesados exibidos.')
+    parser.add_argument('--limite', type=float, help='Tempo máximo de importação de cada módulo, em ms.')
+    args = parser.parse_args()
+
+    excedidos = []
+    for modulo in args.modulos or MODULOS:
+        totais = []
+        for _ in range(args.repeticoes):
+            total, linhas, dependencias = importar(modulo)
+            totais.append(total)
+        total = statistics.median(totais) / 1000
+        print('%s: %.1f ms (mínimo %.1f ms), dependências carregadas: %s' % (
+            modulo, total, min(totais) / 1000, ', '.join(dependencias) or 'nenhuma'))
+        print('%12s %12s  %s' % ('próprio', 'acumulado', 'módulo'))
+        for proprio, acumulado, nome in sorted(linhas, key=lambda linha: linha[1], reverse=True)[:args.maior]:
+            print('%9.1f ms %9.1f ms  %s' % (proprio / 1000, acumulado / 1000, nome))
+        print()
+        if args.limite is not None and total > args.limite:
+            excedidos.append(modulo)
+
+    if excedidos:
+        print('Acima do limite de %.1f ms: %s' % (args.limite, ', '.join(excedidos)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
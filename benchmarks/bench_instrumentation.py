@@ -0,0 +1,54 @@
+"""Mede o custo da instrumentação por chamada, desativada e com as métricas agregadas, e mostra as fases de cada
+operação de um movimentar.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_instrumentation.py [chamadas]
+
+As chamadas são feitas contra o servidor ECM falso executado localmente.
+"""
+
+import sys
+import time
+
+from totvsecm.BaseService import BaseService
+from totvsecm.Instrumentation import Metricas, instrumentacao
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def medir(service, chamadas):
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        service.get_all_active_states(1)
+    return (time.perf_counter() - inicio) / chamadas
+
+
+def main():
+    chamadas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with FakeEcmServer() as server:
+        server.ecm.active_states[1] = [1]
+        server.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        server.ecm.card_data[1] = {'campo%d' % i: 'valor %d' % i for i in range(200)}
+        service = WorkflowEngineService(server.url, 'yoda', 'senha', 1, 'yoda')
+        medir(service, 100)
+
+        desativada = medir(service, chamadas)
+        with instrumentacao.coletando(Metricas()):
+            ativa = medir(service, chamadas)
+        print('%d chamadas: desativada %.0f us/chamada, ativa %.0f us/chamada (%+.1f%%)' % (
+            chamadas, desativada * 1e6, ativa * 1e6, (ativa / desativada - 1) * 100))
+
+        metricas = Metricas()
+        with instrumentacao.coletando(metricas):
+            BaseService(server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1).movimentar(1, 5, campo1='novo')
+        print('\nmovimentar: %d chamadas' % metricas.chamadas)
+        print('%-24s %8s %8s %8s %8s %9s' % ('operação', 'serial.', 'rede', 'interp.', 'enviado', 'recebido'))
+        for (_, operacao), totais in metricas.resumo().items():
+            print('%-24s %6.1fms %6.1fms %6.1fms %7dB %8dB' % (
+                operacao, totais['serializacao'] * 1000, totais['rede'] * 1000, totais['interpretacao'] * 1000,
+                totais['bytes_enviados'], totais['bytes_recebidos']))
+
+
+if __name__ == '__main__':
+    main()
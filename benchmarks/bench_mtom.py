@@ -0,0 +1,99 @@
+"""Compara a vazão e o pico de memória da transferência de anexos e documentos em base64 e com MTOM/XOP.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_mtom.py [--tamanho 6] [--repeticoes 3]
+
+O servidor ECM falso, com suporte a MTOM/XOP anunciado no WSDL, é executado em outro processo. Para cada modo são
+medidos o envio de um anexo já lido com iniciar_solicitacao e o recebimento de um documento com get_document_content:
+a mediana da vazão, em MB/s, e o pico das alocações do Python no cliente, medido com tracemalloc. Em base64, o zeep
+não interpreta respostas com mais de 10 MB de texto num único elemento, o que limita o tamanho a cerca de 7 MB.
+"""
+
+import argparse
+import os
+import statistics
+import time
+import tracemalloc
+from multiprocessing import Process, Queue
+
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import registry
+from totvsecm.DocumentService import DocumentService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+DOCUMENTO = 10
+
+
+def servir(fila, tamanho):
+    with FakeEcmServer(mtom=True) as server:
+        server.ecm.documents[DOCUMENTO] = (1000, 'documento.bin', os.urandom(tamanho))
+        fila.put(server.url)
+        server.thread.join()
+
+
+def medir(funcao, repeticoes):
+    """Executa a função, retornando a mediana da duração, em segundos, e o pico das alocações, em bytes.
+
+    O pico é medido numa execução à parte, para que o rastreamento das alocações não afete as durações.
+    """
+    duracoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        duracoes.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcao()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(duracoes), pico
+
+
+def executar(url, conteudo, repeticoes, mtom):
+    """Mede o envio e o recebimento no modo informado, retornando uma linha do relatório por caso."""
+    registry.clear()
+    registry.configure(mtom=mtom)
+    servico = BaseService(url, 'yoda', 'senha', 'yoda', id_processo='benchmark')
+    documentos = DocumentService(url, 'yoda', 'senha', 1, 'yoda')
+
+    def enviar():
+        servico.iniciar_solicitacao({'campo': 'valor'}, ['yoda'], 'Benchmark',
+                                    anexos={'anexo.bin': {'description': 'Anexo', 'content': conteudo}})
+
+    def receber():
+        assert len(documentos.get_document_content(DOCUMENTO, 'yoda', 1000, 'documento.bin')) == len(conteudo)
+
+    # A primeira execução cria os clientes e verifica o suporte a MTOM/XOP no WSDL.
+    enviar()
+    receber()
+    modo = 'mtom' if mtom else 'base64'
+    linhas = []
+    for caso, funcao in (('envio', enviar), ('recebimento', receber)):
+        duracao, pico = medir(funcao, repeticoes)
+        linhas.append('%-7s %-12s %10.1f MB/s %10.1f MB de pico' % (modo, caso, len(conteudo) / duracao / 2 ** 20,
+                                                                    pico / 2 ** 20))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanho', type=int, default=6, help='Tamanho do anexo e do documento, em MB.')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Quantidade de execuções de cada caso.')
+    args = parser.parse_args()
+
+    tamanho = args.tamanho * 2 ** 20
+    fila = Queue()
+    servidor = Process(target=servir, args=(fila, tamanho), daemon=True)
+    servidor.start()
+    url = fila.get()
+
+    conteudo = os.urandom(tamanho)
+    print('Anexo e documento de %d MB, %d repetições' % (args.tamanho, args.repeticoes))
+    for mtom in (False, True):
+        for linha in executar(url, conteudo, args.repeticoes, mtom):
+            print(linha)
+
+    servidor.terminate()
+
+
+if __name__ == '__main__':
+    main()
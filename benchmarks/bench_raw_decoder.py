@@ -0,0 +1,59 @@
+"""Compara a decodificação das respostas de getHistories e getInstanceCardData pelo zeep e diretamente do XML.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_raw_decoder.py [tarefas] [campos] [repeticoes]
+
+As respostas são obtidas uma única vez do servidor ECM falso, e apenas a decodificação é medida.
+"""
+
+import sys
+import time
+
+from totvsecm.BaseService import BaseService
+from totvsecm.RawDecoder import decode_card_data, decode_histories
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+
+
+def medir(funcao, repeticoes):
+    """Retorna o menor tempo de execução da função, em segundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    tarefas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    campos = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    repeticoes = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    with FakeEcmServer() as server:
+        server.ecm.histories[1] = history([(i % 20, 'usuario%d' % (i % 50), 'Observação %d' % i)
+                                           for i in range(tarefas)])
+        server.ecm.card_data[1] = {'campo%d' % i: 'valor do campo %d' % i for i in range(campos)}
+        service = WorkflowEngineService(server.url, 'yoda', 'senha', 1, 'yoda')
+        client = service.client
+        with client.settings(raw_response=True):
+            historico = client.service.getHistories('yoda', 'senha', 1, 'yoda', 1)
+            formulario = client.service.getInstanceCardData('yoda', 'senha', 1, 'yoda', 1)
+
+    casos = [
+        ('getHistories', historico, '%d tarefas' % tarefas,
+         lambda: BaseService._tratar_historico(service._process_reply('getHistories', historico)),
+         lambda: decode_histories(historico.content)),
+        ('getInstanceCardData', formulario, '%d campos' % campos,
+         lambda: service._process_reply('getInstanceCardData', formulario),
+         lambda: decode_card_data(formulario.content)),
+    ]
+    for operacao, resposta, descricao, zeep, rapido in casos:
+        tempo_zeep, tempo_rapido = medir(zeep, repeticoes), medir(rapido, repeticoes)
+        print('%-20s %-14s %6.1f MB  zeep %7.1f ms  direto %7.1f ms  %5.1fx' % (
+            operacao, descricao, len(resposta.content) / 1024 / 1024, tempo_zeep * 1000, tempo_rapido * 1000,
+            tempo_zeep / tempo_rapido))
+
+
+if __name__ == '__main__':
+    main()
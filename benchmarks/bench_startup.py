@@ -0,0 +1,52 @@
+"""Compara o tempo de criação dos clientes dos serviços do ECM nos modos online, cache e empacotado.
+
+Uso, a partir da raiz do repositório: PYTHONPATH=. python benchmarks/bench_startup.py <url_servidor> [repeticoes]
+
+A URL do servidor também pode ser informada pela variável de ambiente URL_SERVIDOR.
+"""
+
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from totvsecm.ClientRegistry import WSDL_BUNDLED, WSDL_CACHE, WSDL_ONLINE, ClientRegistry
+from totvsecm.WsdlCache import SERVICES, gerar_snapshot
+
+
+def medir(server, repeticoes, **configuracao):
+    """Retorna o menor tempo, em segundos, para criar os clientes de todos os serviços num registro novo."""
+    tempos = []
+    for _ in range(repeticoes):
+        registry = ClientRegistry()
+        registry.configure(**configuracao)
+        inicio = time.perf_counter()
+        for service_name in SERVICES:
+            registry.get(server, service_name)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    server = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('URL_SERVIDOR')
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    assert server, 'Informe a URL do servidor ECM.'
+
+    with TemporaryDirectory() as cache_dir, TemporaryDirectory() as bundled_dir:
+        gerar_snapshot(server, bundled_dir)
+
+        # O cache é aquecido antes da medição, como aconteceria após o primeiro processo.
+        medir(server, 1, wsdl_mode=WSDL_CACHE, cache_dir=cache_dir)
+
+        resultados = [
+            ('online', medir(server, repeticoes, wsdl_mode=WSDL_ONLINE)),
+            ('cache', medir(server, repeticoes, wsdl_mode=WSDL_CACHE, cache_dir=cache_dir)),
+            ('empacotado', medir(server, repeticoes, wsdl_mode=WSDL_BUNDLED, bundled_dir=bundled_dir)),
+        ]
+
+    for modo, tempo in resultados:
+        print('%-12s %8.1f ms' % (modo, tempo * 1000))
+
+
+if __name__ == '__main__':
+    main()
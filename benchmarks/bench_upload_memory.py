@@ -0,0 +1,71 @@
+"""Compara o pico de memória (RSS) de iniciar_solicitacao com anexos carregados em memória e enviados em stream.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/bench_upload_memory.py [quantidade_anexos] [tamanho_mb]
+
+Cada modo é executado num processo próprio, contra o servidor ECM falso executado em outro processo.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+from multiprocessing import Process, Queue
+from tempfile import TemporaryDirectory
+
+from totvsecm.BaseService import BaseService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def servir(fila):
+    with FakeEcmServer() as server:
+        fila.put(server.url)
+        server.thread.join()
+
+
+def executar(modo, url, arquivos):
+    """Inicia uma solicitação com os anexos e imprime o pico de memória do processo, em MB."""
+    anexos = {}
+    for caminho in arquivos:
+        if modo == 'memoria':
+            with open(caminho, 'rb') as fh:
+                anexos[os.path.basename(caminho)] = {'description': caminho, 'content': fh.read()}
+        else:
+            anexos[os.path.basename(caminho)] = {'description': caminho, 'path': caminho}
+
+    service = BaseService(url, 'yoda', 'senha', 'yoda', id_processo='benchmark')
+    service.iniciar_solicitacao({'campo': 'valor'}, ['yoda'], 'Benchmark', anexos=anexos)
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    tamanho = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    fila = Queue()
+    servidor = Process(target=servir, args=(fila,), daemon=True)
+    servidor.start()
+    url = fila.get()
+
+    with TemporaryDirectory() as diretorio:
+        arquivos = []
+        for i in range(quantidade):
+            caminho = os.path.join(diretorio, 'anexo%d.bin' % i)
+            with open(caminho, 'wb') as fh:
+                for _ in range(tamanho):
+                    fh.write(os.urandom(1024 * 1024))
+            arquivos.append(caminho)
+
+        print('%d anexos de %d MB' % (quantidade, tamanho))
+        for modo in ('memoria', 'stream'):
+            saida = subprocess.check_output([sys.executable, __file__, '--executar', modo, url] + arquivos)
+            print('%-8s pico de RSS: %8.1f MB' % (modo, float(saida)))
+
+    servidor.terminate()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--executar']:
+        executar(sys.argv[2], sys.argv[3], sys.argv[4:])
+    else:
+        main()
@@ -0,0 +1,183 @@
+"""Suíte de benchmarks das principais operações da biblioteca, executada contra o servidor ECM falso local.
+
+Uso, a partir da raiz do repositório:
+    PYTHONPATH=. python benchmarks/suite.py [--latencia 0.005] [--repeticoes 5] [--saida resultados.json]
+                                            [--comparar anterior.json] [--tolerancia 0.1] [casos ...]
+
+Cada caso é repetido e o resultado registra a mediana, o mínimo e o máximo das durações, além da quantidade de
+chamadas SOAP e dos bytes enviados e recebidos numa execução. Os tamanhos das cargas (campos do formulário, tarefas do
+histórico e anexos) e a latência simulada do servidor são configuráveis. Com --saida, os resultados são gravados em
+JSON; com --comparar, são comparados a uma execução anterior, e o comando termina com erro se algum caso ficar mais
+lento que a tolerância.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import totvsecm
+from totvsecm import DocumentService as document_module
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import registry
+from totvsecm.Instrumentation import Metricas, instrumentacao
+from totvsecm.WsdlCache import SERVICES
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+
+NUMERO = 1
+FICHA = 77
+
+
+class Suite:
+    """Casos de benchmark sobre um servidor ECM falso já preparado com as cargas configuradas."""
+
+    def __init__(self, server, campos, tarefas, anexos):
+        self.server = server
+        self.campos = campos
+        self.tarefas = tarefas
+        self.anexos = anexos
+        self.formulario = {'campo%d' % i: 'valor %d' % i for i in range(campos)}
+
+        ecm = server.ecm
+        ecm.active_states[NUMERO] = [1]
+        ecm.card_data[NUMERO] = dict(self.formulario, WKDef='processo')
+        ecm.histories[NUMERO] = history([(i % 10, 'colaborador%d' % (i % 50), 'Observação %d' % i)
+                                         for i in range(tarefas)])
+        # Os campos seguem a ordem do tipo processAttachmentDto do WSDL.
+        ecm.attachments[NUMERO] = [{'attachmentSequence': 1, 'colleagueId': 'yoda', 'documentId': FICHA,
+                                    'version': 1000}]
+        for i in range(anexos):
+            ecm.attachments[NUMERO].append({'attachmentSequence': i + 2, 'colleagueId': 'yoda',
+                                            'documentId': 100 + i, 'version': 1000})
+            ecm.documents[100 + i] = (1000, 'anexo%d.pdf' % i, b'')
+
+    def servico(self, **kwargs):
+        return BaseService(self.server.url, 'yoda', 'senha', 'yoda', id_processo='processo', **kwargs)
+
+    def criar_clientes(self):
+        registry.clear()
+        for service_name in SERVICES:
+            registry.get(self.server.url, service_name)
+
+    def iniciar_solicitacao(self):
+        self.servico().iniciar_solicitacao(self.formulario, ['yoda'], 'Iniciada')
+
+    def movimentar(self):
+        self.server.ecm.active_states[NUMERO] = [1]
+        self.servico(numero_solicitacao=NUMERO).movimentar(1, 5, campo0='alterado %f' % time.time())
+
+    def historico_tratado(self):
+        self.servico(numero_solicitacao=NUMERO).historico_tratado
+
+    def historico_tratado_rapido(self):
+        self.servico(numero_solicitacao=NUMERO, decodificacao_rapida=True).historico_tratado
+
+    def anexos_da_solicitacao(self):
+        document_module._document_info_cache.clear()
+        self.servico(numero_solicitacao=NUMERO).anexos
+
+    CASOS = {
+        'criar_clientes': criar_clientes,
+        'iniciar_solicitacao': iniciar_solicitacao,
+        'movimentar': movimentar,
+        'historico_tratado': historico_tratado,
+        'historico_tratado_rapido': historico_tratado_rapido,
+        'anexos': anexos_da_solicitacao,
+    }
+
+    def executar(self, caso, repeticoes):
+        """Executa um caso, retornando as estatísticas das durações e as medições de uma execução."""
+        def funcao():
+            self.CASOS[caso](self)
+
+        # Aquecimento, que também cria os clientes utilizados pelos demais casos.
+        funcao()
+
+        metricas = Metricas()
+        with instrumentacao.coletando(metricas):
+            funcao()
+        totais = metricas.resumo().values()
+
+        duracoes = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            duracoes.append(time.perf_counter() - inicio)
+        return {
+            'mediana': statistics.median(duracoes),
+            'minimo': min(duracoes),
+            'maximo': max(duracoes),
+            'chamadas': metricas.chamadas,
+            'bytes_enviados': sum(total['bytes_enviados'] for total in totais),
+            'bytes_recebidos': sum(total['bytes_recebidos'] for total in totais),
+        }
+
+
+def comparar(anterior, atual, tolerancia):
+    """Imprime a comparação das medianas de cada caso, retornando os casos mais lentos que a tolerância."""
+    print('\nComparação com a versão %s:' % anterior['versao'])
+    regressoes = []
+    for caso, resultado in atual['resultados'].items():
+        base = anterior['resultados'].get(caso)
+        if base is None:
+            continue
+        razao = resultado['mediana'] / base['mediana']
+        marca = ''
+        if razao > 1 + tolerancia:
+            regressoes.append(caso)
+            marca = '  <- regressão'
+        print('%-26s %9.2f ms -> %9.2f ms  %+6.1f%%%s' % (caso, base['mediana'] * 1000, resultado['mediana'] * 1000,
+                                                        (razao - 1) * 100, marca))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks da biblioteca contra um servidor ECM falso local.')
+    parser.add_argument('casos', nargs='*', help='Casos executados: %s (todos).' % ', '.join(Suite.CASOS))
+    parser.add_argument('--latencia', type=float, default=0.0, help='Latência de cada operação, em segundos.')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--campos', type=int, default=200, help='Campos do formulário.')
+    parser.add_argument('--tarefas', type=int, default=5000, help='Tarefas do histórico.')
+    parser.add_argument('--anexos', type=int, default=100, help='Anexos da solicitação.')
+    parser.add_argument('--saida', help='Arquivo JSON onde os resultados são gravados.')
+    parser.add_argument('--comparar', help='Arquivo JSON com os resultados de uma execução anterior.')
+    parser.add_argument('--tolerancia', type=float, default=0.1, help='Aumento máximo da mediana, como fração.')
+    args = parser.parse_args()
+    for caso in args.casos:
+        if caso not in Suite.CASOS:
+            parser.error('Caso desconhecido: %s.' % caso)
+
+    configuracao = {'latencia': args.latencia, 'repeticoes': args.repeticoes, 'campos': args.campos,
+                    'tarefas': args.tarefas, 'anexos': args.anexos}
+    resultados = {}
+    with FakeEcmServer(latency=args.latencia) as server:
+        suite = Suite(server, args.campos, args.tarefas, args.anexos)
+        print('%-26s %12s %12s %9s %12s %12s' % ('caso', 'mediana', 'mínimo', 'chamadas', 'enviado', 'recebido'))
+        for caso in args.casos or Suite.CASOS:
+            resultado = resultados[caso] = suite.executar(caso, args.repeticoes)
+            print('%-26s %9.2f ms %9.2f ms %9d %10d B %10d B' % (
+                caso, resultado['mediana'] * 1000, resultado['minimo'] * 1000, resultado['chamadas'],
+                resultado['bytes_enviados'], resultado['bytes_recebidos']))
+        registry.clear()
+
+    atual = {'versao': totvsecm.__version__, 'python': platform.python_version(),
+             'data': datetime.now().isoformat(timespec='seconds'), 'configuracao': configuracao,
+             'resultados': resultados}
+    if args.saida:
+        with open(args.saida, 'w') as fh:
+            json.dump(atual, fh, indent=2)
+
+    if args.comparar:
+        with open(args.comparar) as fh:
+            anterior = json.load(fh)
+        if anterior['configuracao'] != configuracao:
+            print('\nAtenção: a execução anterior utilizou outra configuração: %s' % anterior['configuracao'])
+        if comparar(anterior, atual, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
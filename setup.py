@@ -5,7 +5,7 @@ with open('README.rst', 'r') as fh:
     long_description = fh.read()
 
 setup(name='totvsecm',
-      version='1.5.3',
+      version='1.6.0',
       description='API para webservices do TOTVS ECM.',
       long_description=long_description,
       url='http://github.com/soslaio/totvsecm',
@@ -22,4 +22,10 @@ setup(name='totvsecm',
       install_requires=[
           'zeep',
       ],
+      extras_require={
+          'async': ['httpx'],
+      },
+      entry_points={
+          'console_scripts': ['totvsecm-exportar = totvsecm.BulkExporter:main'],
+      },
       zip_safe=False)
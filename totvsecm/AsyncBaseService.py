@@ -0,0 +1,322 @@
+
+import asyncio
+import os
+
+from . import BaseService as base_module
+from .AsyncCardService import AsyncCardService
+from .AsyncDocumentService import AsyncDocumentService
+from .AsyncWorkflowEngineService import AsyncWorkflowEngineService
+from .BaseService import BaseService
+from .Cache import prazos
+from .Records import HistoricoColunar
+
+
+class AsyncBaseService(BaseService):
+    """Versão assíncrona de BaseService, para uso em aplicações asyncio.
+
+    Possui os mesmos métodos e propriedades de BaseService, que aqui retornam corrotinas. Os serviços de um mesmo
+    servidor compartilham um único pool de conexões HTTP, que deve ser encerrado com registry.aclose().
+
+    Uso:
+        servico = AsyncBaseService(...)
+        atividade = await servico.atividade_atual
+        await servico.avancar(5)
+    """
+
+    def __init__(self, url_servidor, usuario, senha, usuario_responsavel, id_processo=None, numero_solicitacao=None,
+                 numero_ficha=None, id_empresa=1, concorrencia=8, historico_persistente=None,
+                 decodificacao_rapida=False):
+        """Inicia uma instância da classe básica assíncrona. Os argumentos são os mesmos de BaseService."""
+        super().__init__(url_servidor, usuario, senha, usuario_responsavel, id_processo=id_processo,
+                         numero_solicitacao=numero_solicitacao, numero_ficha=numero_ficha, id_empresa=id_empresa,
+                         concorrencia=concorrencia, historico_persistente=historico_persistente,
+                         decodificacao_rapida=decodificacao_rapida)
+
+        # Instâncias assíncronas dos serviços.
+        self.__workflowservice = AsyncWorkflowEngineService(url_servidor, user=usuario, password=senha,
+                                                            company_id=id_empresa, user_id=usuario_responsavel)
+        self.__documentservice = AsyncDocumentService(url_servidor, user=usuario, password=senha,
+                                                      company_id=id_empresa, user_id=usuario_responsavel)
+        self.__cardservice = AsyncCardService(url_servidor, user=usuario, password=senha, company_id=id_empresa,
+                                              user_id=usuario_responsavel)
+
+    @property
+    def anexos(self):
+        """Retorna os anexos do processo. Não inclui os conteúdos por uma questão de otimização."""
+        return self.listar_anexos()
+
+    async def listar_anexos(self, com_conteudo=False, diretorio=None, registros=False):
+        """Retorna os anexos do processo, opcionalmente baixando os conteúdos para um diretório.
+
+        Os argumentos são os mesmos de BaseService.listar_anexos.
+
+        Returns:
+            dict: Anexos do processo, identificados pelo nome do arquivo físico.
+        """
+        assert self.numero_solicitacao is not None, 'Informe o número da solicitação cujos anexos deseja.'
+        assert not com_conteudo or diretorio is not None, 'Informe o diretório onde os anexos serão gravados.'
+
+        attachments_info = [attachment
+                            for attachment in await self.__workflowservice.get_attachments(self.numero_solicitacao)
+                            if int(attachment['attachmentSequence']) > 1]
+        semaphore = asyncio.Semaphore(self.concorrencia)
+
+        async def consultar_documento(attachment):
+            version = attachment['version'] if 'version' in attachment else None
+            async with semaphore:
+                document_info = await self.__documentservice.get_active_document_info(
+                    int(attachment['documentId']), attachment['colleagueId'],
+                    int(version) if version is not None else None)
+
+                # Baixa o conteúdo do documento diretamente para o arquivo de destino.
+                if com_conteudo:
+                    caminho = os.path.join(diretorio, os.path.basename(document_info['phisical_file']))
+                    document_info = dict(document_info, caminho=caminho)
+                    await self.__documentservice.download_document_content(
+                        int(attachment['documentId']), attachment['colleagueId'], document_info['version'],
+                        document_info['phisical_file'], caminho)
+            return document_info
+
+        # Consulta as informações dos documentos em paralelo, mantendo a ordem da lista de anexos.
+        documents_info = await asyncio.gather(*[consultar_documento(attachment) for attachment in attachments_info])
+        return self._montar_anexos(attachments_info, documents_info, registros)
+
+    @property
+    def atividade_atual(self):
+        """Retorna a atividade no qual o processo se encontra atualmente."""
+        return self.__atividade_atual()
+
+    async def __atividade_atual(self):
+        assert self.numero_solicitacao is not None, 'Informe o número do processo cuja atividade atual deseja.'
+        rs = await self.__workflowservice.get_all_active_states(self.numero_solicitacao)
+        if rs:
+            return [int(n) for n in rs]
+        else:
+            return [-1]
+
+    @property
+    def finalizado(self):
+        """Indica se o processo foi finalizado."""
+        return self.__finalizado()
+
+    async def __finalizado(self):
+        return await self.atividade_atual == [-1]
+
+    @property
+    def historico(self):
+        """Histórico da solicitação."""
+        assert self.numero_solicitacao is not None, 'Informe o número do processo cujo histórico deseja.'
+        return self.__workflowservice.get_histories(self.numero_solicitacao)
+
+    @property
+    def historico_tratado(self):
+        """Retorna o histórico da solicitação de forma tratada, com um dicionário por tarefa."""
+        return self.__historico_dicionarios()
+
+    async def __historico_dicionarios(self):
+        return [registro._asdict() for registro in await self.registros_historico]
+
+    @property
+    def registros_historico(self):
+        """Retorna o histórico tratado da solicitação como registros compactos (RegistroHistorico)."""
+        return self.__historico_tratado()
+
+    async def __consultar_historico_tratado(self):
+        assert self.numero_solicitacao is not None, 'Informe o número do processo cujo histórico deseja.'
+        if self.decodificacao_rapida:
+            return await self.__workflowservice.get_history_records(self.numero_solicitacao)
+        return self._tratar_historico(await self.historico)
+
+    async def __historico_tratado(self):
+        if self.historico_persistente is None:
+            return await self.__consultar_historico_tratado()
+
+        rs = self.historico_persistente.obter(self.url_servidor, self.numero_solicitacao)
+        if rs is None:
+            # A situação é consultada antes do histórico, como em BaseService.
+            finalizado = await self.finalizado
+            rs = await self.__consultar_historico_tratado()
+            if finalizado:
+                self.historico_persistente.salvar(self.url_servidor, self.numero_solicitacao, rs)
+        return rs
+
+    @property
+    def responsavel_atual(self):
+        """Id do responsável atual da solicitação."""
+        return self.__responsavel_atual()
+
+    async def __responsavel_atual(self):
+        return (await self.registros_historico)[0].colleague_id
+
+    async def atualizar_formulario(self, dados_formulario=None):
+        """Atualiza o formulário da solicitação. Os argumentos são os mesmos de BaseService.atualizar_formulario."""
+        assert self.numero_ficha is not None, 'Informe o número da ficha que deseja atualizar.'
+        if dados_formulario is None:
+            assert self.formulario is not None, 'Carregue a solicitação antes de enviar as alterações do formulário.'
+            dados_formulario = self.formulario.alteracoes
+            if not dados_formulario:
+                return None
+        result = await self.__cardservice.update_card_data(self.numero_ficha, dados_formulario)
+        if self.formulario is not None:
+            self.formulario.confirmar(dados_formulario)
+        return result
+
+    async def avancar(self, n_atividade, colleague_ids=None, manager_mode=False,
+                      observacao=u'Avançado automaticamente'):
+        """Avança o processo para uma determinada atividade. Os argumentos são os mesmos de BaseService.avancar."""
+        user = colleague_ids if colleague_ids else self.usuario
+        assert self.numero_solicitacao is not None, 'Informe o número da solicitação que deseja avançar.'
+        return await self.__workflowservice.save_and_send_task_classic(self.numero_solicitacao, n_atividade, [user],
+                                                                       observacao, {}, manager_mode=manager_mode)
+
+    async def calcular_prazo(self, data, segundos, prazo, period_id):
+        """Calcula o prazo de uma atividade considerando um expediente. Os argumentos são os mesmos de
+        BaseService.calcular_prazo."""
+        chave = self._chave_prazo(data, segundos, prazo, period_id)
+        rs = prazos.get(chave)
+        if rs is None:
+            rs = self._tratar_prazo(await self.__workflowservice.calculate_deadline_hours(
+                data=data, segundos=segundos, prazo=prazo, period_id=period_id))
+            prazos.set(chave, rs)
+        return dict(rs)
+
+    async def calcular_prazos(self, entradas):
+        """Calcula os prazos de várias atividades, consultando o ECM uma única vez por cálculo distinto. Os
+        argumentos são os mesmos de BaseService.calcular_prazos."""
+        entradas = [tuple(entrada) for entrada in entradas]
+        distintas = list(dict.fromkeys(entradas))
+        semaphore = asyncio.Semaphore(self.concorrencia)
+
+        async def calcular(entrada):
+            async with semaphore:
+                return await self.calcular_prazo(*entrada)
+
+        resultados = dict(zip(distintas, await asyncio.gather(*[calcular(entrada) for entrada in distintas])))
+        return [dict(resultados[entrada]) for entrada in entradas]
+
+    async def cancelar_solicitacao(self, mensagem):
+        """Cancela a solicitação. Os argumentos são os mesmos de BaseService.cancelar_solicitacao."""
+        assert self.numero_solicitacao is not None, 'Informe o número do processo que deseja cancelar.'
+        return await self.__workflowservice.cancel_instance(self.numero_solicitacao, mensagem)
+
+    async def carregar_solicitacao(self):
+        """Carrega as informações da solicitação no objeto do serviço, incluindo número da ficha e ID do processo.
+
+        Returns:
+            list: Dados do formulário da solicitação.
+        """
+        assert self.numero_solicitacao is not None, 'Informe o número do processo que deseja carregar.'
+        attachments_info, result = await asyncio.gather(
+            self.__workflowservice.get_attachments(self.numero_solicitacao),
+            self.__workflowservice.get_instance_card_items(self.numero_solicitacao) if self.decodificacao_rapida
+            else self.__workflowservice.get_instance_card_data(self.numero_solicitacao))
+        self._carregar_formulario(attachments_info, result)
+        return result
+
+    async def filtrar_historico(self, sequencia, excluir_automaticos=True):
+        """Filtra o histórico da solicitação a partir dos identificadores das sequências. Os argumentos são os mesmos
+        de BaseService.filtrar_historico."""
+        if self.historico_persistente is not None:
+            rs = self.historico_persistente.filtrar(self.url_servidor, self.numero_solicitacao, sequencia,
+                                                    excluir_automaticos)
+            if rs is not None:
+                return [h._asdict() for h in rs]
+
+        rs = [h for h in await self.registros_historico if h.proxima_atividade in sequencia]
+
+        # Aplica o filtro caso seja necessário excluir os históricos automáticos.
+        if excluir_automaticos:
+            rs = [h for h in rs if not (h.colleague_id or '').startswith('Pool')]
+
+        return [h._asdict() for h in rs]
+
+    async def historicos_colunares(self, numeros_solicitacao):
+        """Consulta em paralelo os históricos de várias solicitações, retornando-os em colunas.
+
+        Os argumentos são os mesmos de BaseService.historicos_colunares.
+
+        Returns:
+            HistoricoColunar: Tarefas dos históricos, na ordem das solicitações informadas.
+        """
+        numeros_solicitacao = list(numeros_solicitacao)
+        semaphore = asyncio.Semaphore(self.concorrencia)
+
+        async def consultar(numero):
+            if self.historico_persistente is not None:
+                rs = self.historico_persistente.obter(self.url_servidor, numero)
+                if rs is not None:
+                    return rs
+            async with semaphore:
+                if self.decodificacao_rapida:
+                    return await self.__workflowservice.get_history_records(numero)
+                return await self.__workflowservice.get_histories(numero)
+
+        colunas = HistoricoColunar()
+        for numero, historico in zip(numeros_solicitacao,
+                                     await asyncio.gather(*[consultar(numero) for numero in numeros_solicitacao])):
+            colunas.adicionar(numero, historico)
+        return colunas
+
+    async def projetar_campos(self, campos, numeros_solicitacao=None,
+                              limite_campos=base_module.LIMITE_CAMPOS_INDIVIDUAIS):
+        """Consulta em paralelo apenas alguns campos do formulário de várias solicitações.
+
+        Os argumentos são os mesmos de BaseService.projetar_campos.
+
+        Returns:
+            TabelaCampos: Valores dos campos, identificados pelo número de cada solicitação.
+        """
+        campos, numeros_solicitacao = self._preparar_projecao(campos, numeros_solicitacao)
+        individuais = len(campos) <= limite_campos
+        semaphore = asyncio.Semaphore(self.concorrencia)
+
+        async def consultar(consulta):
+            async with semaphore:
+                if individuais:
+                    return await self.__workflowservice.get_card_value(*consulta)
+                if self.decodificacao_rapida:
+                    carddata = await self.__workflowservice.get_instance_card_items(consulta)
+                else:
+                    carddata = await self.__workflowservice.get_instance_card_data(consulta)
+                return self._projetar_formulario(carddata, campos)
+
+        consultas = [(numero, campo) for numero in numeros_solicitacao for campo in campos] if individuais \
+            else numeros_solicitacao
+        resultados = await asyncio.gather(*[consultar(consulta) for consulta in consultas])
+        return self._montar_tabela(campos, numeros_solicitacao, resultados, individuais)
+
+    async def iniciar_solicitacao(self, dados_formulario, ids_destinatarios, comentarios, anexos=None, completar=True,
+                                  numero_atividade=0, gestor_processo=False):
+        """Inicia uma solicitação no ECM. Os argumentos são os mesmos de BaseService.iniciar_solicitacao."""
+        assert self.id_processo is not None, 'Informe o ID do processo que deseja iniciar.'
+        anexos = anexos if anexos else {}
+        result = await self.__workflowservice.start_process_classic(process_id=self.id_processo,
+                                                                    colleague_ids=ids_destinatarios,
+                                                                    card_data=dados_formulario, comments=comentarios,
+                                                                    attachments=anexos, complete_task=completar,
+                                                                    choosed_state=numero_atividade,
+                                                                    manager_mode=gestor_processo)
+        iprocess = self._analisar_retorno(result, 'iProcess')
+        if iprocess:
+            self.numero_solicitacao = iprocess
+            self.numero_ficha = self._analisar_retorno(result, 'WDNrDocto')
+            return result
+        else:
+            erro = self._analisar_retorno(result, 'ERROR')
+            raise Exception(erro)
+
+    async def movimentar(self, origem, destino, observacao='Movimentado automaticamente', **campos_atualizar):
+        """Movimenta um processo de uma determinada atividade para outra, verificando antes a atividade de origem. Os
+        argumentos são os mesmos de BaseService.movimentar."""
+        _, atividade_atual = await asyncio.gather(self.carregar_solicitacao(), self.atividade_atual)
+        if atividade_atual != [-1]:
+            if atividade_atual[0] == origem:
+                # Caso haja campos alterados, atualiza apenas esses campos antes de avançar o processo.
+                alteracoes = self._atualizar_campos(campos_atualizar)
+                if alteracoes:
+                    await self.atualizar_formulario(alteracoes)
+                return await self.avancar(destino, observacao=observacao, manager_mode=True)
+            else:
+                raise Exception(f'O processo não está na atividade de origem esperada.')
+        else:
+            raise Exception('O processo já está finalizado.')
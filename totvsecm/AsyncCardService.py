@@ -0,0 +1,8 @@
+
+from .CardService import CardService
+
+
+class AsyncCardService(CardService):
+    """Versão assíncrona do CardService. As operações retornam corrotinas."""
+
+    asynchronous = True
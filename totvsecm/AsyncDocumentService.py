@@ -0,0 +1,119 @@
+
+import os
+
+from . import DocumentService as document_module
+from .CallExecutor import call_executor
+from .ClientRegistry import registry
+from .DocumentService import DocumentService
+from .Streaming import MTOM_UNSUPPORTED, content_parser
+
+
+class AsyncDocumentService(DocumentService):
+    """Versão assíncrona do DocumentService. As operações retornam corrotinas."""
+
+    asynchronous = True
+
+    async def get_active_document_info(self, nr_document_id, colleague_id, version=None):
+        """Retorna o nome do arquivo físico e a versão de um documento ativo.
+
+        Os argumentos são os mesmos de DocumentService.get_active_document_info.
+
+        Returns:
+            dict: Nome do arquivo físico e versão do documento.
+        """
+        key = (self.server, self.company_id, nr_document_id, version)
+        info = document_module._document_info_cache.get(key) if version is not None else None
+        if info is None:
+            document = (await self.get_active_document(nr_document_id, colleague_id))[0]
+            info = {
+                'phisical_file': document['phisicalFile'],
+                'version': int(document['version']),
+            }
+            if version is not None:
+                document_module._document_info_cache.set(key, info)
+        return info
+
+    async def get_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo):
+        """Retorna o byte do arquivo físico de um documento, caso o usuário tenha permissão para acessá-lo.
+
+        Os argumentos são os mesmos de DocumentService.get_document_content.
+
+        Returns:
+            bytes: Conteúdo do documento.
+        """
+        if not registry.supports_mtom(self.client):
+            return await super().get_document_content(nr_document_id, colleague_id, documento_versao, nome_arquivo)
+
+        async def call():
+            chunks = []
+            async for chunk in self._document_content_chunks(nr_document_id, colleague_id, documento_versao,
+                                                             nome_arquivo):
+                chunks.append(chunk)
+            return b''.join(chunks)
+        return await self._execute('getDocumentContent', call)
+
+    async def _document_content_chunks(self, nr_document_id, colleague_id, documento_versao, nome_arquivo,
+                                       chunk_size=64 * 1024):
+        """Envia a operação getDocumentContent em modo stream, sem passar pelo call_executor.
+
+        Se o servidor recusar a resposta MTOM/XOP, o conteúdo é pedido novamente em base64, como em
+        DocumentService._document_content_chunks.
+
+        Returns:
+            async_generator: Partes do conteúdo do documento.
+        """
+        transport = self.client.transport
+        timeout = call_executor.timeout('getDocumentContent', transport.timeout())
+        while True:
+            mtom = registry.supports_mtom(self.client)
+            address, message, headers = self._document_content_request(nr_document_id, colleague_id,
+                                                                       documento_versao, nome_arquivo)
+            async with transport.client.stream('POST', address, content=message, headers=headers,
+                                               timeout=timeout) as response:
+                if mtom and response.status_code in MTOM_UNSUPPORTED:
+                    registry.disable_mtom(self.client)
+                    continue
+                parser = content_parser(response.status_code, response.headers.get('Content-Type', ''))
+                async for block in response.aiter_bytes(chunk_size):
+                    for chunk in parser.feed(block):
+                        yield chunk
+                for chunk in parser.close():
+                    yield chunk
+                return
+
+    def iter_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo,
+                              chunk_size=64 * 1024):
+        """Retorna o conteúdo do arquivo físico de um documento em partes, decodificadas à medida que a resposta é
+        recebida.
+
+        Os argumentos são os mesmos de DocumentService.iter_document_content.
+
+        Returns:
+            async_generator: Partes do conteúdo do documento.
+        """
+        return call_executor.astream(self.server, 'getDocumentContent', lambda: self._document_content_chunks(
+            nr_document_id, colleague_id, documento_versao, nome_arquivo, chunk_size))
+
+    async def download_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo, destino):
+        """Grava o conteúdo do arquivo físico de um documento num arquivo, à medida que a resposta é recebida.
+
+        Os argumentos são os mesmos de DocumentService.download_document_content.
+
+        Returns:
+            int: Quantidade de bytes gravados.
+        """
+        if not hasattr(destino, 'write'):
+            fh = open(destino, 'wb')
+            try:
+                with fh:
+                    return await self.download_document_content(nr_document_id, colleague_id, documento_versao,
+                                                                nome_arquivo, fh)
+            except Exception:
+                os.remove(destino)
+                raise
+
+        size = 0
+        async for chunk in self.iter_document_content(nr_document_id, colleague_id, documento_versao, nome_arquivo):
+            destino.write(chunk)
+            size += len(chunk)
+        return size
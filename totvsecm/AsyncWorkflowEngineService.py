@@ -0,0 +1,99 @@
+
+import time
+
+from .ClientRegistry import registry
+from .Instrumentation import registrar_requisicao
+from .Streaming import MTOM_UNSUPPORTED, MtomBody, StreamingBody, aiter_chunks
+from .WorkflowEngineService import WorkflowEngineService
+
+
+class AsyncWorkflowEngineService(WorkflowEngineService):
+    """Versão assíncrona do WorkflowEngineService.
+
+    As operações retornam corrotinas e são executadas pelo cliente assíncrono do zeep, que compartilha um único pool de
+    conexões HTTP por servidor.
+    """
+
+    asynchronous = True
+
+    async def _post_raw(self, operation, *args):
+        """Envia uma operação e retorna a resposta HTTP sem interpretá-la.
+
+        O envio é feito diretamente pelo pool de conexões, pois a opção raw_response do zeep vale para a thread inteira,
+        e seria aplicada às demais corrotinas em execução.
+        """
+        address, message, headers = self._create_request(operation, *args)
+        transport = self.client.transport
+        inicio = time.perf_counter()
+        response = transport.new_response(await transport.client.post(address, content=message, headers=headers,
+                                                                      timeout=transport.timeout()))
+        registrar_requisicao(inicio, len(message), len(response.content))
+        return response
+
+    async def get_history_records(self, process_instance_id):
+        """Retorna o histórico tratado de um processo, decodificado diretamente da resposta do ECM.
+
+        Os argumentos são os mesmos de WorkflowEngineService.get_history_records.
+        """
+        from .RawDecoder import decode_histories
+
+        async def call():
+            response = await self._post_raw('getHistories', self.user, self.password, self.company_id, self.user_id,
+                                             process_instance_id)
+            return self._decode_reply('getHistories', response, decode_histories)
+        return await self._execute('getHistories', call)
+
+    async def get_instance_card_items(self, process_instance_id):
+        """Retorna o valor dos campos da ficha de uma solicitação, decodificados diretamente da resposta do ECM.
+
+        Os argumentos são os mesmos de WorkflowEngineService.get_instance_card_items.
+        """
+        from .RawDecoder import decode_card_data
+
+        async def call():
+            response = await self._post_raw('getInstanceCardData', self.user, self.password, self.company_id,
+                                             self.user_id, process_instance_id)
+            return self._decode_reply('getInstanceCardData', response, decode_card_data)
+        return await self._execute('getInstanceCardData', call)
+
+    async def start_process_classic(self, process_id, colleague_ids, card_data, comments, attachments=None,
+                                    complete_task=True, choosed_state=0, manager_mode=False):
+        """Inicia uma solicitação e retorna um array de objeto com chave e valor.
+
+        Os argumentos são os mesmos de WorkflowEngineService.start_process_classic.
+
+        Returns:
+            list: Lista com informações do objeto criado.
+        """
+        mtom = bool(attachments) and registry.supports_mtom(self.client)
+        args, kwargs, sources = self._start_process_classic_arguments(process_id, colleague_ids, card_data, comments,
+                                                                      attachments, complete_task, choosed_state,
+                                                                      manager_mode, mtom)
+        if not sources:
+            return await self._send('startProcessClassic', *args, **kwargs)
+
+        # Envia o envelope em stream, inserindo o conteúdo dos arquivos no lugar dos marcadores.
+        address, message, headers = self._create_request('startProcessClassic', *args, **kwargs)
+        transport = self.client.transport
+
+        async def call():
+            if mtom:
+                body = MtomBody(message, sources)
+                response = await self.__post(transport, address, body,
+                                             dict(headers, **{'Content-Type': body.content_type}))
+                if response.status_code not in MTOM_UNSUPPORTED:
+                    return self._process_reply('startProcessClassic', response)
+                registry.disable_mtom(self.client)
+            response = await self.__post(transport, address, StreamingBody(message, sources), headers)
+            return self._process_reply('startProcessClassic', response)
+        return await self._execute('startProcessClassic', call)
+
+    @staticmethod
+    async def __post(transport, address, body, headers):
+        inicio = time.perf_counter()
+        response = await transport.client.post(address, content=aiter_chunks(body),
+                                               headers=dict(headers, **{'Content-Length': str(len(body))}),
+                                               timeout=transport.timeout())
+        response = transport.new_response(response)
+        registrar_requisicao(inicio, len(body), len(response.content))
+        return response
@@ -1,15 +1,23 @@
 
-import json
-from datetime import timedelta
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+from .Cache import prazos
 from .WorkflowEngineService import WorkflowEngineService
 from .DocumentService import DocumentService
 from .CardService import CardService
+from .Formulario import Formulario
+from .Records import HistoricoColunar, RegistroAnexo, RegistroHistorico, TabelaCampos
+
+# Quantidade máxima de campos de projetar_campos consultados individualmente com getCardValue. Acima dela, é mais
+# barato consultar o formulário inteiro de cada solicitação com getInstanceCardData.
+LIMITE_CAMPOS_INDIVIDUAIS = 3
 
 
 class BaseService:
     def __init__(self, url_servidor, usuario, senha, usuario_responsavel, id_processo=None, numero_solicitacao=None,
-                 numero_ficha=None, id_empresa=1):
+                 numero_ficha=None, id_empresa=1, concorrencia=8, cache=False, historico_persistente=None,
+                 decodificacao_rapida=False):
         """Inicia uma instância da classe básica de conexão com o webservice do TOTVS ECM.
 
         Args:
@@ -21,13 +29,29 @@ class BaseService:
             numero_solicitacao(int): Número da solicitação no ECM.
             numero_ficha(int): Número da ficha relacionada à solicitação no ECM.
             id_empresa(int): Identificador da empresa no ECM.
+            concorrencia(int): Quantidade máxima de consultas simultâneas ao ECM numa mesma operação.
+            cache(bool): Indica se as consultas da solicitação (atividade atual, histórico, formulário e anexos) devem
+                ser memorizadas na instância. As consultas memorizadas são descartadas pelos métodos que alteram a
+                solicitação ou por invalidar_cache.
+            historico_persistente(HistoryStore): Armazenamento local do histórico das solicitações finalizadas,
+                utilizado por historico_tratado e filtrar_historico.
+            decodificacao_rapida(bool): Indica se o histórico e os dados do formulário devem ser decodificados
+                diretamente das respostas do ECM, sem os objetos intermediários do zeep.
         """
+        self.url_servidor = url_servidor
         self.id_processo = id_processo
         self.numero_solicitacao = numero_solicitacao
         self.numero_ficha = numero_ficha
+        self.__campos = frozenset()
+        self.formulario = None
         self.usuario = usuario
+        self.concorrencia = concorrencia
+        self.cache = cache
+        self.historico_persistente = historico_persistente
+        self.decodificacao_rapida = decodificacao_rapida
+        self.__snapshot = {}
 
-        # instâncias dos serviços
+        # Instâncias dos serviços. Os clientes zeep são criados apenas no primeiro uso e compartilhados pelo processo.
         self.__workflowservice = WorkflowEngineService(url_servidor, user=usuario, password=senha,
                                                        company_id=id_empresa, user_id=usuario_responsavel)
         self.__documentservice = DocumentService(url_servidor, user=usuario, password=senha, company_id=id_empresa,
@@ -35,59 +59,190 @@ class BaseService:
         self.__cardservice = CardService(url_servidor, user=usuario, password=senha, company_id=id_empresa,
                                          user_id=usuario_responsavel)
 
+    @property
+    def descritor(self):
+        """Descritor serializável do serviço, para recriá-lo em outros processos. Veja mapear_solicitacoes."""
+        # Importado aqui, pois o módulo do descritor depende deste.
+        from .ServiceDescriptor import DescritorServico
+        return DescritorServico(self.url_servidor, self.usuario, self.__workflowservice.password,
+                                self.__workflowservice.user_id, id_processo=self.id_processo,
+                                numero_solicitacao=self.numero_solicitacao, numero_ficha=self.numero_ficha,
+                                id_empresa=self.__workflowservice.company_id, concorrencia=self.concorrencia,
+                                decodificacao_rapida=self.decodificacao_rapida)
+
     @staticmethod
-    def __analisar_retorno(data, pkey):
+    def _analisar_retorno(data, pkey):
         """Analisa o retorno do ECM em busca de informações."""
         for d in data:
             if d['key'] == pkey:
                 return d['value']
         return None
 
+    def __memorizar(self, consulta, funcao):
+        """Retorna o resultado da consulta, memorizado por solicitação caso o cache esteja habilitado."""
+        if not self.cache:
+            return funcao()
+        chave = (consulta, self.numero_solicitacao)
+        if chave not in self.__snapshot:
+            self.__snapshot[chave] = funcao()
+        return self.__snapshot[chave]
+
+    def __setattr__(self, name, value):
+        # Apenas os campos do formulário carregados como atributos também são alterados no formulário, que registra as
+        # alterações a serem enviadas por atualizar_formulario. Os demais atributos nunca são enviados.
+        if name in self.__dict__.get('_BaseService__campos', ()):
+            self.formulario[name] = value
+        super().__setattr__(name, value)
+
+    def invalidar_cache(self):
+        """Descarta as consultas memorizadas da solicitação."""
+        self.__snapshot.clear()
+
+    def __attachments_info(self):
+        """Consulta a lista de documentos relacionados ao processo."""
+        return self.__memorizar('attachments', lambda: self.__workflowservice.get_attachments(self.numero_solicitacao))
+
+    def __card_data(self):
+        """Consulta os dados do formulário da solicitação."""
+        return self.__card_data_de(self.numero_solicitacao)
+
+    def __card_data_de(self, numero):
+        if self.decodificacao_rapida:
+            return self.__workflowservice.get_instance_card_items(numero)
+        return self.__workflowservice.get_instance_card_data(numero)
+
+    @staticmethod
+    def _tratar_historico(historico):
+        """Transforma o histórico retornado pelo ECM numa lista de registros, um por tarefa."""
+        return [RegistroHistorico.da_tarefa(task) for etapa in historico for task in etapa.tasks]
+
+    @staticmethod
+    def _tratar_prazo(prazo):
+        """Transforma o objeto DeadLineDto retornado pelo ECM num dicionário."""
+        from zeep.helpers import serialize_object
+
+        return serialize_object(prazo, dict)
+
+    def _chave_prazo(self, data, segundos, prazo, period_id):
+        """Identificação de um cálculo de prazo no cache de prazos."""
+        return self.url_servidor.rstrip('/'), self.__workflowservice.company_id, data, segundos, prazo, period_id
+
+    def _atualizar_campos(self, campos_atualizar):
+        """Aplica os campos a atualizar ao formulário carregado, retornando apenas os campos alterados."""
+        for campo, valor in campos_atualizar.items():
+            if campo not in self.formulario:
+                raise Exception(f'O processo não possui o campo "{campo}".')
+            self.formulario[campo] = valor
+            if campo in self.__campos:
+                super().__setattr__(campo, valor)
+        return self.formulario.alteracoes
+
+    def _carregar_formulario(self, attachments_info, carddata):
+        """Carrega o número da ficha e os dados do formulário como atributos da solicitação.
+
+        Os campos com o nome de um atributo do serviço, como usuario ou cache, não são carregados como atributos, e
+        podem ser acessados apenas em formulario.
+        """
+        campos_anteriores = self.__campos
+        self.__campos = frozenset()
+        self.formulario = Formulario(carddata)
+
+        # Carrega o número da ficha, que é um dos anexos da solicitação.
+        for attachment in attachments_info:
+            attachment_sequence = int(attachment['attachmentSequence'])
+            if attachment_sequence == 1:
+                self.numero_ficha = int(attachment['documentId'])
+
+        # Carrega as informações do formulário como atributos da solicitação.
+        campos = set()
+        for item in carddata:
+            attribute = item['item'][0]
+            value = item['item'][1]
+            if attribute in campos_anteriores or not (attribute in self.__dict__ or hasattr(type(self), attribute)):
+                setattr(self, attribute, value)
+                campos.add(attribute)
+
+            # Carrega o id_processo. Poderia ser feito de outra forma
+            # mais elegante, mas assim os editores não apontam erro.
+            if attribute == 'WKDef':
+                self.id_processo = value
+        self.__campos = frozenset(campos)
+
+    @staticmethod
+    def _montar_anexos(attachments_info, documents_info, registros=False):
+        """Monta o dicionário de anexos a partir das informações dos anexos e dos respectivos documentos.
+
+        Com registros, os anexos são registros compactos (RegistroAnexo); caso contrário, dicionários.
+        """
+        anexos = {}
+        for attachment, document_info in zip(attachments_info, documents_info):
+            registro = RegistroAnexo(attachment['colleagueId'], int(attachment['documentId']), document_info['version'],
+                                     document_info.get('caminho'))
+            anexos[document_info['phisical_file']] = registro if registros else registro._asdict()
+        return anexos
+
     @property
     def anexos(self):
         """Retorna os anexos do processo. Não inclui os conteúdos por uma questão de otimização."""
-        assert self.numero_solicitacao is not None, 'Informe o número da solicitação cujos anexos deseja.'
+        return self.listar_anexos()
 
-        attachments = {}
+    def listar_anexos(self, com_conteudo=False, diretorio=None, registros=False):
+        """Retorna os anexos do processo, opcionalmente baixando os conteúdos para um diretório.
 
-        # Consulta a lista de documentos relacionados ao processo.
-        attachments_info = self.__workflowservice.get_attachments(self.numero_solicitacao)
-        for attachment in attachments_info:
-            attachment_sequence = int(attachment['attachmentSequence'])
+        Args:
+            com_conteudo(bool): Indica se os conteúdos dos anexos devem ser baixados.
+            diretorio(str): Diretório onde os conteúdos dos anexos serão gravados.
+            registros(bool): Indica se os anexos devem ser retornados como registros compactos (RegistroAnexo), somente
+                leitura, no lugar de dicionários.
+
+        Returns:
+            dict: Anexos do processo, identificados pelo nome do arquivo físico. Quando os conteúdos são baixados,
+                cada anexo informa também o caminho do arquivo gravado.
+        """
+        assert self.numero_solicitacao is not None, 'Informe o número da solicitação cujos anexos deseja.'
+        assert not com_conteudo or diretorio is not None, 'Informe o diretório onde os anexos serão gravados.'
+
+        # Consulta a lista de documentos relacionados ao processo, excluindo o primeiro anexo da lista, que é o
+        # formulário do processo.
+        attachments_info = [attachment for attachment in self.__attachments_info()
+                            if int(attachment['attachmentSequence']) > 1]
+
+        def consultar_documento(attachment):
+            version = attachment['version'] if 'version' in attachment else None
+            document_info = self.__documentservice.get_active_document_info(
+                int(attachment['documentId']), attachment['colleagueId'], int(version) if version is not None else None)
+
+            # Baixa o conteúdo do documento diretamente para o arquivo de destino.
+            if com_conteudo:
+                document_info = dict(document_info,
+                                     caminho=os.path.join(diretorio, os.path.basename(document_info['phisical_file'])))
+                self.__documentservice.download_document_content(int(attachment['documentId']),
+                                                                 attachment['colleagueId'], document_info['version'],
+                                                                 document_info['phisical_file'],
+                                                                 document_info['caminho'])
+            return document_info
+
+        # Consulta as informações dos documentos em paralelo, mantendo a ordem da lista de anexos.
+        if len(attachments_info) > 1 and self.concorrencia > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concorrencia, len(attachments_info))) as executor:
+                documents_info = list(executor.map(consultar_documento, attachments_info))
+        else:
+            documents_info = [consultar_documento(attachment) for attachment in attachments_info]
 
-            # Exclui o primeiro anexo da lista, que é o formulário do processo.
-            if attachment_sequence > 1:
-                # Armazena as informações do documento.
-                document_id = int(attachment['documentId'])
-                colleague_id = attachment['colleagueId']
-
-                # Consulta as informações do documento.
-                document_info = self.__documentservice.get_active_document(document_id, colleague_id)[0]
-                phisical_file = document_info['phisicalFile']
-                version = int(document_info['version'])
-
-                # Consulta o conteúdo do documento.
-                # document_content = self.__documentservice.get_document_content(document_id, colleague_id, version,
-                #                                                                phisical_file)
-
-                # Adiciona o anexo ao dicionário de anexos.
-                attachments[phisical_file] = {
-                    'colleague_id': colleague_id,
-                    'document_id': document_id,
-                    'version': version,
-                    # 'document_content': document_content,
-                }
-        return attachments
+        return self._montar_anexos(attachments_info, documents_info, registros)
 
     @property
     def atividade_atual(self):
         """Retorna a atividade no qual o processo se encontra atualmente."""
         assert self.numero_solicitacao is not None, 'Informe o número do processo cuja atividade atual deseja.'
-        rs = self.__workflowservice.get_all_active_states(self.numero_solicitacao)
-        if rs:
-            return [int(n) for n in rs]
-        else:
-            return [-1]
+
+        def consultar():
+            rs = self.__workflowservice.get_all_active_states(self.numero_solicitacao)
+            if rs:
+                return [int(n) for n in rs]
+            else:
+                return [-1]
+        return self.__memorizar('atividade_atual', consultar)
 
     @property
     def finalizado(self):
@@ -98,47 +253,71 @@ class BaseService:
     def historico(self):
         """Histórico da solicitação."""
         assert self.numero_solicitacao is not None, 'Informe o número do processo cujo histórico deseja.'
-        rs = self.__workflowservice.get_histories(self.numero_solicitacao)
+        rs = self.__memorizar('historico', lambda: self.__workflowservice.get_histories(self.numero_solicitacao))
         return rs
 
     @property
     def historico_tratado(self):
-        """Retorna o histórico da solicitação de forma tratada."""
-        historico = self.historico
-        rs = list()
-        for etapa in historico:
-            for task in etapa.tasks:
-                data_hora = task.taskCompletionDate + timedelta(seconds=task.taskCompletionHour) \
-                    if task.taskCompletionDate else None
-                data_hora_formatada = data_hora.strftime('%d/%m/%Y %H:%M') if task.taskCompletionDate \
-                    else u'Tarefa não finalizada'
-                rs.append({
-                    'data_hora': data_hora,
-                    'data_hora_formatada': data_hora_formatada,
-                    'proxima_atividade': int(task.choosedSequence),
-                    'observacao': task.taskObservation,
-                    'colleague_id': task.colleagueId,
-                    'texto': task.historCompleteColleague,
-                    'nome_responsavel': task.historCompleteColleague.split('\n')[0]
-                })
+        """Retorna o histórico da solicitação de forma tratada, com um dicionário por tarefa.
+
+        Com o armazenamento persistente, o histórico das solicitações finalizadas é consultado no ECM uma única vez.
+        """
+        return [registro._asdict() for registro in self.registros_historico]
+
+    @property
+    def registros_historico(self):
+        """Retorna o histórico tratado da solicitação como registros compactos (RegistroHistorico), somente leitura,
+        que ocupam menos memória que os dicionários de historico_tratado."""
+        return self.__memorizar('historico_tratado', self.__historico_tratado)
+
+    def __consultar_historico_tratado(self, numero):
+        if self.decodificacao_rapida:
+            return self.__workflowservice.get_history_records(numero)
+        return self._tratar_historico(self.__workflowservice.get_histories(numero))
+
+    def __historico_tratado(self):
+        assert self.numero_solicitacao is not None, 'Informe o número do processo cujo histórico deseja.'
+        if self.historico_persistente is None:
+            return self.__consultar_historico_tratado(self.numero_solicitacao)
+
+        rs = self.historico_persistente.obter(self.url_servidor, self.numero_solicitacao)
+        if rs is None:
+            # A situação é consultada antes do histórico: apenas o histórico consultado após a finalização está
+            # completo e pode ser armazenado.
+            finalizado = self.finalizado
+            rs = self.__consultar_historico_tratado(self.numero_solicitacao)
+            if finalizado:
+                self.historico_persistente.salvar(self.url_servidor, self.numero_solicitacao, rs)
         return rs
 
     @property
     def responsavel_atual(self):
         """Id do responsável atual da solicitação."""
-        return self.historico_tratado[0]['colleague_id']
+        return self.registros_historico[0].colleague_id
 
-    def atualizar_formulario(self, dados_formulario):
-        """Atualiza o formulário da solicitação.
+    def atualizar_formulario(self, dados_formulario=None):
+        """Atualiza o formulário da solicitação. Apenas os campos informados são enviados ao ECM.
 
         Args:
-            dados_formulario(dict): Dicionário com os dados a serem atualizados no formulário.
+            dados_formulario(dict): Dicionário com os dados a serem atualizados no formulário. Se não for informado,
+                são enviados os campos do formulário carregado que foram alterados, como atributos da solicitação ou
+                em formulario.
 
         Returns:
-            dict: Resultado da atualização da solicitação.
+            dict: Resultado da atualização da solicitação, ou None caso não haja alterações a enviar.
         """
         assert self.numero_ficha is not None, 'Informe o número da ficha que deseja atualizar.'
-        result = self.__cardservice.update_card_data(self.numero_ficha, dados_formulario)
+        if dados_formulario is None:
+            assert self.formulario is not None, 'Carregue a solicitação antes de enviar as alterações do formulário.'
+            dados_formulario = self.formulario.alteracoes
+            if not dados_formulario:
+                return None
+        try:
+            result = self.__cardservice.update_card_data(self.numero_ficha, dados_formulario)
+        finally:
+            self.invalidar_cache()
+        if self.formulario is not None:
+            self.formulario.confirmar(dados_formulario)
         return result
 
     def avancar(self, n_atividade, colleague_ids=None, manager_mode=False, observacao=u'Avançado automaticamente'):
@@ -155,13 +334,18 @@ class BaseService:
         """
         user = colleague_ids if colleague_ids else self.usuario
         assert self.numero_solicitacao is not None, 'Informe o número da solicitação que deseja avançar.'
-        result = self.__workflowservice.save_and_send_task_classic(self.numero_solicitacao, n_atividade, [user],
-                                                                   observacao, {}, manager_mode=manager_mode)
+        try:
+            result = self.__workflowservice.save_and_send_task_classic(self.numero_solicitacao, n_atividade, [user],
+                                                                       observacao, {}, manager_mode=manager_mode)
+        finally:
+            self.invalidar_cache()
         return result
 
     def calcular_prazo(self, data, segundos, prazo, period_id):
         """Calcula o prazo de uma atividade considerando um expediente.
 
+        Os prazos calculados são memorizados por uma hora para todas as instâncias do processo.
+
         Args:
             data(str): Data no formato yyy-MM-dd.
             segundos(int): Quantidade de segundos após a meia noite.
@@ -171,11 +355,29 @@ class BaseService:
         Returns:
             dict: Resultado do cálculo de prazo.
         """
-        prazo = self.__workflowservice.calculate_deadline_hours(data=data, segundos=segundos, prazo=prazo,
-                                                                period_id=period_id)
-        prazo_str = prazo.__str__().replace('\'', '"')
-        prazo_dict = json.loads(prazo_str)
-        return prazo_dict
+        chave = self._chave_prazo(data, segundos, prazo, period_id)
+        rs = prazos.get(chave)
+        if rs is None:
+            rs = self._tratar_prazo(self.__workflowservice.calculate_deadline_hours(data=data, segundos=segundos,
+                                                                                   prazo=prazo, period_id=period_id))
+            prazos.set(chave, rs)
+        return dict(rs)
+
+    def calcular_prazos(self, entradas):
+        """Calcula em paralelo os prazos de várias atividades, consultando o ECM uma única vez por cálculo distinto.
+
+        Args:
+            entradas(iterable): Argumentos de cada cálculo, na ordem de calcular_prazo: data, segundos, prazo e
+                código de expediente.
+
+        Returns:
+            list: Resultado de cada cálculo, na ordem das entradas.
+        """
+        entradas = [tuple(entrada) for entrada in entradas]
+        distintas = list(dict.fromkeys(entradas))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concorrencia, len(distintas)))) as executor:
+            resultados = dict(zip(distintas, executor.map(lambda entrada: self.calcular_prazo(*entrada), distintas)))
+        return [dict(resultados[entrada]) for entrada in entradas]
 
     def cancelar_solicitacao(self, mensagem):
         """Cancela a solicitação.
@@ -187,7 +389,10 @@ class BaseService:
             dict: Resultado do cancelamento da solicitação.
         """
         assert self.numero_solicitacao is not None, 'Informe o número do processo que deseja cancelar.'
-        result = self.__workflowservice.cancel_instance(self.numero_solicitacao, mensagem)
+        try:
+            result = self.__workflowservice.cancel_instance(self.numero_solicitacao, mensagem)
+        finally:
+            self.invalidar_cache()
         return result
 
     def carregar_solicitacao(self):
@@ -198,25 +403,9 @@ class BaseService:
         """
         assert self.numero_solicitacao is not None, 'Informe o número do processo que deseja carregar.'
 
-        # Carrega o número da ficha, que é um dos anexos da solicitação.
-        attachments_info = self.__workflowservice.get_attachments(self.numero_solicitacao)
-        for attachment in attachments_info:
-            attachment_sequence = int(attachment['attachmentSequence'])
-            if attachment_sequence == 1:
-                self.numero_ficha = int(attachment['documentId'])
-
-        # Carrega as informações do formulário como atributos da solicitação.
-        result = self.__workflowservice.get_instance_card_data(self.numero_solicitacao)
-        for item in result:
-            attribute = item['item'][0]
-            value = item['item'][1]
-            setattr(self, attribute, value)
-
-            # Carrega o id_processo. Poderia ser feito de outra forma
-            # mais elegante, mas assim os editores não apontam erro.
-            if attribute == 'WKDef':
-                self.id_processo = value
-
+        attachments_info = self.__attachments_info()
+        result = self.__memorizar('formulario', self.__card_data)
+        self._carregar_formulario(attachments_info, result)
         return result
 
     def filtrar_historico(self, sequencia, excluir_automaticos=True):
@@ -228,13 +417,104 @@ class BaseService:
         Returns:
             list: Resultado do filtro do histórico.
         """
-        rs = [h for h in self.historico_tratado if h['proxima_atividade'] in sequencia]
+        if self.historico_persistente is not None:
+            # Os históricos armazenados são filtrados por consultas indexadas no próprio banco de dados.
+            rs = self.historico_persistente.filtrar(self.url_servidor, self.numero_solicitacao, sequencia,
+                                                    excluir_automaticos)
+            if rs is not None:
+                return [h._asdict() for h in rs]
+
+        rs = [h for h in self.registros_historico if h.proxima_atividade in sequencia]
 
         # Aplica o filtro caso seja necessário excluir os históricos automáticos.
         if excluir_automaticos:
-            rs = [h for h in rs if not h['colleague_id'].startswith('Pool')]
+            rs = [h for h in rs if not (h.colleague_id or '').startswith('Pool')]
 
-        return rs
+        return [h._asdict() for h in rs]
+
+    def historicos_colunares(self, numeros_solicitacao):
+        """Consulta em paralelo os históricos de várias solicitações, retornando-os em colunas.
+
+        Os históricos disponíveis no armazenamento persistente não são consultados no ECM.
+
+        Args:
+            numeros_solicitacao(list): Números das solicitações.
+
+        Returns:
+            HistoricoColunar: Tarefas dos históricos, na ordem das solicitações informadas.
+        """
+        numeros_solicitacao = list(numeros_solicitacao)
+
+        def consultar(numero):
+            if self.historico_persistente is not None:
+                rs = self.historico_persistente.obter(self.url_servidor, numero)
+                if rs is not None:
+                    return rs
+            if self.decodificacao_rapida:
+                return self.__workflowservice.get_history_records(numero)
+            return self.__workflowservice.get_histories(numero)
+
+        colunas = HistoricoColunar()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concorrencia, len(numeros_solicitacao)))) as executor:
+            for numero, historico in zip(numeros_solicitacao, executor.map(consultar, numeros_solicitacao)):
+                colunas.adicionar(numero, historico)
+        return colunas
+
+    def projetar_campos(self, campos, numeros_solicitacao=None, limite_campos=LIMITE_CAMPOS_INDIVIDUAIS):
+        """Consulta em paralelo apenas alguns campos do formulário de várias solicitações.
+
+        Com poucos campos, cada campo é consultado individualmente com getCardValue. Com mais campos que o limite, o
+        formulário de cada solicitação é consultado uma única vez, e apenas os campos informados são mantidos. Ao
+        contrário de carregar_solicitacao, os anexos não são consultados e os campos não são carregados como atributos.
+
+        Args:
+            campos(list): Nomes dos campos do formulário.
+            numeros_solicitacao(list): Números das solicitações. Por padrão, a solicitação da instância.
+            limite_campos(int): Quantidade máxima de campos consultados individualmente.
+
+        Returns:
+            TabelaCampos: Valores dos campos, identificados pelo número de cada solicitação.
+        """
+        campos, numeros_solicitacao = self._preparar_projecao(campos, numeros_solicitacao)
+        individuais = len(campos) <= limite_campos
+
+        def consultar(consulta):
+            if individuais:
+                return self.__workflowservice.get_card_value(*consulta)
+            return self._projetar_formulario(self.__card_data_de(consulta), campos)
+
+        # Com os campos consultados individualmente, cada campo de cada solicitação é uma consulta.
+        consultas = [(numero, campo) for numero in numeros_solicitacao for campo in campos] if individuais \
+            else numeros_solicitacao
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concorrencia, len(consultas)))) as executor:
+            resultados = list(executor.map(consultar, consultas))
+        return self._montar_tabela(campos, numeros_solicitacao, resultados, individuais)
+
+    def _preparar_projecao(self, campos, numeros_solicitacao):
+        """Remove os campos e solicitações repetidos, utilizando a solicitação da instância por padrão."""
+        if numeros_solicitacao is None:
+            assert self.numero_solicitacao is not None, 'Informe as solicitações cujos campos deseja.'
+            numeros_solicitacao = [self.numero_solicitacao]
+        return list(dict.fromkeys(campos)), list(dict.fromkeys(int(numero) for numero in numeros_solicitacao))
+
+    @staticmethod
+    def _projetar_formulario(carddata, campos):
+        """Retorna os valores dos campos informados a partir do formulário inteiro de uma solicitação."""
+        formulario = {item['item'][0]: item['item'][1] for item in carddata or ()}
+        return [formulario.get(campo) for campo in campos]
+
+    @staticmethod
+    def _montar_tabela(campos, numeros_solicitacao, resultados, individuais):
+        """Monta a tabela dos campos projetados, a partir dos valores de cada campo ou de cada solicitação."""
+        tabela = TabelaCampos(campos)
+        if individuais:
+            valores = iter(resultados)
+            for numero in numeros_solicitacao:
+                tabela.adicionar(numero, [next(valores) for _ in campos])
+        else:
+            for numero, linha in zip(numeros_solicitacao, resultados):
+                tabela.adicionar(numero, linha)
+        return tabela
 
     def iniciar_solicitacao(self, dados_formulario, ids_destinatarios, comentarios, anexos=None, completar=True,
                             numero_atividade=0, gestor_processo=False):
@@ -244,7 +524,9 @@ class BaseService:
             dados_formulario(dict): Número da solicitação.
             ids_destinatarios(list):
             comentarios(str): Comentário que fica registrado como
-            anexos(dict): Dicionário com nome e conteúdo dos anexos.
+            anexos(dict): Dicionário com nome e informações dos anexos: descrição ('description') e conteúdo ('content'),
+                caminho ('path') ou objeto de arquivo ('file'). Anexos informados por caminho ou objeto de arquivo são
+                enviados sem serem carregados em memória.
             completar(bool): Indica se a tarefa deve ser completada ou apenas salva.
             numero_atividade(int): Número da atividade.
             gestor_processo(bool): Indica se a solicitação está sendo iniciada por um gestor do processo.
@@ -260,13 +542,13 @@ class BaseService:
                                                               attachments=anexos, complete_task=completar,
                                                               choosed_state=numero_atividade,
                                                               manager_mode=gestor_processo)
-        iprocess = self.__analisar_retorno(result, 'iProcess')
+        iprocess = self._analisar_retorno(result, 'iProcess')
         if iprocess:
             self.numero_solicitacao = iprocess
-            self.numero_ficha = self.__analisar_retorno(result, 'WDNrDocto')
+            self.numero_ficha = self._analisar_retorno(result, 'WDNrDocto')
             return result
         else:
-            erro = self.__analisar_retorno(result, 'ERROR')
+            erro = self._analisar_retorno(result, 'ERROR')
             raise Exception(erro)
 
     def movimentar(self, origem, destino, observacao='Movimentado automaticamente', **campos_atualizar):
@@ -282,21 +564,14 @@ class BaseService:
         Returns:
             dict: Resultado da movimentação da solicitação.
         """
-        carddata = self.carregar_solicitacao()
-        if not self.finalizado:
-            if self.atividade_atual[0] == origem:
-                # Caso haja campos para atualizar antes de avançar o processo.
-                if campos_atualizar:
-                    for campo, valor in campos_atualizar.items():
-                        if hasattr(self, campo):
-                            for obj in carddata:
-                                item = obj['item']
-                                nome = item[0]
-                                if nome == campo:
-                                    item[1] = valor
-                        else:
-                            raise Exception(f'O processo não possui o campo "{campo}".')
-                    self.atualizar_formulario(carddata)
+        self.carregar_solicitacao()
+        atividade_atual = self.atividade_atual
+        if atividade_atual != [-1]:
+            if atividade_atual[0] == origem:
+                # Caso haja campos alterados, atualiza apenas esses campos antes de avançar o processo.
+                alteracoes = self._atualizar_campos(campos_atualizar)
+                if alteracoes:
+                    self.atualizar_formulario(alteracoes)
                 return self.avancar(destino, observacao=observacao, manager_mode=True)
             else:
                 raise Exception(f'O processo não está na atividade de origem esperada.')
@@ -0,0 +1,54 @@
+
+from copy import deepcopy
+
+# Quantidade de campos a partir da qual os dados do formulário são montados diretamente no envelope.
+BULK_THRESHOLD = 50
+
+
+class BulkCardData:
+    """Dados de um formulário grande, montados diretamente no envelope SOAP, sem um objeto do zeep por campo.
+
+    O zeep monta o parâmetro com um único campo, que serve de modelo para os demais: cada campo é uma cópia do elemento
+    do modelo, com o nome e o valor substituídos. O envelope resultante é idêntico ao montado pelo zeep.
+    """
+
+    def __init__(self, data, array_type, item_type, key_name):
+        """Inicia os dados do formulário.
+
+        Args:
+            data(dict): Nome e valor de cada campo.
+            array_type(zeep.xsd.ComplexType): Tipo do array de campos, como keyValueDtoArray.
+            item_type(zeep.xsd.ComplexType): Tipo de cada campo, como keyValueDto.
+            key_name(str): Nome do elemento com o nome do campo, como key ou field.
+        """
+        self.data = data
+        self.array_type = array_type
+        self.item_type = item_type
+        self.key_name = key_name
+
+    def template(self):
+        """Retorna o parâmetro do zeep com um único campo, cujo elemento serve de modelo para os demais."""
+        key = next(iter(self.data))
+        return self.array_type(item=[self.item_type(**{self.key_name: key, 'value': ''})])
+
+    def render(self, element):
+        """Substitui o campo modelo do elemento do parâmetro, já montado pelo zeep, por todos os campos."""
+        from lxml import etree
+        from zeep.xsd.types.builtins import String
+
+        xmlvalue = String().xmlvalue
+        model = element[0]
+        element.remove(model)
+        for key, value in self.data.items():
+            item = deepcopy(model)
+            for child in list(item):
+                localname = etree.QName(child).localname
+                if localname == self.key_name:
+                    child.text = xmlvalue(key)
+                elif localname == 'value':
+                    # Assim como o zeep, omite o elemento do valor quando o valor é None.
+                    if value is None:
+                        item.remove(child)
+                    else:
+                        child.text = xmlvalue(value)
+            element.append(item)
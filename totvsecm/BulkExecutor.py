@@ -0,0 +1,140 @@
+
+import time
+from array import array
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .BaseService import BaseService
+from .RateLimiter import limiting, rate_limiters
+
+Operacao = namedtuple('Operacao', ['metodo', 'numero_solicitacao', 'argumentos', 'numero_ficha'])
+Operacao.__new__.__defaults__ = (None, None, None)
+Operacao.__doc__ = """Operação a ser executada em lote.
+
+Args:
+    metodo(str): Nome do método de BaseService, como avancar ou cancelar_solicitacao.
+    numero_solicitacao(int): Número da solicitação. Não é necessário para iniciar_solicitacao.
+    argumentos(dict): Argumentos do método.
+    numero_ficha(int): Número da ficha, necessário para atualizar_formulario.
+"""
+
+Resultado = namedtuple('Resultado', ['operacao', 'resultado', 'erro', 'latencia'])
+Resultado.__doc__ = """Resultado de uma operação executada em lote: retorno ou exceção e latência em segundos."""
+
+
+def percentil(valores, p):
+    """Retorna o percentil p (entre 0 e 100) de uma sequência ordenada de valores."""
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, int(round(p / 100.0 * (len(valores) - 1))))]
+
+
+class RelatorioThroughput(namedtuple('RelatorioThroughput', ['total', 'erros', 'duracao', 'ops_por_segundo',
+                                                             'p50', 'p95'])):
+    """Resumo da execução de um lote: quantidade de operações e erros, duração, vazão e latências em segundos."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return '%d operações (%d erros) em %.1f s: %.1f ops/s, p50 %.0f ms, p95 %.0f ms' % (
+            self.total, self.erros, self.duracao, self.ops_por_segundo, (self.p50 or 0) * 1000,
+            (self.p95 or 0) * 1000)
+
+
+class BulkExecutor:
+    """Executa operações de workflow em lote, num pool limitado de threads que compartilham os clientes do servidor.
+
+    Os resultados são retornados à medida que as operações terminam, e apenas uma janela limitada de operações é lida
+    da entrada e mantida em memória, de forma que lotes de qualquer tamanho podem ser processados.
+
+    Uso:
+        executor = BulkExecutor(url_servidor, usuario, senha, usuario_responsavel, limite_por_segundo=50)
+        for resultado in executor.executar(Operacao('avancar', n, {'n_atividade': 5}) for n in numeros):
+            ...
+        print(executor.relatorio)
+    """
+
+    METODOS = ('iniciar_solicitacao', 'avancar', 'movimentar', 'cancelar_solicitacao', 'atualizar_formulario')
+
+    def __init__(self, url_servidor, usuario, senha, usuario_responsavel, id_processo=None, id_empresa=1,
+                 max_workers=16, limite_por_segundo=None):
+        """Inicia o executor.
+
+        Args:
+            url_servidor(str): URL do servidor ECM.
+            usuario(str): Username do usuário do ECM.
+            senha(str): Senha do usuário do ECM.
+            usuario_responsavel(str): Username do usuário responsável no ECM.
+            id_processo(str): Identificador do processo, para iniciar_solicitacao.
+            id_empresa(int): Identificador da empresa no ECM.
+            max_workers(int): Quantidade máxima de operações simultâneas.
+            limite_por_segundo(float): Quantidade máxima de requisições SOAP por segundo ao servidor, contando cada
+                requisição das operações. O limite é compartilhado por todos os executores do processo que acessam o
+                mesmo servidor, e prevalece o último informado.
+        """
+        self.conexao = dict(url_servidor=url_servidor, usuario=usuario, senha=senha,
+                            usuario_responsavel=usuario_responsavel, id_processo=id_processo, id_empresa=id_empresa)
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiters.get(url_servidor, limite_por_segundo) if limite_por_segundo else None
+        self.__latencias = array('d')
+        self.__erros = 0
+        self.__inicio = None
+        self.__fim = None
+
+    def _executar_operacao(self, operacao):
+        """Executa uma operação, retornando o seu resultado. Operações não suportadas são retornadas com erro."""
+        inicio = time.perf_counter()
+        try:
+            if operacao.metodo not in self.METODOS:
+                raise ValueError('Operação não suportada: %s.' % operacao.metodo)
+            servico = BaseService(numero_solicitacao=operacao.numero_solicitacao, numero_ficha=operacao.numero_ficha,
+                                  concorrencia=1, **self.conexao)
+            # O limite é aplicado a cada requisição SOAP da operação, e não apenas ao início da operação.
+            with limiting(self.rate_limiter):
+                resultado = getattr(servico, operacao.metodo)(**(operacao.argumentos or {}))
+            return Resultado(operacao, resultado, None, time.perf_counter() - inicio)
+        except Exception as e:
+            return Resultado(operacao, None, e, time.perf_counter() - inicio)
+
+    def executar(self, operacoes):
+        """Executa as operações, retornando os resultados à medida que terminam.
+
+        Args:
+            operacoes(iterable): Operações a serem executadas. Podem ser do tipo Operacao ou tuplas equivalentes.
+
+        Returns:
+            generator: Resultado de cada operação, na ordem em que terminam. Erros são retornados no resultado, sem
+                interromper o lote.
+        """
+        self.__latencias = array('d')
+        self.__erros = 0
+        self.__inicio = time.perf_counter()
+        operacoes = iter(operacoes)
+        pendentes = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                # Mantém apenas uma janela limitada de operações pendentes.
+                for operacao in operacoes:
+                    operacao = Operacao(*operacao)
+                    pendentes.add(executor.submit(self._executar_operacao, operacao))
+                    if len(pendentes) >= 2 * self.max_workers:
+                        break
+                if not pendentes:
+                    break
+
+                concluidas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for future in concluidas:
+                    resultado = future.result()
+                    self.__latencias.append(resultado.latencia)
+                    self.__erros += resultado.erro is not None
+                    self.__fim = time.perf_counter()
+                    yield resultado
+
+    @property
+    def relatorio(self):
+        """Resumo da última execução."""
+        latencias = sorted(self.__latencias)
+        duracao = (self.__fim - self.__inicio) if self.__fim is not None else 0.0
+        return RelatorioThroughput(total=len(latencias), erros=self.__erros, duracao=duracao,
+                                   ops_por_segundo=len(latencias) / duracao if duracao else 0.0,
+                                   p50=percentil(latencias, 50), p95=percentil(latencias, 95))
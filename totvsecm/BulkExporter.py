@@ -0,0 +1,349 @@
+
+import argparse
+import csv
+import getpass
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .BaseService import BaseService
+from .WorkflowEngineService import WorkflowEngineService
+
+# Tipos de registros exportados e os campos de cada um, na ordem das colunas dos arquivos CSV.
+CAMPOS = {
+    'historico': ('numero_solicitacao', 'data_hora', 'proxima_atividade', 'observacao', 'colleague_id', 'texto'),
+    'formulario': ('numero_solicitacao', 'campo', 'valor'),
+    'anexos': ('numero_solicitacao', 'sequencia', 'documento', 'versao', 'colleague_id', 'descricao', 'arquivo',
+               'tamanho', 'data_criacao'),
+}
+TIPOS = tuple(CAMPOS)
+
+# Campos do arquivo com as solicitações cuja exportação falhou.
+CAMPOS_ERROS = ('numero_solicitacao', 'erro')
+
+FORMATOS = ('jsonl', 'csv')
+
+CHECKPOINT = 'checkpoint.json'
+
+ResumoExportacao = namedtuple('ResumoExportacao', ['exportadas', 'erros', 'retomadas', 'duracao'])
+ResumoExportacao.__doc__ = """Resumo de uma exportação: solicitações exportadas e com erro nesta execução, solicitações
+já exportadas numa execução anterior e duração em segundos."""
+
+
+class _Arquivo:
+    """Arquivo de saída de um tipo de registro, gravado em partes confirmadas a cada checkpoint.
+
+    Com compressão, cada parte é um membro gzip completo, de forma que o arquivo é válido após cada checkpoint e pode
+    ser truncado no fim de qualquer parte para retomar a exportação.
+    """
+
+    def __init__(self, caminho, campos, formato, comprimir, posicao):
+        self.campos = campos
+        self.formato = formato
+        self.comprimir = comprimir
+        self.raw = open(caminho, 'r+b' if os.path.exists(caminho) else 'w+b')
+        # Descarta o que foi gravado após o último checkpoint.
+        self.raw.truncate(posicao)
+        self.raw.seek(posicao)
+        self.__abrir()
+        if posicao == 0 and formato == 'csv':
+            self.writer.writerow(campos)
+
+    def __abrir(self):
+        self.stream = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=6) if self.comprimir else self.raw
+        self.texto = io.TextIOWrapper(self.stream, encoding='utf-8', newline='', write_through=True)
+        self.writer = csv.writer(self.texto) if self.formato == 'csv' else None
+
+    def gravar(self, registro):
+        if self.writer is not None:
+            self.writer.writerow([registro[campo] for campo in self.campos])
+        else:
+            self.texto.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+
+    def __encerrar_parte(self):
+        # Libera o arquivo sem fechá-lo e, com compressão, grava o fim do membro gzip.
+        self.texto.detach()
+        if self.comprimir:
+            self.stream.close()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+
+    def confirmar(self):
+        """Grava em disco os registros da parte atual, retornando a posição confirmada do arquivo."""
+        self.__encerrar_parte()
+        posicao = self.raw.tell()
+        self.__abrir()
+        return posicao
+
+    def fechar(self):
+        self.__encerrar_parte()
+        self.raw.close()
+
+
+def _texto(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def _campo(objeto, nome):
+    return objeto[nome] if nome in objeto else None
+
+
+class BulkExporter:
+    """Exporta o histórico tratado, os dados do formulário e os anexos de muitas solicitações para arquivos JSONL ou
+    CSV, opcionalmente comprimidos com gzip.
+
+    As solicitações são consultadas em paralelo, num pool limitado de threads que compartilham os clientes do servidor,
+    e os registros são gravados à medida que as consultas terminam, com memória constante para qualquer quantidade de
+    solicitações. O progresso é registrado periodicamente no diretório de destino, e uma exportação interrompida é
+    retomada a partir do último checkpoint quando executada novamente com as mesmas solicitações. Cada tipo de registro
+    é gravado num arquivo próprio, como historico.jsonl.gz, e as falhas são registradas no arquivo de erros.
+
+    Uso:
+        exporter = BulkExporter(url_servidor, usuario, senha, usuario_responsavel, '/dados/exportacao', comprimir=True)
+        resumo = exporter.exportar(range(1, 500001))
+    """
+
+    def __init__(self, url_servidor, usuario, senha, usuario_responsavel, destino, tipos=TIPOS, formato='jsonl',
+                 comprimir=False, id_empresa=1, max_workers=8, intervalo_checkpoint=500, decodificacao_rapida=True):
+        """Inicia o exportador.
+
+        Args:
+            url_servidor(str): URL do servidor ECM.
+            usuario(str): Username do usuário do ECM.
+            senha(str): Senha do usuário do ECM.
+            usuario_responsavel(str): Username do usuário responsável no ECM.
+            destino(str): Diretório dos arquivos exportados e do checkpoint.
+            tipos(iterable): Tipos de registros exportados: historico, formulario e anexos.
+            formato(str): Formato dos arquivos: jsonl ou csv.
+            comprimir(bool): Indica se os arquivos devem ser comprimidos com gzip.
+            id_empresa(int): Identificador da empresa no ECM.
+            max_workers(int): Quantidade máxima de solicitações consultadas simultaneamente.
+            intervalo_checkpoint(int): Quantidade de solicitações exportadas entre os checkpoints.
+            decodificacao_rapida(bool): Indica se o histórico e o formulário devem ser decodificados diretamente das
+                respostas do ECM.
+        """
+        tipos = tuple(tipos)
+        assert tipos and all(tipo in CAMPOS for tipo in tipos), 'Os tipos exportados devem estar entre %s.' % (TIPOS,)
+        assert formato in FORMATOS, 'O formato deve ser jsonl ou csv.'
+        self.tipos = tipos
+        self.formato = formato
+        self.comprimir = comprimir
+        self.destino = destino
+        self.max_workers = max_workers
+        self.intervalo_checkpoint = intervalo_checkpoint
+        self.decodificacao_rapida = decodificacao_rapida
+        self.__workflowservice = WorkflowEngineService(url_servidor, user=usuario, password=senha,
+                                                       company_id=id_empresa, user_id=usuario_responsavel)
+
+    def caminho(self, tipo):
+        """Caminho do arquivo de um tipo de registro, ou do arquivo de erros com tipo erros."""
+        return os.path.join(self.destino, '%s.%s%s' % (tipo, self.formato, '.gz' if self.comprimir else ''))
+
+    @property
+    def caminho_checkpoint(self):
+        return os.path.join(self.destino, CHECKPOINT)
+
+    def _configuracao(self):
+        return {'tipos': list(self.tipos), 'formato': self.formato, 'comprimir': self.comprimir}
+
+    def _carregar_checkpoint(self):
+        """Retorna o checkpoint da exportação anterior, ou um checkpoint vazio."""
+        try:
+            with open(self.caminho_checkpoint) as fh:
+                checkpoint = json.load(fh)
+        except FileNotFoundError:
+            return {'configuracao': self._configuracao(), 'posicao': 0, 'concluidas': [], 'arquivos': {}}
+        assert checkpoint['configuracao'] == self._configuracao(), \
+            'O destino contém uma exportação com outra configuração: %s.' % checkpoint['configuracao']
+        return checkpoint
+
+    def _gravar_checkpoint(self, checkpoint):
+        # O checkpoint é substituído de forma atômica, para que uma interrupção nunca deixe um checkpoint incompleto.
+        temporario = self.caminho_checkpoint + '.tmp'
+        with open(temporario, 'w') as fh:
+            json.dump(checkpoint, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temporario, self.caminho_checkpoint)
+
+    def _consultar(self, numero):
+        """Consulta os registros de uma solicitação.
+
+        Returns:
+            dict: Registros de cada tipo exportado.
+        """
+        registros = {}
+        if 'historico' in self.tipos:
+            if self.decodificacao_rapida:
+                historico = self.__workflowservice.get_history_records(numero)
+            else:
+                historico = BaseService._tratar_historico(self.__workflowservice.get_histories(numero))
+            registros['historico'] = [
+                {'numero_solicitacao': numero, 'data_hora': _texto(tarefa.data_hora),
+                 'proxima_atividade': tarefa.proxima_atividade, 'observacao': tarefa.observacao,
+                 'colleague_id': tarefa.colleague_id, 'texto': tarefa.texto}
+                for tarefa in historico
+            ]
+        if 'formulario' in self.tipos:
+            if self.decodificacao_rapida:
+                itens = self.__workflowservice.get_instance_card_items(numero)
+            else:
+                itens = self.__workflowservice.get_instance_card_data(numero)
+            registros['formulario'] = [{'numero_solicitacao': numero, 'campo': item['item'][0],
+                                        'valor': item['item'][1]} for item in itens or ()]
+        if 'anexos' in self.tipos:
+            registros['anexos'] = [
+                {'numero_solicitacao': numero, 'sequencia': _campo(anexo, 'attachmentSequence'),
+                 'documento': _campo(anexo, 'documentId'), 'versao': _campo(anexo, 'version'),
+                 'colleague_id': _campo(anexo, 'colleagueId'), 'descricao': _campo(anexo, 'description'),
+                 'arquivo': _campo(anexo, 'fileName'), 'tamanho': _campo(anexo, 'size'),
+                 'data_criacao': _texto(_campo(anexo, 'createDate'))}
+                for anexo in self.__workflowservice.get_attachments(numero) or ()
+            ]
+        return registros
+
+    def exportar(self, numeros_solicitacao):
+        """Exporta as solicitações, retomando a exportação anterior do mesmo destino, caso exista.
+
+        Args:
+            numeros_solicitacao(iterable): Números das solicitações, sempre na mesma ordem, como um range ou as linhas
+                de um arquivo. Numa retomada, as solicitações já exportadas são ignoradas pela posição na sequência.
+
+        Returns:
+            ResumoExportacao: Resumo da exportação.
+        """
+        os.makedirs(self.destino, exist_ok=True)
+        checkpoint = self._carregar_checkpoint()
+        posicao = checkpoint['posicao']
+        # Posições já exportadas após a primeira ainda pendente. Limitadas às solicitações em andamento.
+        concluidas = set(checkpoint['concluidas'])
+        retomadas = posicao + len(concluidas)
+
+        campos = {tipo: CAMPOS[tipo] for tipo in self.tipos}
+        campos['erros'] = CAMPOS_ERROS
+        arquivos = {tipo: _Arquivo(self.caminho(tipo), campos[tipo], self.formato, self.comprimir,
+                                   checkpoint['arquivos'].get(tipo, 0)) for tipo in campos}
+
+        def confirmar():
+            checkpoint['arquivos'] = {tipo: arquivo.confirmar() for tipo, arquivo in arquivos.items()}
+            checkpoint['posicao'] = posicao
+            checkpoint['concluidas'] = sorted(concluidas)
+            self._gravar_checkpoint(checkpoint)
+
+        inicio = time.perf_counter()
+        exportadas = erros = desde_checkpoint = 0
+        gravando = False
+        numeros = enumerate(numeros_solicitacao)
+        pendentes = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while True:
+                # Mantém apenas uma janela limitada de solicitações em andamento.
+                for indice, numero in numeros:
+                    if indice < posicao or indice in concluidas:
+                        continue
+                    pendentes[executor.submit(self._consultar, numero)] = (indice, numero)
+                    if len(pendentes) >= 2 * self.max_workers:
+                        break
+                if not pendentes:
+                    break
+
+                concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for future in concluidos:
+                    indice, numero = pendentes.pop(future)
+                    gravando = True
+                    try:
+                        for tipo, registros in future.result().items():
+                            for registro in registros:
+                                arquivos[tipo].gravar(registro)
+                        exportadas += 1
+                    except Exception as e:
+                        arquivos['erros'].gravar({'numero_solicitacao': numero, 'erro': repr(e)})
+                        erros += 1
+                    gravando = False
+
+                    concluidas.add(indice)
+                    while posicao in concluidas:
+                        concluidas.remove(posicao)
+                        posicao += 1
+                    desde_checkpoint += 1
+
+                if desde_checkpoint >= self.intervalo_checkpoint:
+                    confirmar()
+                    desde_checkpoint = 0
+        finally:
+            for future in pendentes:
+                future.cancel()
+            executor.shutdown(wait=True)
+            # Uma interrupção durante a gravação de uma solicitação mantém o checkpoint anterior, e os registros
+            # gravados desde então são descartados na retomada.
+            if not gravando:
+                confirmar()
+            for arquivo in arquivos.values():
+                arquivo.fechar()
+
+        return ResumoExportacao(exportadas, erros, retomadas, time.perf_counter() - inicio)
+
+
+def ler_numeros(caminho):
+    """Retorna os números de solicitação de um arquivo, um por linha, ignorando as linhas vazias e os comentários."""
+    with open(caminho) as fh:
+        for linha in fh:
+            linha = linha.split('#', 1)[0].strip()
+            if linha:
+                yield int(linha)
+
+
+def main(argv=None):
+    """Exporta solicitações pela linha de comando. A senha é lida da variável TOTVSECM_SENHA ou solicitada."""
+    parser = argparse.ArgumentParser(
+        prog='totvsecm-exportar',
+        description='Exporta o histórico, o formulário e os anexos de solicitações do ECM para JSONL ou CSV. Uma '
+                    'exportação interrompida é retomada ao executar o mesmo comando novamente.')
+    parser.add_argument('url_servidor')
+    parser.add_argument('usuario')
+    parser.add_argument('destino', help='Diretório dos arquivos exportados e do checkpoint.')
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument('--intervalo', nargs=2, type=int, metavar=('INICIO', 'FIM'),
+                        help='Números das solicitações, de INICIO a FIM, inclusive.')
+    origem.add_argument('--arquivo', help='Arquivo com um número de solicitação por linha.')
+    parser.add_argument('--usuario-responsavel', help='Por padrão, o próprio usuário.')
+    parser.add_argument('--id-empresa', type=int, default=1)
+    parser.add_argument('--tipos', nargs='+', default=list(TIPOS), help='Tipos exportados: %s.' % ', '.join(TIPOS))
+    parser.add_argument('--formato', default='jsonl', help='jsonl ou csv.')
+    parser.add_argument('--gzip', action='store_true', help='Comprime os arquivos com gzip.')
+    parser.add_argument('--workers', type=int, default=8, help='Solicitações consultadas simultaneamente.')
+    parser.add_argument('--checkpoint', type=int, default=500, help='Solicitações exportadas entre os checkpoints.')
+    args = parser.parse_args(argv)
+    if args.formato not in FORMATOS:
+        parser.error('Formato desconhecido: %s.' % args.formato)
+    for tipo in args.tipos:
+        if tipo not in CAMPOS:
+            parser.error('Tipo desconhecido: %s.' % tipo)
+
+    senha = os.environ.get('TOTVSECM_SENHA') or getpass.getpass('Senha de %s: ' % args.usuario)
+    if args.intervalo:
+        numeros = range(args.intervalo[0], args.intervalo[1] + 1)
+    else:
+        numeros = ler_numeros(args.arquivo)
+
+    exporter = BulkExporter(args.url_servidor, args.usuario, senha, args.usuario_responsavel or args.usuario,
+                            args.destino, tipos=args.tipos, formato=args.formato, comprimir=args.gzip,
+                            id_empresa=args.id_empresa, max_workers=args.workers,
+                            intervalo_checkpoint=args.checkpoint)
+    try:
+        resumo = exporter.exportar(numeros)
+    except KeyboardInterrupt:
+        print('Exportação interrompida. Execute o mesmo comando para retomá-la.', file=sys.stderr)
+        return 130
+    print('%d solicitações exportadas, %d com erro e %d já exportadas anteriormente, em %.1f s.' % resumo)
+    return 1 if resumo.erros else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
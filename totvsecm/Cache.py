@@ -0,0 +1,71 @@
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """Cache em memória, seguro entre threads, com tamanho máximo e validade opcional dos itens."""
+
+    def __init__(self, maxsize=1024, timeout=None):
+        """Inicia o cache.
+
+        Args:
+            maxsize(int): Quantidade máxima de itens. Os itens usados há mais tempo são descartados primeiro.
+            timeout(float): Tempo de validade dos itens, em segundos. Se None, os itens não expiram.
+        """
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def get(self, key, default=None):
+        """Retorna o valor armazenado para a chave, ou o valor padrão caso não exista ou esteja expirado."""
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self.__items[key]
+                return default
+            self.__items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Armazena o valor para a chave."""
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self.__lock:
+            self.__items[key] = value, expires
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.maxsize:
+                self.__items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove a chave do cache, retornando o valor armazenado."""
+        with self.__lock:
+            item = self.__items.pop(key, None)
+        return item[0] if item is not None else default
+
+    def discard(self, predicate):
+        """Remove os itens cujas chaves atendem ao predicado."""
+        with self.__lock:
+            for key in [key for key in self.__items if predicate(key)]:
+                del self.__items[key]
+
+    def clear(self):
+        """Remove todos os itens do cache."""
+        with self.__lock:
+            self.__items.clear()
+
+
+# Prazos já calculados, compartilhados pelos serviços síncronos e assíncronos e identificados pelo servidor, empresa,
+# data, segundos, prazo e expediente. Os prazos expiram para que as alterações nos expedientes e feriados cadastrados
+# no ECM sejam consideradas.
+prazos = LRUCache(maxsize=100000, timeout=3600)
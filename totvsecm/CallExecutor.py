@@ -0,0 +1,429 @@
+
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from threading import Event, Lock
+
+from .Instrumentation import finalizar_tentativa, iniciar_tentativa, registrar_intervalo
+from .RateLimiter import current_limiter
+
+# Operações de consulta, que podem ser repetidas após uma falha sem alterar nada no ECM. As demais operações, como
+# startProcessClassic e saveAndSendTaskClassic, nunca são repetidas.
+IDEMPOTENT_OPERATIONS = frozenset((
+    'calculateDeadLineHours', 'getActiveDocument', 'getAllActiveStates', 'getAttachments', 'getCardValue',
+    'getDocumentContent', 'getHistories', 'getInstanceCardData',
+))
+
+# Operações que transferem o conteúdo dos documentos e anexos, cuja latência depende do tamanho do conteúdo e não
+# indica a sobrecarga do servidor.
+TRANSFER_OPERATIONS = frozenset(('getDocumentContent', 'startProcessClassic'))
+
+# Status HTTP com os quais o servidor indica que está sobrecarregado ou indisponível.
+OVERLOAD_STATUS = (429, 502, 503, 504)
+
+# Marca a ausência de um tempo máximo próprio da operação em execução.
+_UNSET = object()
+
+# Tempo máximo da operação em execução no contexto atual (thread ou tarefa asyncio), lido pelos transportes.
+_timeout = ContextVar('totvsecm_timeout', default=_UNSET)
+
+
+def operation_timeout(default):
+    """Retorna o tempo máximo da operação em execução, ou o tempo informado caso a operação não tenha um próprio.
+
+    Args:
+        default(float): Tempo máximo padrão do transporte, em segundos.
+
+    Returns:
+        float: Tempo máximo, em segundos, ou None se não há limite.
+    """
+    timeout = _timeout.get()
+    return default if timeout is _UNSET else timeout
+
+
+def is_overload(error):
+    """Indica se a falha é causada pela indisponibilidade ou sobrecarga do servidor, e não pela própria operação.
+
+    Apenas essas falhas são repetidas: os erros retornados pelo ECM (Fault) indicam que a operação foi processada.
+    """
+    import requests
+    from zeep.exceptions import TransportError
+
+    if isinstance(error, TransportError):
+        return error.status_code in OVERLOAD_STATUS
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+class AdaptiveLimiter:
+    """Limita a quantidade de chamadas simultâneas a um servidor, ajustando o limite à resposta do servidor (AIMD).
+
+    A cada chamada bem-sucedida, o limite cresce de forma aditiva, em uma chamada a cada janela de chamadas. Quando a
+    latência de uma operação sobe além da tolerância em relação à sua latência de referência, ou o servidor falha por
+    sobrecarga, o limite é reduzido de forma multiplicativa, no máximo uma vez por janela: apenas as chamadas iniciadas
+    após a última redução podem reduzi-lo novamente. A latência das operações isentas, como as transferências de
+    conteúdo, não reduz o limite. O limitador é compartilhado entre threads e loops asyncio.
+    """
+
+    # Quantidade de chamadas de uma operação antes que a sua latência de referência seja utilizada.
+    MIN_SAMPLES = 10
+
+    def __init__(self, initial=32, minimum=1, maximum=100, decrease=0.5, latency_tolerance=3.0,
+                 latency_exempt=TRANSFER_OPERATIONS):
+        """Inicia o limitador.
+
+        Args:
+            initial(int): Limite inicial de chamadas simultâneas.
+            minimum(int): Limite mínimo.
+            maximum(int): Limite máximo.
+            decrease(float): Fator aplicado ao limite a cada redução.
+            latency_tolerance(float): Razão entre a latência de uma chamada e a latência de referência da operação a
+                partir da qual o servidor é considerado sobrecarregado.
+            latency_exempt(iterable): Nomes das operações cuja latência não é considerada.
+        """
+        assert 1 <= minimum <= initial <= maximum, 'Os limites de chamadas simultâneas são inválidos.'
+        assert 0 < decrease < 1, 'O fator de redução deve estar entre 0 e 1.'
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_exempt = frozenset(latency_exempt)
+        self.__limit = float(initial)
+        self.__in_flight = 0
+        self.__waiters = deque()
+        self.__baselines = {}
+        self.__reduced_at = 0.0
+        self.__lock = Lock()
+
+    @property
+    def limit(self):
+        """Limite atual de chamadas simultâneas."""
+        return int(self.__limit)
+
+    @property
+    def in_flight(self):
+        """Quantidade de chamadas em andamento."""
+        return self.__in_flight
+
+    def __wake(self):
+        # Repassa as vagas livres diretamente às chamadas que aguardam, na ordem de chegada.
+        while self.__waiters and self.__in_flight < int(self.__limit):
+            waiter = self.__waiters.popleft()
+            self.__in_flight += 1
+            if isinstance(waiter, Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_set_result, future)
+
+    def acquire(self):
+        """Aguarda uma vaga para uma chamada.
+
+        Returns:
+            float: Início da chamada, a ser informado em release.
+        """
+        with self.__lock:
+            if self.__in_flight < int(self.__limit) and not self.__waiters:
+                self.__in_flight += 1
+                return time.monotonic()
+            event = Event()
+            self.__waiters.append(event)
+        event.wait()
+        return time.monotonic()
+
+    async def aacquire(self):
+        """Versão assíncrona de acquire."""
+        import asyncio
+
+        with self.__lock:
+            if self.__in_flight < int(self.__limit) and not self.__waiters:
+                self.__in_flight += 1
+                return time.monotonic()
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self.__waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.__lock:
+                if waiter in self.__waiters:
+                    self.__waiters.remove(waiter)
+                    raise
+            # A vaga já havia sido repassada a esta chamada.
+            self.release(None, None, False)
+            raise
+        return time.monotonic()
+
+    def release(self, operation, start, overloaded):
+        """Libera a vaga de uma chamada, ajustando o limite.
+
+        Args:
+            operation(str): Nome da operação, ou None se a chamada não chegou a ser feita.
+            start(float): Início da chamada, retornado por acquire.
+            overloaded(bool): Indica se a chamada falhou por sobrecarga do servidor.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            self.__in_flight -= 1
+            if operation is not None:
+                if not overloaded and operation not in self.latency_exempt:
+                    overloaded = self.__slow(operation, now - start)
+                if overloaded:
+                    if start >= self.__reduced_at:
+                        self.__limit = max(self.minimum, self.__limit * self.decrease)
+                        self.__reduced_at = now
+                else:
+                    self.__limit = min(self.maximum, self.__limit + 1 / self.__limit)
+            self.__wake()
+
+    def __slow(self, operation, latency):
+        """Atualiza a latência de referência da operação, indicando se a chamada excedeu a tolerância."""
+        count, baseline = self.__baselines.get(operation, (0, latency))
+        # A referência acompanha imediatamente as quedas de latência, e apenas lentamente as subidas.
+        if latency < baseline:
+            baseline = latency
+        else:
+            baseline += (latency - baseline) * 0.01
+        self.__baselines[operation] = (count + 1, baseline)
+        return count >= self.MIN_SAMPLES and latency > baseline * self.latency_tolerance
+
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CallExecutor:
+    """Executa as chamadas aos serviços do ECM, aplicando os tempos máximos por operação, as novas tentativas das
+    operações de consulta e, opcionalmente, o limite adaptativo de chamadas simultâneas de cada servidor.
+
+    As novas tentativas são feitas apenas para as operações idempotentes, e apenas após falhas de conexão, tempo
+    esgotado ou sobrecarga do servidor, aguardando um intervalo aleatório que cresce exponencialmente.
+
+    Cada requisição, inclusive as novas tentativas, aguarda também o limitador de requisições por segundo aplicado ao
+    contexto com RateLimiter.limiting, como nos executores em lote.
+
+    Uso:
+        call_executor.configure(timeouts={'getHistories': 120}, retries=3, adaptive=True, max_limit=20)
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__limiters = {}
+        self.configure()
+
+    def configure(self, timeouts=None, retries=2, backoff=0.2, max_backoff=5.0, idempotent=IDEMPOTENT_OPERATIONS,
+                  adaptive=False, initial_limit=32, min_limit=1, max_limit=100, latency_tolerance=3.0,
+                  latency_exempt=TRANSFER_OPERATIONS):
+        """Configura a execução das chamadas. Os limitadores já criados são descartados.
+
+        Args:
+            timeouts(dict): Tempo máximo de cada operação, em segundos, pelo nome da operação. As demais operações
+                utilizam o operation_timeout do registro de clientes.
+            retries(int): Quantidade máxima de novas tentativas das operações idempotentes.
+            backoff(float): Intervalo base entre as tentativas, em segundos, dobrado a cada tentativa.
+            max_backoff(float): Intervalo máximo entre as tentativas, em segundos.
+            idempotent(iterable): Nomes das operações que podem ser repetidas.
+            adaptive(bool): Indica se as chamadas simultâneas a cada servidor devem ser limitadas. Desativado por
+                padrão.
+            initial_limit(int): Limite inicial de chamadas simultâneas por servidor.
+            min_limit(int): Limite mínimo de chamadas simultâneas por servidor.
+            max_limit(int): Limite máximo de chamadas simultâneas por servidor.
+            latency_tolerance(float): Razão entre a latência de uma chamada e a latência de referência da operação a
+                partir da qual o limite é reduzido.
+            latency_exempt(iterable): Nomes das operações cuja latência não reduz o limite.
+        """
+        assert retries >= 0, 'A quantidade de novas tentativas não pode ser negativa.'
+        self.timeouts = dict(timeouts or {})
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idempotent = frozenset(idempotent)
+        self.adaptive = adaptive
+        self.limiter_options = dict(initial=initial_limit, minimum=min_limit, maximum=max_limit,
+                                    latency_tolerance=latency_tolerance, latency_exempt=latency_exempt)
+        with self.__lock:
+            self.__limiters = {}
+
+    def limiter(self, server):
+        """Retorna o limitador de chamadas simultâneas do servidor, criando-o caso ainda não exista."""
+        server = server.rstrip('/')
+        with self.__lock:
+            limiter = self.__limiters.get(server)
+            if limiter is None:
+                limiter = self.__limiters[server] = AdaptiveLimiter(**self.limiter_options)
+            return limiter
+
+    def timeout(self, operation, default):
+        """Retorna o tempo máximo da operação, ou o tempo informado caso a operação não tenha um próprio."""
+        return self.timeouts.get(operation, default)
+
+    def __attempts(self, operation):
+        return 1 + self.retries if operation in self.idempotent else 1
+
+    def __delay(self, attempt):
+        # Intervalo aleatório entre zero e o intervalo exponencial (full jitter), para espalhar as novas tentativas.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def execute(self, server, operation, function):
+        """Executa a função que envia a operação.
+
+        Args:
+            server(str): URL do servidor ECM.
+            operation(str): Nome da operação no webservice.
+            function(callable): Função que envia a operação.
+
+        Returns:
+            object: Resultado da função.
+        """
+        limiter = self.limiter(server) if self.adaptive else None
+        rate_limiter = current_limiter()
+        attempts = self.__attempts(operation)
+        for attempt in range(attempts):
+            waiting = time.perf_counter()
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            start = limiter.acquire() if limiter is not None else None
+            iniciar_tentativa(time.perf_counter() - waiting)
+            token = _timeout.set(self.timeouts[operation]) if operation in self.timeouts else None
+            try:
+                result = function()
+            except Exception as e:
+                overloaded = is_overload(e)
+                if limiter is not None:
+                    limiter.release(operation, start, overloaded)
+                if not overloaded or attempt == attempts - 1:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.release(operation, start, False)
+                return result
+            finally:
+                finalizar_tentativa()
+                if token is not None:
+                    _timeout.reset(token)
+            delay = self.__delay(attempt)
+            time.sleep(delay)
+            registrar_intervalo(delay)
+
+    async def aexecute(self, server, operation, function):
+        """Versão assíncrona de execute, para funções que retornam corrotinas."""
+        import asyncio
+
+        limiter = self.limiter(server) if self.adaptive else None
+        rate_limiter = current_limiter()
+        attempts = self.__attempts(operation)
+        for attempt in range(attempts):
+            waiting = time.perf_counter()
+            if rate_limiter is not None:
+                await rate_limiter.aacquire()
+            start = await limiter.aacquire() if limiter is not None else None
+            iniciar_tentativa(time.perf_counter() - waiting)
+            token = _timeout.set(self.timeouts[operation]) if operation in self.timeouts else None
+            try:
+                result = await function()
+            except asyncio.CancelledError:
+                if limiter is not None:
+                    limiter.release(None, None, False)
+                raise
+            except Exception as e:
+                overloaded = is_overload(e)
+                if limiter is not None:
+                    limiter.release(operation, start, overloaded)
+                if not overloaded or attempt == attempts - 1:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.release(operation, start, False)
+                return result
+            finally:
+                finalizar_tentativa()
+                if token is not None:
+                    _timeout.reset(token)
+            delay = self.__delay(attempt)
+            await asyncio.sleep(delay)
+            registrar_intervalo(delay)
+
+    def stream(self, server, operation, function):
+        """Executa a função que envia a operação e retorna as partes da resposta à medida que são lidas.
+
+        A vaga no limite de chamadas simultâneas é mantida até o fim da leitura, ou até o gerador ser fechado. As
+        novas tentativas são feitas apenas antes do recebimento da primeira parte.
+
+        Args:
+            server(str): URL do servidor ECM.
+            operation(str): Nome da operação no webservice.
+            function(callable): Função que envia a operação e retorna um iterável com as partes da resposta.
+
+        Returns:
+            generator: Partes da resposta.
+        """
+        limiter = self.limiter(server) if self.adaptive else None
+        rate_limiter = current_limiter()
+        attempts = self.__attempts(operation)
+        for attempt in range(attempts):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            start = limiter.acquire() if limiter is not None else None
+            received = False
+            try:
+                for chunk in function():
+                    received = True
+                    yield chunk
+            except GeneratorExit:
+                if limiter is not None:
+                    limiter.release(None, None, False)
+                raise
+            except Exception as e:
+                overloaded = is_overload(e)
+                if limiter is not None:
+                    limiter.release(operation, start, overloaded)
+                if received or not overloaded or attempt == attempts - 1:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.release(operation, start, False)
+                return
+            time.sleep(self.__delay(attempt))
+
+    async def astream(self, server, operation, function):
+        """Versão assíncrona de stream, para funções que retornam geradores assíncronos."""
+        import asyncio
+
+        limiter = self.limiter(server) if self.adaptive else None
+        rate_limiter = current_limiter()
+        attempts = self.__attempts(operation)
+        for attempt in range(attempts):
+            if rate_limiter is not None:
+                await rate_limiter.aacquire()
+            start = await limiter.aacquire() if limiter is not None else None
+            received = False
+            try:
+                async for chunk in function():
+                    received = True
+                    yield chunk
+            except (GeneratorExit, asyncio.CancelledError):
+                if limiter is not None:
+                    limiter.release(None, None, False)
+                raise
+            except Exception as e:
+                overloaded = is_overload(e)
+                if limiter is not None:
+                    limiter.release(operation, start, overloaded)
+                if received or not overloaded or attempt == attempts - 1:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.release(operation, start, False)
+                return
+            await asyncio.sleep(self.__delay(attempt))
+
+
+# Execução das chamadas aos serviços do processo.
+call_executor = CallExecutor()
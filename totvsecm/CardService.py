@@ -1,28 +1,20 @@
 
-from zeep import Client
+from .BulkCardData import BULK_THRESHOLD, BulkCardData
+from .SoapService import SoapService
 
 
-class CardService:
-    def __init__(self, server, user, password, company_id, user_id, process_id=None):
-        self.url = '%s/webdesk/CardService?wsdl' % server
-        self.client = Client(self.url)
-        self.user = user
-        self.password = password
-        self.company_id = company_id
-        self.user_id = user_id
-        self.process_id = process_id
+class CardService(SoapService):
+    service_name = 'CardService'
 
     def __get_card_data(self, data):
-        """Transforma o dicionário em parâmetros."""
+        """Transforma o dicionário em parâmetros. Formulários grandes são montados diretamente no envelope."""
 
         if bool(data):
             # Obtém classes do webservice.
-            try:
-                cf_dto_array = self.client.get_type('ns0:cardFieldDtoArray')
-                cf_dto = self.client.get_type('ns0:cardFieldDto')
-            except:
-                cf_dto_array = self.client.get_type('ns1:cardFieldDtoArray')
-                cf_dto = self.client.get_type('ns1:cardFieldDto')
+            cf_dto_array = self._get_type('cardFieldDtoArray')
+            cf_dto = self._get_type('cardFieldDto')
+            if len(data) >= BULK_THRESHOLD:
+                return BulkCardData(data, cf_dto_array, cf_dto, 'field')
 
             fields = []
             for k, v in data.items():
@@ -37,6 +29,6 @@ class CardService:
 
     def update_card_data(self, card_id, card_data):
         """Retorna o byte do arquivo físico de um documento, caso o usuário tenha permissão para acessá-lo."""
-        result = self.client.service.updateCardData(self.company_id, self.user, self.password,  card_id,
-                                                    cardData=self.__get_card_data(card_data))
+        result = self._send('updateCardData', self.company_id, self.user, self.password, card_id,
+                            cardData=self.__get_card_data(card_data))
         return result
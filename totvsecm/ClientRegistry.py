@@ -0,0 +1,234 @@
+
+from threading import Lock
+
+from .Instrumentation import instrumentacao
+from .WsdlCache import BUNDLED_DIR, BundledWsdlCache, WsdlCache
+
+# Modos de obtenção dos documentos WSDL e XSD.
+WSDL_ONLINE = 'online'
+WSDL_CACHE = 'cache'
+WSDL_BUNDLED = 'bundled'
+
+# Asserção de política com a qual o WSDL de um serviço anuncia o suporte a MTOM/XOP.
+MTOM_POLICY = b'OptimizedMimeSerialization'
+
+
+class ClientRegistry:
+    """Registro de clientes zeep compartilhados por todo o processo.
+
+    Cada cliente é identificado pela URL do servidor e pelo nome do serviço, sendo criado apenas no primeiro uso e
+    reutilizado por todas as instâncias dos serviços que apontam para o mesmo servidor, independentemente do usuário,
+    da senha ou do número da solicitação. Os clientes de um mesmo servidor também compartilham um único pool de
+    conexões HTTP persistentes.
+    """
+
+    def __init__(self):
+        self.__clients = {}
+        self.__locks = {}
+        self.__lock = Lock()
+        self.__wsdl_cache = None
+        self.__async_http = {}
+        self.__sessions = {}
+        self.__mtom = {}
+        self.wsdl_mode = WSDL_ONLINE
+        self.bundled_dir = BUNDLED_DIR
+        self.max_connections = 100
+        self.timeout = 300
+        self.operation_timeout = None
+        self.compress_requests = False
+        self.mtom = False
+        self.configuration = {}
+
+    def configure(self, wsdl_mode=WSDL_ONLINE, cache_dir=None, cache_timeout=WsdlCache.DEFAULT_TIMEOUT,
+                  bundled_dir=BUNDLED_DIR, max_connections=100, timeout=300, operation_timeout=None,
+                  compress_requests=False, mtom=False):
+        """Configura a obtenção dos documentos WSDL e XSD para os clientes criados a partir de então.
+
+        Args:
+            wsdl_mode(str): WSDL_ONLINE para baixar os documentos do servidor, WSDL_CACHE para mantê-los num cache
+                persistente em disco ou WSDL_BUNDLED para carregá-los de um snapshot local.
+            cache_dir(str): Diretório do cache persistente.
+            cache_timeout(int): Tempo de validade dos documentos do cache persistente, em segundos.
+            bundled_dir(str): Diretório do snapshot utilizado no modo WSDL_BUNDLED.
+            max_connections(int): Quantidade máxima de conexões HTTP persistentes por servidor.
+            timeout(float): Tempo máximo de obtenção dos documentos WSDL e XSD, em segundos.
+            operation_timeout(float): Tempo máximo de execução das operações, em segundos. Se None, não há limite.
+            compress_requests(bool): Indica se os envelopes enviados devem ser comprimidos com gzip. Deve ser habilitado
+                apenas para servidores que aceitam requisições comprimidas.
+            mtom(bool): Indica se o conteúdo dos documentos e dos anexos deve ser transferido em partes binárias
+                MTOM/XOP, sem codificação em base64, nos serviços cujo WSDL anuncia o suporte.
+        """
+        assert wsdl_mode in (WSDL_ONLINE, WSDL_CACHE, WSDL_BUNDLED), 'Modo de obtenção do WSDL inválido.'
+        # Argumentos da configuração, para que possa ser reaplicada em outros processos.
+        self.configuration = dict(wsdl_mode=wsdl_mode, cache_dir=cache_dir, cache_timeout=cache_timeout,
+                                  bundled_dir=bundled_dir, max_connections=max_connections, timeout=timeout,
+                                  operation_timeout=operation_timeout, compress_requests=compress_requests,
+                                  mtom=mtom)
+        self.wsdl_mode = wsdl_mode
+        self.bundled_dir = bundled_dir
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.operation_timeout = operation_timeout
+        self.compress_requests = compress_requests
+        self.mtom = mtom
+        self.__mtom = {}
+        self.__wsdl_cache = WsdlCache(cache_dir, cache_timeout) if wsdl_mode == WSDL_CACHE else None
+
+    @staticmethod
+    def key(server, service_name):
+        """Retorna a chave que identifica o cliente de um serviço num servidor."""
+        return server.rstrip('/'), service_name
+
+    @staticmethod
+    def wsdl_url(server, service_name):
+        """Retorna a URL do WSDL de um serviço do ECM."""
+        return '%s/webdesk/%s?wsdl' % (server.rstrip('/'), service_name)
+
+    def _wsdl_cache(self, server):
+        """Retorna o cache dos documentos WSDL e XSD conforme o modo configurado."""
+        if self.wsdl_mode == WSDL_BUNDLED:
+            return BundledWsdlCache(server, self.bundled_dir)
+        return self.__wsdl_cache
+
+    def _session(self, server):
+        """Retorna a sessão HTTP compartilhada pelos clientes do servidor, criando-a caso ainda não exista."""
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        with self.__lock:
+            session = self.__sessions.get(server)
+            if session is None:
+                session = Session()
+                adapter = HTTPAdapter(pool_maxsize=self.max_connections)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.__sessions[server] = session
+        return session
+
+    def _create_client(self, server, service_name):
+        """Cria o cliente zeep de um serviço, carregando e interpretando o WSDL."""
+        from zeep import Client
+
+        from .PooledTransport import PooledTransport
+
+        transport = PooledTransport(self._session(server), cache=self._wsdl_cache(server), timeout=self.timeout,
+                                    operation_timeout=self.operation_timeout,
+                                    compress_requests=self.compress_requests)
+        return Client(self.wsdl_url(server, service_name), transport=transport)
+
+    def _create_async_client(self, server, service_name):
+        """Cria o cliente zeep assíncrono de um serviço, compartilhando o pool de conexões HTTP do servidor."""
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('A API assíncrona requer o httpx. Instale com: pip install totvsecm[async]')
+        from zeep import AsyncClient
+
+        from .PooledTransport import AsyncPooledTransport
+
+        with self.__lock:
+            http_client = self.__async_http.get(server)
+            if http_client is None:
+                limits = httpx.Limits(max_connections=self.max_connections,
+                                      max_keepalive_connections=self.max_connections)
+                http_client = httpx.AsyncClient(limits=limits, timeout=self.operation_timeout)
+                self.__async_http[server] = http_client
+
+        transport = AsyncPooledTransport(http_client, cache=self._wsdl_cache(server), timeout=self.timeout,
+                                         compress_requests=self.compress_requests)
+        return AsyncClient(self.wsdl_url(server, service_name), transport=transport)
+
+    def __get(self, key, factory):
+        client = self.__clients.get(key)
+        if client is not None:
+            return client
+
+        # Cada chave possui sua própria trava, de forma que a criação de um cliente não bloqueia os demais.
+        with self.__lock:
+            lock = self.__locks.setdefault(key, Lock())
+        with lock:
+            client = self.__clients.get(key)
+            if client is None:
+                if instrumentacao.ativo:
+                    client = instrumentacao.medir(key[1], 'criar_cliente', lambda: factory(*key[:2]))
+                else:
+                    client = factory(*key[:2])
+                self.__clients[key] = client
+        return client
+
+    def get(self, server, service_name):
+        """Retorna o cliente do serviço, criando-o caso ainda não exista.
+
+        Args:
+            server(str): URL do servidor ECM.
+            service_name(str): Nome do serviço no ECM, como WorkflowEngineService.
+
+        Returns:
+            zeep.Client: Cliente do serviço.
+        """
+        return self.__get(self.key(server, service_name), self._create_client)
+
+    def get_async(self, server, service_name):
+        """Retorna o cliente assíncrono do serviço, criando-o caso ainda não exista.
+
+        Os clientes assíncronos de um mesmo servidor compartilham um único pool de conexões HTTP, que deve ser
+        utilizado num único event loop e encerrado com aclose.
+
+        Args:
+            server(str): URL do servidor ECM.
+            service_name(str): Nome do serviço no ECM, como WorkflowEngineService.
+
+        Returns:
+            zeep.AsyncClient: Cliente assíncrono do serviço.
+        """
+        return self.__get(self.key(server, service_name) + ('async',), self._create_async_client)
+
+    def supports_mtom(self, client):
+        """Indica se o conteúdo binário das operações do cliente deve ser transferido com MTOM/XOP.
+
+        O MTOM/XOP é utilizado apenas quando habilitado em configure e anunciado pela política do WSDL do serviço,
+        verificada uma única vez por serviço. Nos demais casos, o conteúdo é transferido em base64.
+
+        Args:
+            client(zeep.Client): Cliente do serviço, síncrono ou assíncrono.
+
+        Returns:
+            bool: True se o MTOM/XOP deve ser utilizado.
+        """
+        if not self.mtom:
+            return False
+        location = client.wsdl.location
+        supported = self.__mtom.get(location)
+        if supported is None:
+            # O documento é obtido do cache de WSDL, quando configurado.
+            supported = self.__mtom[location] = MTOM_POLICY in client.transport.load(location)
+        return supported
+
+    def disable_mtom(self, client):
+        """Deixa de utilizar o MTOM/XOP no serviço do cliente, após o servidor recusar uma requisição MTOM/XOP."""
+        self.__mtom[client.wsdl.location] = False
+
+    async def aclose(self):
+        """Encerra os pools de conexões dos clientes assíncronos, descartando esses clientes."""
+        with self.__lock:
+            http_clients = list(self.__async_http.values())
+            self.__async_http.clear()
+            for key in [key for key in self.__clients if key[2:] == ('async',)]:
+                del self.__clients[key]
+        for http_client in http_clients:
+            await http_client.aclose()
+
+    def clear(self):
+        """Descarta todos os clientes criados até o momento, encerrando as conexões HTTP dos clientes síncronos."""
+        with self.__lock:
+            self.__clients.clear()
+            self.__locks.clear()
+            self.__mtom.clear()
+            sessions = list(self.__sessions.values())
+            self.__sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+# Registro padrão, compartilhado por todos os serviços do processo.
+registry = ClientRegistry()
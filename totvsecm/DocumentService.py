@@ -1,17 +1,19 @@
 # -*- coding: utf-8 -*-
 
-from zeep import Client
+import os
 
+from .Cache import LRUCache
+from .CallExecutor import call_executor
+from .ClientRegistry import registry
+from .SoapService import SoapService
+from .Streaming import MTOM_UNSUPPORTED, iter_response_content
 
-class DocumentService:
-    def __init__(self, server, user, password, company_id, user_id, process_id=None):
-        self.url = '%s/webdesk/DocumentService?wsdl' % server
-        self.client = Client(self.url)
-        self.user = user
-        self.password = password
-        self.company_id = company_id
-        self.user_id = user_id
-        self.process_id = process_id
+# Informações dos documentos já consultados, identificadas pelo servidor, empresa, documento e versão.
+_document_info_cache = LRUCache(maxsize=10000)
+
+
+class DocumentService(SoapService):
+    service_name = 'DocumentService'
 
     def get_active_document(self, nr_document_id, colleague_id):
         """Retorna um documento ativo.
@@ -23,13 +25,42 @@ class DocumentService:
         Returns:
             list: Informações do documento.
         """
-        result = self.client.service.getActiveDocument(self.user, self.password, self.company_id, nr_document_id,
-                                                       colleague_id)
+        result = self._read('getActiveDocument', self.user, self.password, self.company_id, nr_document_id,
+                            colleague_id)
         return result
 
+    def get_active_document_info(self, nr_document_id, colleague_id, version=None):
+        """Retorna o nome do arquivo físico e a versão de um documento ativo.
+
+        Quando a versão é informada, o resultado é armazenado e as consultas seguintes ao mesmo documento e versão
+        não acessam o servidor.
+
+        Args:
+            nr_document_id(int): Número do documento.
+            colleague_id(str): Matrícula do colaborador.
+            version(int): Versão do documento, quando conhecida.
+
+        Returns:
+            dict: Nome do arquivo físico e versão do documento.
+        """
+        key = (self.server, self.company_id, nr_document_id, version)
+        info = _document_info_cache.get(key) if version is not None else None
+        if info is None:
+            document = self.get_active_document(nr_document_id, colleague_id)[0]
+            info = {
+                'phisical_file': document['phisicalFile'],
+                'version': int(document['version']),
+            }
+            if version is not None:
+                _document_info_cache.set(key, info)
+        return info
+
     def get_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo):
         """Retorna o byte do arquivo físico de um documento, caso o usuário tenha permissão para acessá-lo.
 
+        Com o MTOM/XOP habilitado no registro de clientes e anunciado pelo servidor, o conteúdo é recebido numa parte
+        binária, sem codificação em base64.
+
         Args:
             nr_document_id(int): Número do documento.
             colleague_id(str): Matrícula do colaborador.
@@ -39,8 +70,97 @@ class DocumentService:
         Returns:
             str: Conteúdo do documento.
         """
-        result = self.client.service.getDocumentContent(self.user, self.password, self.company_id, nr_document_id,
-                                                        colleague_id,
-                                                        documento_versao,
-                                                        nome_arquivo)
+        if registry.supports_mtom(self.client):
+            return self._execute('getDocumentContent', lambda: b''.join(self._document_content_chunks(
+                nr_document_id, colleague_id, documento_versao, nome_arquivo)))
+        result = self._send('getDocumentContent', self.user, self.password, self.company_id, nr_document_id,
+                            colleague_id, documento_versao, nome_arquivo)
         return result
+
+    def _document_content_request(self, nr_document_id, colleague_id, documento_versao, nome_arquivo):
+        """Cria a requisição da operação getDocumentContent, aceitando respostas MTOM/XOP quando habilitadas.
+
+        Returns:
+            tuple: Endereço do serviço, conteúdo do envelope e cabeçalhos HTTP.
+        """
+        address, message, headers = self._create_request('getDocumentContent', self.user, self.password,
+                                                         self.company_id, nr_document_id, colleague_id,
+                                                         documento_versao, nome_arquivo)
+        if registry.supports_mtom(self.client):
+            headers = dict(headers, Accept='multipart/related, text/xml')
+        return address, message, headers
+
+    def _document_content_chunks(self, nr_document_id, colleague_id, documento_versao, nome_arquivo,
+                                 chunk_size=64 * 1024):
+        """Envia a operação getDocumentContent em modo stream, sem passar pelo call_executor.
+
+        Se o servidor recusar a resposta MTOM/XOP, o conteúdo é pedido novamente em base64, que passa a ser utilizado
+        no serviço.
+
+        Returns:
+            generator: Partes do conteúdo do documento.
+        """
+        transport = self.client.transport
+        while True:
+            mtom = registry.supports_mtom(self.client)
+            address, message, headers = self._document_content_request(nr_document_id, colleague_id,
+                                                                       documento_versao, nome_arquivo)
+            response = transport.session.post(address, data=message, headers=headers, stream=True,
+                                              timeout=call_executor.timeout('getDocumentContent',
+                                                                            transport.operation_timeout))
+            if not (mtom and response.status_code in MTOM_UNSUPPORTED):
+                return iter_response_content(response, chunk_size)
+            response.close()
+            registry.disable_mtom(self.client)
+
+    def iter_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo,
+                              chunk_size=64 * 1024):
+        """Retorna o conteúdo do arquivo físico de um documento em partes, decodificadas à medida que a resposta é
+        recebida, de forma que o arquivo nunca é mantido inteiro em memória. As respostas MTOM/XOP também são aceitas.
+
+        A requisição é enviada pelo call_executor, que mantém a vaga no limite de chamadas simultâneas do servidor até
+        o fim da leitura. O gerador deve ser percorrido até o fim ou fechado.
+
+        Args:
+            nr_document_id(int): Número do documento.
+            colleague_id(str): Matrícula do colaborador.
+            documento_versao(int): Número da versão do documento.
+            nome_arquivo(str): Nome do arquivo.
+            chunk_size(int): Tamanho dos blocos lidos da conexão.
+
+        Returns:
+            generator: Partes do conteúdo do documento.
+        """
+        return call_executor.stream(self.server, 'getDocumentContent', lambda: self._document_content_chunks(
+            nr_document_id, colleague_id, documento_versao, nome_arquivo, chunk_size))
+
+    def download_document_content(self, nr_document_id, colleague_id, documento_versao, nome_arquivo, destino):
+        """Grava o conteúdo do arquivo físico de um documento num arquivo, à medida que a resposta é recebida.
+
+        Args:
+            nr_document_id(int): Número do documento.
+            colleague_id(str): Matrícula do colaborador.
+            documento_versao(int): Número da versão do documento.
+            nome_arquivo(str): Nome do arquivo.
+            destino(str|file): Caminho ou objeto de arquivo aberto para escrita binária.
+
+        Returns:
+            int: Quantidade de bytes gravados.
+        """
+        if not hasattr(destino, 'write'):
+            # O arquivo é aberto fora do try, para que apenas um arquivo criado aqui seja removido.
+            fh = open(destino, 'wb')
+            try:
+                with fh:
+                    return self.download_document_content(nr_document_id, colleague_id, documento_versao,
+                                                          nome_arquivo, fh)
+            except Exception:
+                # Não deixa arquivos incompletos no destino.
+                os.remove(destino)
+                raise
+
+        size = 0
+        for chunk in self.iter_document_content(nr_document_id, colleague_id, documento_versao, nome_arquivo):
+            destino.write(chunk)
+            size += len(chunk)
+        return size
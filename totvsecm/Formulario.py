@@ -0,0 +1,54 @@
+
+from collections.abc import MutableMapping
+
+
+class Formulario(MutableMapping):
+    """Dados do formulário de uma solicitação, com o registro dos campos alterados desde o carregamento.
+
+    Os campos podem ser lidos e alterados como num dicionário. Não é possível incluir nem remover campos.
+
+    Uso:
+        formulario = Formulario(carddata)
+        formulario['nome'] = 'Darth Vader'
+        formulario.alteracoes  # {'nome': 'Darth Vader'}
+    """
+
+    def __init__(self, carddata):
+        """Inicia o formulário.
+
+        Args:
+            carddata(list): Dados do formulário retornados pelo ECM, com o nome e o valor de cada campo.
+        """
+        self.__originais = {obj['item'][0]: obj['item'][1] for obj in carddata}
+        self.__valores = dict(self.__originais)
+
+    def __getitem__(self, campo):
+        return self.__valores[campo]
+
+    def __setitem__(self, campo, valor):
+        if campo not in self.__valores:
+            raise Exception(f'O processo não possui o campo "{campo}".')
+        self.__valores[campo] = valor
+
+    def __delitem__(self, campo):
+        raise TypeError('Os campos do formulário não podem ser removidos.')
+
+    def __iter__(self):
+        return iter(self.__valores)
+
+    def __len__(self):
+        return len(self.__valores)
+
+    def __repr__(self):
+        return 'Formulario(%r)' % self.__valores
+
+    @property
+    def alteracoes(self):
+        """Campos cujo valor foi alterado desde o carregamento ou a última confirmação."""
+        return {campo: valor for campo, valor in self.__valores.items() if valor != self.__originais[campo]}
+
+    def confirmar(self, campos):
+        """Registra os valores dos campos informados como enviados ao ECM, deixando de considerá-los alterados."""
+        for campo, valor in campos.items():
+            if campo in self.__originais:
+                self.__originais[campo] = self.__valores[campo] = valor
@@ -0,0 +1,134 @@
+
+import os
+import sqlite3
+from datetime import datetime
+from threading import Lock
+
+from .Records import RegistroHistorico
+
+# Colunas armazenadas, na ordem dos argumentos de RegistroHistorico. Os demais campos são calculados pelos registros.
+COLUNAS = RegistroHistorico.__slots__
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS solicitacao (
+    servidor TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    armazenado_em TEXT NOT NULL,
+    PRIMARY KEY (servidor, numero)
+);
+CREATE TABLE IF NOT EXISTS historico (
+    servidor TEXT NOT NULL,
+    numero INTEGER NOT NULL,
+    posicao INTEGER NOT NULL,
+    data_hora TEXT,
+    proxima_atividade INTEGER,
+    observacao TEXT,
+    colleague_id TEXT,
+    texto TEXT,
+    PRIMARY KEY (servidor, numero, posicao)
+);
+CREATE INDEX IF NOT EXISTS historico_proxima_atividade ON historico (servidor, numero, proxima_atividade);
+CREATE INDEX IF NOT EXISTS historico_colleague_id ON historico (servidor, numero, colleague_id);
+"""
+
+
+class HistoryStore:
+    """Armazena localmente, em SQLite, o histórico tratado das solicitações finalizadas, que não muda mais.
+
+    Os históricos são identificados pelo servidor e pelo número da solicitação. A mesma instância pode ser compartilhada
+    entre threads e entre instâncias de BaseService.
+
+    Uso:
+        historicos = HistoryStore()
+        servico = BaseService(url_servidor, usuario, senha, usuario_responsavel, numero_solicitacao=1234,
+                              historico_persistente=historicos)
+        servico.filtrar_historico([5, 7])
+    """
+
+    def __init__(self, path=None):
+        """Inicia o armazenamento, criando o banco de dados caso não exista.
+
+        Args:
+            path(str): Caminho do banco de dados. Por padrão, historico.sqlite3 no diretório de cache da biblioteca.
+        """
+        if path is None:
+            directory = os.path.expanduser(os.environ.get('TOTVSECM_CACHE_DIR') or os.path.join('~', '.cache',
+                                                                                                 'totvsecm'))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'historico.sqlite3')
+        self.path = path
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.executescript(ESQUEMA)
+
+    @staticmethod
+    def _servidor(servidor):
+        return servidor.rstrip('/')
+
+    @staticmethod
+    def _registro(row):
+        """Converte uma linha do banco de dados num registro do histórico tratado."""
+        data_hora = datetime.fromisoformat(row[0]) if row[0] is not None else None
+        return RegistroHistorico(data_hora, *row[1:])
+
+    def __consultar(self, sql, parametros):
+        with self.__lock:
+            return self.__connection.execute(sql, parametros).fetchall()
+
+    def contem(self, servidor, numero):
+        """Indica se o histórico da solicitação está armazenado."""
+        return bool(self.__consultar('SELECT 1 FROM solicitacao WHERE servidor = ? AND numero = ?',
+                                     (self._servidor(servidor), int(numero))))
+
+    def obter(self, servidor, numero):
+        """Retorna o histórico tratado da solicitação, ou None caso não esteja armazenado."""
+        if not self.contem(servidor, numero):
+            return None
+        rows = self.__consultar('SELECT %s FROM historico WHERE servidor = ? AND numero = ? ORDER BY posicao'
+                                % ', '.join(COLUNAS), (self._servidor(servidor), int(numero)))
+        return [self._registro(row) for row in rows]
+
+    def filtrar(self, servidor, numero, sequencia, excluir_automaticos=True):
+        """Filtra o histórico armazenado da solicitação, com os mesmos critérios de BaseService.filtrar_historico.
+
+        Returns:
+            list: Resultado do filtro, ou None caso o histórico não esteja armazenado.
+        """
+        if not self.contem(servidor, numero):
+            return None
+        sequencia = [int(s) for s in sequencia]
+        if not sequencia:
+            return []
+        sql = 'SELECT %s FROM historico WHERE servidor = ? AND numero = ? AND proxima_atividade IN (%s)' % (
+            ', '.join(COLUNAS), ', '.join('?' * len(sequencia)))
+        if excluir_automaticos:
+            # GLOB, ao contrário de LIKE, diferencia maiúsculas de minúsculas, assim como str.startswith. As tarefas
+            # sem responsável não são automáticas, e não são excluídas pela comparação com NULL.
+            sql += " AND (colleague_id IS NULL OR colleague_id NOT GLOB 'Pool*')"
+        rows = self.__consultar(sql + ' ORDER BY posicao', [self._servidor(servidor), int(numero)] + sequencia)
+        return [self._registro(row) for row in rows]
+
+    def salvar(self, servidor, numero, historico):
+        """Armazena o histórico tratado de uma solicitação finalizada, substituindo o anterior, caso exista."""
+        servidor, numero = self._servidor(servidor), int(numero)
+        rows = [(servidor, numero, posicao, registro['data_hora'].isoformat() if registro['data_hora'] else None)
+                + tuple(registro[coluna] for coluna in COLUNAS[1:]) for posicao, registro in enumerate(historico)]
+        with self.__lock, self.__connection:
+            self.__connection.execute('DELETE FROM historico WHERE servidor = ? AND numero = ?', (servidor, numero))
+            self.__connection.executemany('INSERT INTO historico VALUES (%s)' % ', '.join('?' * (3 + len(COLUNAS))),
+                                          rows)
+            self.__connection.execute('INSERT OR REPLACE INTO solicitacao VALUES (?, ?, ?)',
+                                      (servidor, numero, datetime.now().isoformat()))
+
+    def remover(self, servidor, numero):
+        """Remove o histórico armazenado da solicitação."""
+        servidor, numero = self._servidor(servidor), int(numero)
+        with self.__lock, self.__connection:
+            self.__connection.execute('DELETE FROM historico WHERE servidor = ? AND numero = ?', (servidor, numero))
+            self.__connection.execute('DELETE FROM solicitacao WHERE servidor = ? AND numero = ?', (servidor, numero))
+
+    def close(self):
+        """Fecha o banco de dados."""
+        with self.__lock:
+            self.__connection.close()
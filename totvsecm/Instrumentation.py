@@ -0,0 +1,293 @@
+
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+Medicao = namedtuple('Medicao', ['servico', 'operacao', 'duracao', 'serializacao', 'rede', 'interpretacao',
+                                 'bytes_enviados', 'bytes_recebidos', 'requisicoes', 'erro', 'espera', 'intervalo',
+                                 'tentativas'], defaults=(0.0, 0.0, 1))
+Medicao.__doc__ = """Medição de uma chamada a um serviço do ECM.
+
+As fases são medidas em segundos, dentro de cada tentativa, e somadas entre as tentativas: a serialização vai do
+início da tentativa até o envio da primeira requisição, a rede soma o tempo das requisições HTTP e a interpretação vai
+do recebimento da última resposta até o fim da tentativa. As fases são None quando as requisições não passam pelo
+transporte do zeep, como nos envios em stream. Na criação dos clientes (operação criar_cliente), a rede corresponde ao
+download dos WSDLs. A espera pelos limites de requisições por segundo e de chamadas simultâneas e os intervalos entre as
+tentativas são medidos à parte.
+
+Args:
+    servico(str): Nome do serviço, como WorkflowEngineService.
+    operacao(str): Nome da operação no webservice.
+    duracao(float): Duração total da chamada.
+    serializacao(float): Duração da montagem do envelope.
+    rede(float): Duração das requisições HTTP.
+    interpretacao(float): Duração da interpretação da resposta.
+    bytes_enviados(int): Tamanho das requisições enviadas, após a compressão.
+    bytes_recebidos(int): Tamanho das respostas recebidas.
+    requisicoes(int): Quantidade de requisições HTTP da chamada.
+    erro(Exception): Falha da chamada, ou None.
+    espera(float): Duração da espera pelos limites de requisições por segundo e de chamadas simultâneas do servidor.
+    intervalo(float): Duração dos intervalos aguardados antes das novas tentativas.
+    tentativas(int): Quantidade de tentativas da chamada.
+"""
+
+# Chamada em andamento no contexto atual (thread ou tarefa asyncio), atualizada pelo transporte e pelo call_executor.
+_chamada = ContextVar('totvsecm_chamada', default=None)
+
+
+class _Chamada:
+    __slots__ = ('inicio', 'inicio_tentativa', 'primeiro_envio', 'ultima_resposta', 'fases', 'serializacao', 'rede',
+                 'interpretacao', 'espera', 'intervalo', 'tentativas', 'bytes_enviados', 'bytes_recebidos',
+                 'requisicoes')
+
+    def __init__(self):
+        self.inicio = self.inicio_tentativa = time.perf_counter()
+        self.primeiro_envio = None
+        self.ultima_resposta = None
+        self.fases = False
+        self.serializacao = 0.0
+        self.rede = 0.0
+        self.interpretacao = 0.0
+        self.espera = 0.0
+        self.intervalo = 0.0
+        self.tentativas = 0
+        self.bytes_enviados = 0
+        self.bytes_recebidos = 0
+        self.requisicoes = 0
+
+    def registrar_requisicao(self, inicio, bytes_enviados, bytes_recebidos):
+        fim = time.perf_counter()
+        if self.primeiro_envio is None:
+            self.primeiro_envio = inicio
+        self.ultima_resposta = fim
+        self.rede += fim - inicio
+        self.bytes_enviados += bytes_enviados
+        self.bytes_recebidos += bytes_recebidos
+        self.requisicoes += 1
+
+    def iniciar_tentativa(self, espera):
+        self.espera += espera
+        self.inicio_tentativa = time.perf_counter()
+        self.primeiro_envio = None
+        self.tentativas += 1
+
+    def finalizar_tentativa(self):
+        if self.primeiro_envio is not None:
+            self.serializacao += self.primeiro_envio - self.inicio_tentativa
+            self.interpretacao += time.perf_counter() - self.ultima_resposta
+            self.primeiro_envio = None
+            self.fases = True
+
+    def medicao(self, servico, operacao, erro):
+        # As chamadas que não passam pelo call_executor, como a criação dos clientes, têm uma única tentativa.
+        self.finalizar_tentativa()
+        fim = time.perf_counter()
+        fases = (self.serializacao, self.rede, self.interpretacao) if self.fases else (None, None, None)
+        return Medicao(servico, operacao, fim - self.inicio, *fases, self.bytes_enviados, self.bytes_recebidos,
+                       self.requisicoes, erro, self.espera, self.intervalo, max(self.tentativas, 1))
+
+
+def registrar_requisicao(inicio, bytes_enviados, bytes_recebidos):
+    """Registra uma requisição HTTP na chamada em andamento. Utilizado pelos transportes.
+
+    Args:
+        inicio(float): Momento do envio, obtido com time.perf_counter.
+        bytes_enviados(int): Tamanho da requisição.
+        bytes_recebidos(int): Tamanho da resposta.
+    """
+    chamada = _chamada.get()
+    if chamada is not None:
+        chamada.registrar_requisicao(inicio, bytes_enviados, bytes_recebidos)
+
+
+def iniciar_tentativa(espera):
+    """Registra o início de uma tentativa da chamada em andamento. Utilizado pelo call_executor.
+
+    Args:
+        espera(float): Duração da espera pelos limites de requisições, em segundos.
+    """
+    chamada = _chamada.get()
+    if chamada is not None:
+        chamada.iniciar_tentativa(espera)
+
+
+def finalizar_tentativa():
+    """Registra o fim de uma tentativa da chamada em andamento. Utilizado pelo call_executor."""
+    chamada = _chamada.get()
+    if chamada is not None:
+        chamada.finalizar_tentativa()
+
+
+def registrar_intervalo(intervalo):
+    """Registra o intervalo aguardado antes de uma nova tentativa da chamada em andamento. Utilizado pelo call_executor.
+
+    Args:
+        intervalo(float): Duração do intervalo, em segundos.
+    """
+    chamada = _chamada.get()
+    if chamada is not None:
+        chamada.intervalo += intervalo
+
+
+class Instrumentacao:
+    """Mede as chamadas aos serviços do ECM e publica as medições para as funções registradas.
+
+    Enquanto nenhuma função está registrada, as chamadas não são medidas.
+
+    Uso:
+        metricas = Metricas()
+        with instrumentacao.coletando(metricas):
+            servico.movimentar(1, 5, nome='Darth Vader')
+        metricas.chamadas
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__callbacks = ()
+
+    @property
+    def ativo(self):
+        """Indica se há funções registradas para receber as medições."""
+        return bool(self.__callbacks)
+
+    def adicionar(self, callback):
+        """Registra uma função chamada com a Medicao de cada chamada, na thread que fez a chamada."""
+        with self.__lock:
+            self.__callbacks += (callback,)
+
+    def remover(self, callback):
+        """Remove uma função registrada."""
+        with self.__lock:
+            callbacks = list(self.__callbacks)
+            callbacks.remove(callback)
+            self.__callbacks = tuple(callbacks)
+
+    @contextmanager
+    def coletando(self, callback):
+        """Registra a função apenas durante o bloco with."""
+        self.adicionar(callback)
+        try:
+            yield callback
+        finally:
+            self.remover(callback)
+
+    def __publicar(self, medicao):
+        for callback in self.__callbacks:
+            callback(medicao)
+
+    def medir(self, servico, operacao, funcao):
+        """Executa a função, publicando a medição da chamada.
+
+        Args:
+            servico(str): Nome do serviço.
+            operacao(str): Nome da operação.
+            funcao(callable): Função que executa a chamada.
+
+        Returns:
+            object: Resultado da função.
+        """
+        chamada = _Chamada()
+        token = _chamada.set(chamada)
+        erro = None
+        try:
+            return funcao()
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            _chamada.reset(token)
+            self.__publicar(chamada.medicao(servico, operacao, erro))
+
+    async def amedir(self, servico, operacao, funcao):
+        """Versão assíncrona de medir, para funções que retornam corrotinas."""
+        chamada = _Chamada()
+        token = _chamada.set(chamada)
+        erro = None
+        try:
+            return await funcao()
+        except Exception as e:
+            erro = e
+            raise
+        finally:
+            _chamada.reset(token)
+            self.__publicar(chamada.medicao(servico, operacao, erro))
+
+
+def _rotulo(valor):
+    return str(valor or '').replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metricas:
+    """Agrega as medições por serviço e operação. Pode ser registrada diretamente na instrumentação.
+
+    Os totais podem ser exportados no formato de texto do Prometheus, com prometheus().
+    """
+
+    CAMPOS = ('chamadas', 'erros', 'duracao', 'serializacao', 'rede', 'interpretacao', 'bytes_enviados',
+              'bytes_recebidos', 'requisicoes', 'espera', 'intervalo', 'tentativas')
+
+    # Nome, tipo, descrição e campos de cada métrica exportada.
+    METRICAS = (
+        ('chamadas_total', 'counter', 'Quantidade de chamadas aos serviços do ECM.', ('chamadas',)),
+        ('erros_total', 'counter', 'Quantidade de chamadas com falha.', ('erros',)),
+        ('duracao_segundos_total', 'counter', 'Duração total das chamadas.', ('duracao',)),
+        ('fase_segundos_total', 'counter', 'Duração das chamadas por fase.',
+         ('espera', 'serializacao', 'rede', 'interpretacao', 'intervalo')),
+        ('bytes_enviados_total', 'counter', 'Tamanho das requisições enviadas.', ('bytes_enviados',)),
+        ('bytes_recebidos_total', 'counter', 'Tamanho das respostas recebidas.', ('bytes_recebidos',)),
+        ('requisicoes_total', 'counter', 'Quantidade de requisições HTTP.', ('requisicoes',)),
+        ('tentativas_total', 'counter', 'Quantidade de tentativas, incluindo as novas tentativas.', ('tentativas',)),
+    )
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__operacoes = {}
+
+    def __call__(self, medicao):
+        valores = (1, medicao.erro is not None, medicao.duracao, medicao.serializacao or 0.0, medicao.rede or 0.0,
+                   medicao.interpretacao or 0.0, medicao.bytes_enviados, medicao.bytes_recebidos,
+                   medicao.requisicoes, medicao.espera, medicao.intervalo, medicao.tentativas)
+        with self.__lock:
+            totais = self.__operacoes.setdefault((medicao.servico, medicao.operacao), [0] * len(self.CAMPOS))
+            for i, valor in enumerate(valores):
+                totais[i] += valor
+
+    @property
+    def chamadas(self):
+        """Quantidade total de chamadas medidas, sem contar a criação dos clientes."""
+        with self.__lock:
+            return sum(totais[0] for (_, operacao), totais in self.__operacoes.items() if operacao != 'criar_cliente')
+
+    def resumo(self):
+        """Retorna os totais de cada operação.
+
+        Returns:
+            dict: Totais (chamadas, erros, fases, bytes e requisições) por serviço e operação.
+        """
+        with self.__lock:
+            return {chave: dict(zip(self.CAMPOS, totais)) for chave, totais in self.__operacoes.items()}
+
+    def limpar(self):
+        """Descarta os totais."""
+        with self.__lock:
+            self.__operacoes.clear()
+
+    def prometheus(self, prefixo='totvsecm'):
+        """Retorna os totais no formato de texto do Prometheus."""
+        resumo = self.resumo()
+        linhas = []
+        for nome, tipo, descricao, campos in self.METRICAS:
+            linhas.append('# HELP %s_%s %s' % (prefixo, nome, descricao))
+            linhas.append('# TYPE %s_%s %s' % (prefixo, nome, tipo))
+            for (servico, operacao), totais in sorted(resumo.items(), key=lambda item: tuple(map(str, item[0]))):
+                rotulos = 'servico="%s",operacao="%s"' % (_rotulo(servico), _rotulo(operacao))
+                for campo in campos:
+                    fase = ',fase="%s"' % campo if len(campos) > 1 else ''
+                    linhas.append('%s_%s{%s%s} %s' % (prefixo, nome, rotulos, fase, repr(totais[campo] + 0)))
+        return '\n'.join(linhas) + '\n'
+
+
+# Instrumentação das chamadas aos serviços do processo.
+instrumentacao = Instrumentacao()
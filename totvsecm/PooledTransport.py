@@ -0,0 +1,106 @@
+
+import gzip
+import time
+
+from zeep.transports import AsyncTransport, Transport
+
+from .CallExecutor import operation_timeout
+from .Instrumentation import registrar_requisicao
+
+# Tamanho mínimo, em bytes, dos envelopes comprimidos. Envelopes menores não compensam o custo da compressão.
+COMPRESSION_MIN_SIZE = 1024
+
+# Status HTTP com os quais o servidor indica que não aceita requisições comprimidas.
+COMPRESSION_UNSUPPORTED = (400, 415)
+
+
+def compress(message, headers):
+    """Comprime o envelope com gzip, retornando o conteúdo e os cabeçalhos HTTP da requisição comprimida."""
+    return gzip.compress(message, compresslevel=5), dict(headers, **{'Content-Encoding': 'gzip'})
+
+
+class PooledTransport(Transport):
+    """Transporte do zeep que utiliza a sessão HTTP compartilhada pelos serviços de um servidor.
+
+    As respostas comprimidas com gzip são aceitas e descomprimidas pelo requests. Opcionalmente, os envelopes enviados
+    também são comprimidos. Caso o servidor recuse um envelope comprimido, ele é reenviado sem compressão, que deixa
+    de ser utilizada pelo transporte. As operações com tempo máximo próprio, configurado no call_executor, utilizam
+    esse tempo no lugar de operation_timeout.
+    """
+
+    def __init__(self, session, cache=None, timeout=300, operation_timeout=None, compress_requests=False):
+        """Inicia o transporte.
+
+        Args:
+            session(requests.Session): Sessão HTTP compartilhada do servidor.
+            cache(zeep.cache.Base): Cache dos documentos WSDL e XSD.
+            timeout(float): Tempo máximo de obtenção dos documentos WSDL e XSD, em segundos.
+            operation_timeout(float): Tempo máximo de execução das operações, em segundos. Se None, não há limite.
+            compress_requests(bool): Indica se os envelopes enviados devem ser comprimidos com gzip.
+        """
+        super().__init__(cache=cache, timeout=timeout, operation_timeout=operation_timeout, session=session)
+        self.compress_requests = compress_requests
+
+    def __post(self, address, message, headers):
+        inicio = time.perf_counter()
+        response = self.session.post(address, data=message, headers=headers,
+                                     timeout=operation_timeout(self.operation_timeout))
+        registrar_requisicao(inicio, len(message), len(response.content))
+        return response
+
+    def post(self, address, message, headers):
+        if self.compress_requests and len(message) >= COMPRESSION_MIN_SIZE:
+            response = self.__post(address, *compress(message, headers))
+            if response.status_code not in COMPRESSION_UNSUPPORTED:
+                return response
+            self.compress_requests = False
+        return self.__post(address, message, headers)
+
+    def _load_remote_data(self, url):
+        inicio = time.perf_counter()
+        content = super()._load_remote_data(url)
+        registrar_requisicao(inicio, 0, len(content))
+        return content
+
+
+class AsyncPooledTransport(AsyncTransport):
+    """Versão assíncrona de PooledTransport, que utiliza o pool de conexões httpx compartilhado do servidor."""
+
+    def __init__(self, client, cache=None, timeout=300, compress_requests=False):
+        """Inicia o transporte.
+
+        Args:
+            client(httpx.AsyncClient): Pool de conexões compartilhado do servidor, já com o tempo máximo das operações.
+            cache(zeep.cache.Base): Cache dos documentos WSDL e XSD.
+            timeout(float): Tempo máximo de obtenção dos documentos WSDL e XSD, em segundos.
+            compress_requests(bool): Indica se os envelopes enviados devem ser comprimidos com gzip.
+        """
+        super().__init__(client=client, cache=cache, timeout=timeout)
+        self.compress_requests = compress_requests
+
+    @staticmethod
+    def timeout():
+        """Tempo máximo da operação em execução, ou o tempo máximo do pool de conexões se ela não tiver um próprio."""
+        import httpx
+
+        return operation_timeout(httpx.USE_CLIENT_DEFAULT)
+
+    async def __post(self, address, message, headers):
+        inicio = time.perf_counter()
+        response = await self.client.post(address, content=message, headers=headers, timeout=self.timeout())
+        registrar_requisicao(inicio, len(message), len(response.content))
+        return response
+
+    async def post(self, address, message, headers):
+        if self.compress_requests and len(message) >= COMPRESSION_MIN_SIZE:
+            response = await self.__post(address, *compress(message, headers))
+            if response.status_code not in COMPRESSION_UNSUPPORTED:
+                return response
+            self.compress_requests = False
+        return await self.__post(address, message, headers)
+
+    def _load_remote_data(self, url):
+        inicio = time.perf_counter()
+        content = super()._load_remote_data(url)
+        registrar_requisicao(inicio, 0, len(content))
+        return content
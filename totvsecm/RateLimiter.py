@@ -0,0 +1,134 @@
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+# Limitador aplicado às requisições feitas no contexto atual (thread ou tarefa asyncio). Veja limiting.
+_current = ContextVar('totvsecm_rate_limiter', default=None)
+
+
+class RateLimiter:
+    """Limita a quantidade de requisições por segundo (token bucket), de forma segura entre threads."""
+
+    def __init__(self, rate, burst=None):
+        """Inicia o limitador.
+
+        Args:
+            rate(float): Quantidade de requisições por segundo.
+            burst(int): Quantidade de requisições que podem ser feitas de uma só vez. Por padrão, o próprio limite.
+        """
+        self.__tokens = None
+        self.__updated = time.monotonic()
+        self.__lock = Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        """Altera o limite. As requisições seguintes, inclusive as que já aguardam, passam a seguir o novo limite.
+
+        Args:
+            rate(float): Quantidade de requisições por segundo.
+            burst(int): Quantidade de requisições que podem ser feitas de uma só vez. Por padrão, o próprio limite.
+        """
+        assert rate > 0, 'O limite de requisições por segundo deve ser positivo.'
+        with self.__lock:
+            self.rate = float(rate)
+            self.capacity = float(burst or max(1, rate))
+            self.__tokens = self.capacity if self.__tokens is None else min(self.__tokens, self.capacity)
+
+    def __take(self):
+        """Consome uma requisição, retornando 0, ou o tempo até que uma requisição possa ser feita."""
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            if self.__tokens >= 1:
+                self.__tokens -= 1
+                return 0
+            return (1 - self.__tokens) / self.rate
+
+    def acquire(self):
+        """Aguarda até que uma requisição possa ser feita."""
+        wait = self.__take()
+        while wait:
+            time.sleep(wait)
+            wait = self.__take()
+
+    async def aacquire(self):
+        """Versão assíncrona de acquire."""
+        import asyncio
+
+        wait = self.__take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self.__take()
+
+
+class RateLimiterRegistry:
+    """Mantém um limitador de requisições por servidor, compartilhado por todos os executores do processo.
+
+    Quando executores diferentes informam limites diferentes para o mesmo servidor, prevalece o último informado,
+    que passa a valer também para os executores criados antes.
+
+    Uso:
+        limiter = rate_limiters.get(url_servidor, 50)
+        with limiting(limiter):
+            servico.movimentar(1, 5)
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__limiters = {}
+
+    @staticmethod
+    def key(server):
+        """Retorna a chave que identifica o limitador de um servidor, como em ClientRegistry.key."""
+        return server.rstrip('/')
+
+    def get(self, server, rate, burst=None):
+        """Retorna o limitador do servidor, criando-o caso ainda não exista, com o limite informado.
+
+        Args:
+            server(str): URL do servidor ECM.
+            rate(float): Quantidade de requisições por segundo.
+            burst(int): Quantidade de requisições que podem ser feitas de uma só vez. Por padrão, o próprio limite.
+
+        Returns:
+            RateLimiter: Limitador compartilhado do servidor.
+        """
+        key = self.key(server)
+        with self.__lock:
+            limiter = self.__limiters.get(key)
+            if limiter is None:
+                limiter = self.__limiters[key] = RateLimiter(rate, burst)
+                return limiter
+        limiter.configure(rate, burst)
+        return limiter
+
+    def clear(self):
+        """Descarta os limitadores."""
+        with self.__lock:
+            self.__limiters.clear()
+
+
+@contextmanager
+def limiting(limiter):
+    """Aplica o limitador a cada requisição SOAP feita pelo call_executor no contexto atual, durante o bloco with.
+
+    Args:
+        limiter(RateLimiter): Limitador, ou None para não limitar as requisições.
+    """
+    token = _current.set(limiter)
+    try:
+        yield limiter
+    finally:
+        _current.reset(token)
+
+
+def current_limiter():
+    """Retorna o limitador aplicado às requisições do contexto atual, ou None."""
+    return _current.get()
+
+
+# Limitadores de requisições dos servidores acessados pelo processo.
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,79 @@
+
+from io import BytesIO
+
+from lxml import etree
+from zeep.xsd.types.builtins import DateTime, Integer
+
+from .Records import RegistroHistorico
+
+# Conversores do próprio zeep, para que os valores decodificados sejam idênticos aos do cliente.
+_datetime = DateTime().pythonvalue
+_integer = Integer().pythonvalue
+
+
+class _Tarefa:
+    """Campos de uma tarefa do histórico utilizados por RegistroHistorico, lidos diretamente do XML."""
+
+    __slots__ = ('choosedSequence', 'colleagueId', 'historCompleteColleague', 'taskCompletionDate',
+                 'taskCompletionHour', 'taskObservation')
+
+    def __init__(self, element):
+        for campo in self.__slots__:
+            setattr(self, campo, None)
+        for child in element:
+            campo = etree.QName(child).localname
+            if campo in self.__slots__ and child.text is not None:
+                setattr(self, campo, child.text)
+        if self.choosedSequence is not None:
+            self.choosedSequence = _integer(self.choosedSequence)
+        if self.taskCompletionHour is not None:
+            self.taskCompletionHour = _integer(self.taskCompletionHour)
+        if self.taskCompletionDate is not None:
+            self.taskCompletionDate = _datetime(self.taskCompletionDate)
+
+
+def _iterparse(content, tag):
+    """Percorre os elementos com o nome informado, em qualquer namespace, à medida que são lidos da resposta."""
+    if isinstance(content, bytes):
+        content = BytesIO(content)
+    return etree.iterparse(content, events=('end',), tag='{*}%s' % tag, huge_tree=True)
+
+
+def decode_histories(content):
+    """Decodifica a resposta de getHistories diretamente no histórico tratado, sem os objetos intermediários do zeep.
+
+    Args:
+        content(bytes): Envelope SOAP da resposta, ou um objeto de arquivo com o envelope.
+
+    Returns:
+        list: Registros do histórico, idênticos aos de BaseService._tratar_historico.
+    """
+    rs = []
+    for _, element in _iterparse(content, 'tasks'):
+        rs.append(RegistroHistorico.da_tarefa(_Tarefa(element)))
+        element.clear()
+    return rs
+
+
+def decode_card_data(content):
+    """Decodifica a resposta de getInstanceCardData diretamente em pares de nome e valor dos campos.
+
+    Args:
+        content(bytes): Envelope SOAP da resposta, ou um objeto de arquivo com o envelope.
+
+    Returns:
+        list: Um dicionário {'item': [nome, valor]} por campo, acessível da mesma forma que os objetos do zeep.
+    """
+    rs = []
+    for _, element in _iterparse(content, 'item'):
+        # Os campos são identificados pela estrutura, e não pelo nome do elemento que os contém, que varia entre versões
+        # do ECM: cada campo é um item cujos filhos são os itens simples com o nome e o valor. Os itens internos são
+        # lidos pelo item do campo, e o elemento que contém os campos, mesmo que também se chame item, é ignorado.
+        children = list(element)
+        if not children or any(etree.QName(child).localname != 'item' or len(child) for child in children):
+            continue
+        rs.append({'item': [child.text for child in children]})
+        # O campo já lido é removido, para que o elemento que contém os campos não seja confundido com um campo.
+        element.clear()
+        element.getparent().remove(element)
+    return rs
@@ -0,0 +1,189 @@
+
+import math
+import sys
+from array import array
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+
+class _Registro(Mapping):
+    """Base dos registros compactos. Os campos são atributos em __slots__, e os registros também podem ser lidos como
+    dicionários somente leitura, com as mesmas chaves dos dicionários retornados pelas versões anteriores."""
+
+    __slots__ = ()
+
+    # Campos do registro, na ordem em que são apresentados, incluindo os calculados.
+    CAMPOS = ()
+
+    def _campos(self):
+        return self.CAMPOS
+
+    def __getitem__(self, campo):
+        if campo not in self._campos():
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def __iter__(self):
+        return iter(self._campos())
+
+    def __len__(self):
+        return len(self._campos())
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % item for item in self.items()))
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def _asdict(self):
+        """Retorna o registro como dicionário."""
+        return dict(self.items())
+
+
+class RegistroHistorico(_Registro):
+    """Tarefa do histórico tratado de uma solicitação.
+
+    A data formatada e o nome do responsável são calculados apenas quando consultados.
+    """
+
+    __slots__ = ('data_hora', 'proxima_atividade', 'observacao', 'colleague_id', 'texto')
+
+    CAMPOS = ('data_hora', 'data_hora_formatada', 'proxima_atividade', 'observacao', 'colleague_id', 'texto',
+              'nome_responsavel')
+
+    def __init__(self, data_hora, proxima_atividade, observacao, colleague_id, texto):
+        self.data_hora = data_hora
+        self.proxima_atividade = proxima_atividade
+        self.observacao = observacao
+        self.colleague_id = colleague_id
+        self.texto = texto
+
+    @classmethod
+    def da_tarefa(cls, task):
+        """Cria o registro a partir de uma tarefa do histórico retornado pelo ECM."""
+        data_hora = task.taskCompletionDate + timedelta(seconds=task.taskCompletionHour) \
+            if task.taskCompletionDate else None
+        return cls(data_hora, int(task.choosedSequence), task.taskObservation, task.colleagueId,
+                   task.historCompleteColleague)
+
+    @property
+    def data_hora_formatada(self):
+        """Data e hora de conclusão da tarefa, formatadas para exibição."""
+        return self.data_hora.strftime('%d/%m/%Y %H:%M') if self.data_hora else u'Tarefa não finalizada'
+
+    @property
+    def nome_responsavel(self):
+        """Nome do responsável pela tarefa, que é a primeira linha do texto do histórico."""
+        return self.texto.partition('\n')[0] if self.texto is not None else None
+
+
+class RegistroAnexo(_Registro):
+    """Anexo de uma solicitação. O caminho só é informado quando o conteúdo do anexo foi baixado."""
+
+    __slots__ = ('colleague_id', 'document_id', 'version', 'caminho')
+
+    CAMPOS = ('colleague_id', 'document_id', 'version', 'caminho')
+
+    def __init__(self, colleague_id, document_id, version, caminho=None):
+        self.colleague_id = colleague_id
+        self.document_id = document_id
+        self.version = version
+        self.caminho = caminho
+
+    def _campos(self):
+        return self.CAMPOS if self.caminho is not None else self.CAMPOS[:3]
+
+
+class HistoricoColunar:
+    """Históricos de várias solicitações armazenados em colunas, para análises de grandes volumes.
+
+    Os números e datas ficam em arrays, e os responsáveis repetidos são compartilhados entre as tarefas. As datas são
+    timestamps, e as de tarefas não finalizadas são representadas por NaN.
+
+    Uso:
+        colunas = servico.historicos_colunares([1234, 1235, 1236])
+        for numero, atividade in zip(colunas.numero_solicitacao, colunas.proxima_atividade):
+            ...
+    """
+
+    def __init__(self):
+        self.numero_solicitacao = array('q')
+        self.data_hora = array('d')
+        self.proxima_atividade = array('i')
+        self.colleague_id = []
+        self.observacao = []
+        self.texto = []
+
+    def __len__(self):
+        return len(self.numero_solicitacao)
+
+    def __iter__(self):
+        return (self.registro(i) for i in range(len(self)))
+
+    def adicionar(self, numero_solicitacao, historico):
+        """Acrescenta o histórico de uma solicitação, retornado pelo ECM ou já tratado."""
+        for etapa in historico:
+            if isinstance(etapa, RegistroHistorico):
+                self.adicionar_registro(numero_solicitacao, etapa)
+                continue
+            for task in etapa.tasks:
+                self.adicionar_registro(numero_solicitacao, RegistroHistorico.da_tarefa(task))
+
+    def adicionar_registro(self, numero_solicitacao, registro):
+        """Acrescenta uma tarefa do histórico tratado de uma solicitação."""
+        self.numero_solicitacao.append(int(numero_solicitacao))
+        self.data_hora.append(registro.data_hora.timestamp() if registro.data_hora else math.nan)
+        self.proxima_atividade.append(registro.proxima_atividade)
+        self.colleague_id.append(sys.intern(registro.colleague_id) if registro.colleague_id else registro.colleague_id)
+        self.observacao.append(registro.observacao)
+        self.texto.append(registro.texto)
+
+    def registro(self, i):
+        """Retorna a tarefa da posição informada, com a data no fuso horário local."""
+        data_hora = None if math.isnan(self.data_hora[i]) else datetime.fromtimestamp(self.data_hora[i])
+        return RegistroHistorico(data_hora, self.proxima_atividade[i], self.observacao[i], self.colleague_id[i],
+                                 self.texto[i])
+
+
+class TabelaCampos(Mapping):
+    """Valores de alguns campos do formulário de várias solicitações, identificados pelo número da solicitação.
+
+    Cada solicitação é uma tupla com os valores na ordem dos campos, e os campos ausentes do formulário são None.
+
+    Uso:
+        tabela = servico.projetar_campos(['nome', 'sobrenome'], [1234, 1235])
+        nome, sobrenome = tabela[1234]
+        tabela.registro(1234)['nome']
+        tabela.coluna('nome')
+    """
+
+    def __init__(self, campos):
+        self.campos = tuple(campos)
+        self.__linhas = {}
+
+    def adicionar(self, numero_solicitacao, valores):
+        """Acrescenta os valores dos campos de uma solicitação, na ordem dos campos."""
+        valores = tuple(valores)
+        assert len(valores) == len(self.campos), 'Informe um valor para cada campo.'
+        self.__linhas[int(numero_solicitacao)] = valores
+
+    def __getitem__(self, numero_solicitacao):
+        return self.__linhas[numero_solicitacao]
+
+    def __iter__(self):
+        return iter(self.__linhas)
+
+    def __len__(self):
+        return len(self.__linhas)
+
+    def __repr__(self):
+        return 'TabelaCampos(campos=%r, solicitacoes=%d)' % (self.campos, len(self))
+
+    def registro(self, numero_solicitacao):
+        """Retorna os valores dos campos de uma solicitação como dicionário."""
+        return dict(zip(self.campos, self.__linhas[numero_solicitacao]))
+
+    def coluna(self, campo):
+        """Retorna os valores de um campo, na ordem das solicitações."""
+        i = self.campos.index(campo)
+        return [valores[i] for valores in self.__linhas.values()]
@@ -0,0 +1,123 @@
+
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .BaseService import BaseService
+from .ClientRegistry import registry
+
+ResultadoSolicitacao = namedtuple('ResultadoSolicitacao', ['numero_solicitacao', 'resultado', 'erro'])
+ResultadoSolicitacao.__doc__ = """Resultado da função aplicada a uma solicitação: retorno ou exceção."""
+
+
+class DescritorServico(namedtuple('DescritorServico', ['url_servidor', 'usuario', 'senha', 'usuario_responsavel',
+                                                       'id_processo', 'numero_solicitacao', 'numero_ficha',
+                                                       'id_empresa', 'concorrencia', 'decodificacao_rapida',
+                                                       'configuracao_registro'])):
+    """Dados necessários para recriar um BaseService em outro processo.
+
+    Ao contrário do serviço, o descritor pode ser serializado com pickle e enviado aos processos de um pool. Os
+    clientes zeep são criados no primeiro uso em cada processo e reutilizados por todos os serviços do processo.
+
+    Uso:
+        descritor = servico.descritor
+        servico = descritor.servico(numero_solicitacao=1234)
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, url_servidor, usuario, senha, usuario_responsavel, id_processo=None, numero_solicitacao=None,
+                numero_ficha=None, id_empresa=1, concorrencia=8, decodificacao_rapida=False,
+                configuracao_registro=None):
+        """Cria o descritor. Os argumentos são os mesmos de BaseService.
+
+        Args:
+            configuracao_registro(dict): Configuração do registro de clientes, aplicada nos processos do pool. Por
+                padrão, a configuração atual do registro.
+        """
+        if configuracao_registro is None:
+            configuracao_registro = dict(registry.configuration)
+        return super().__new__(cls, url_servidor, usuario, senha, usuario_responsavel, id_processo,
+                               numero_solicitacao, numero_ficha, id_empresa, concorrencia, decodificacao_rapida,
+                               configuracao_registro)
+
+    def __repr__(self):
+        # Não exibe a senha.
+        return 'DescritorServico(url_servidor=%r, usuario=%r, numero_solicitacao=%r)' % (
+            self.url_servidor, self.usuario, self.numero_solicitacao)
+
+    def servico(self, **alteracoes):
+        """Cria o serviço descrito, com os argumentos alterados informados.
+
+        Returns:
+            BaseService: Serviço do ECM.
+        """
+        argumentos = dict(self._asdict(), **alteracoes)
+        del argumentos['configuracao_registro']
+        return BaseService(**argumentos)
+
+
+# Descritor do pool de processos em que o processo atual é executado.
+_descritor = None
+
+
+def _iniciar_processo(descritor):
+    """Prepara um processo do pool, descartando os clientes e conexões herdados do processo principal."""
+    global _descritor
+    _descritor = descritor
+    registry.clear()
+    if descritor.configuracao_registro:
+        registry.configure(**descritor.configuracao_registro)
+
+
+def _executar_lote(funcao, numeros):
+    rs = []
+    for numero in numeros:
+        try:
+            rs.append(ResultadoSolicitacao(numero, funcao(_descritor.servico(numero_solicitacao=numero)), None))
+        except Exception as e:
+            rs.append(ResultadoSolicitacao(numero, None, e))
+    return rs
+
+
+def _lotes(numeros, tamanho):
+    lote = []
+    for numero in numeros:
+        lote.append(numero)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def mapear_solicitacoes(descritor, funcao, numeros_solicitacao, max_workers=None, lote=16):
+    """Aplica a função ao serviço de cada solicitação, distribuindo as solicitações entre vários processos.
+
+    Indicado para processamentos pesados dos históricos e formulários, que não se beneficiam de threads. Apenas uma
+    janela limitada de solicitações é mantida em andamento, de forma que sequências de qualquer tamanho podem ser
+    processadas.
+
+    Args:
+        descritor(DescritorServico): Descritor do serviço, como BaseService.descritor.
+        funcao(callable): Função que recebe o BaseService de uma solicitação. Deve poder ser serializada com pickle,
+            como uma função definida no nível de um módulo.
+        numeros_solicitacao(iterable): Números das solicitações.
+        max_workers(int): Quantidade de processos. Por padrão, a quantidade de processadores.
+        lote(int): Quantidade de solicitações enviadas de cada vez a um processo.
+
+    Returns:
+        generator: ResultadoSolicitacao de cada solicitação, na ordem informada. Erros são retornados no resultado,
+            sem interromper o processamento.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_iniciar_processo,
+                             initargs=(descritor,)) as executor:
+        janela = 2 * max_workers
+        pendentes = deque()
+        for numeros in _lotes(numeros_solicitacao, lote):
+            pendentes.append(executor.submit(_executar_lote, funcao, numeros))
+            if len(pendentes) >= janela:
+                yield from pendentes.popleft().result()
+        while pendentes:
+            yield from pendentes.popleft().result()
@@ -0,0 +1,144 @@
+
+import copy
+from threading import Event, Lock
+
+from .Cache import LRUCache
+
+
+class _Call:
+    """Chamada em andamento, aguardada pelas threads que fizeram a mesma consulta."""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Compartilha uma única chamada entre as consultas idênticas feitas ao mesmo tempo por várias threads.
+
+    A primeira thread executa a consulta, e as demais aguardam e recebem uma cópia do resultado, ou a mesma exceção.
+    Opcionalmente, os resultados são mantidos por um curto período, durante o qual as consultas seguintes também não
+    acessam o servidor e recebem uma cópia do resultado mantido. Assim, cada chamador pode alterar o seu resultado
+    sem afetar os demais.
+
+    As chaves das consultas são tuplas cujo primeiro item é o escopo, como o endereço do servidor. As alterações
+    feitas no escopo descartam, com invalidate, os resultados mantidos e as consultas em andamento.
+
+    Uso:
+        single_flight.configure(ttl=2)
+        estados = single_flight.do(chave, lambda: client.service.getAllActiveStates(...))
+    """
+
+    def __init__(self, enabled=True, ttl=0, maxsize=10000):
+        self.__lock = Lock()
+        self.__calls = {}
+        self.__generations = {}
+        self.configure(enabled, ttl, maxsize)
+
+    def configure(self, enabled=True, ttl=0, maxsize=10000):
+        """Configura o compartilhamento das consultas.
+
+        Args:
+            enabled(bool): Indica se as consultas idênticas simultâneas devem ser compartilhadas.
+            ttl(float): Tempo, em segundos, durante o qual os resultados são reaproveitados. Se 0, os resultados
+                são compartilhados apenas entre as consultas simultâneas.
+            maxsize(int): Quantidade máxima de resultados mantidos.
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self.cache = LRUCache(maxsize=maxsize, timeout=ttl) if ttl else None
+
+    def do(self, key, function):
+        """Executa a consulta, ou aguarda a consulta idêntica em andamento, retornando o seu resultado.
+
+        Args:
+            key(tuple): Identificação da consulta.
+            function(callable): Função que executa a consulta.
+
+        Returns:
+            object: Resultado da consulta.
+        """
+        if not self.enabled:
+            return function()
+
+        cache = self.cache
+        if cache is not None:
+            result = cache.get(key, _Call)
+            if result is not _Call:
+                return copy.deepcopy(result)
+
+        scope = self.__scope(key)
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = _Call()
+                generation = self.__generations.get(scope, 0)
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self.__lock:
+                self.__release(key, call)
+                # O resultado de uma consulta iniciada antes de uma alteração no escopo não é mantido.
+                keep = cache is not None and self.__generations.get(scope, 0) == generation
+                shared = keep or call.waiters
+            if shared:
+                # O chamador recebe o próprio resultado, e as demais threads, cópias de um resultado à parte.
+                call.result = copy.deepcopy(result)
+            if keep:
+                cache.set(key, call.result)
+            return result
+        finally:
+            with self.__lock:
+                self.__release(key, call)
+            call.event.set()
+
+    def __release(self, key, call):
+        # A consulta pode ter sido descartada por invalidate, e outra consulta com a mesma chave, iniciada.
+        if self.__calls.get(key) is call:
+            del self.__calls[key]
+
+    @staticmethod
+    def __scope(key):
+        return key[0] if isinstance(key, tuple) and key else None
+
+    def invalidate(self, scope):
+        """Descarta os resultados mantidos e as consultas em andamento do escopo, após uma alteração.
+
+        As consultas em andamento são concluídas normalmente, mas as consultas seguintes não as aguardam, e os seus
+        resultados não são mantidos.
+
+        Args:
+            scope(object): Escopo das consultas, o primeiro item das chaves.
+        """
+        with self.__lock:
+            self.__generations[scope] = self.__generations.get(scope, 0) + 1
+            for key in [key for key in self.__calls if self.__scope(key) == scope]:
+                del self.__calls[key]
+        if self.cache is not None:
+            self.cache.discard(lambda key: self.__scope(key) == scope)
+
+    def clear(self):
+        """Descarta os resultados mantidos."""
+        if self.cache is not None:
+            self.cache.clear()
+
+
+# Compartilhamento padrão das consultas aos serviços do processo.
+single_flight = SingleFlight()
@@ -0,0 +1,202 @@
+
+from functools import partial
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from .BulkCardData import BulkCardData
+from .CallExecutor import IDEMPOTENT_OPERATIONS, call_executor
+from .ClientRegistry import registry
+from .Instrumentation import instrumentacao
+from .SingleFlight import single_flight
+
+# Tipos do webservice já resolvidos, por cliente e pelo nome local do tipo.
+_types = WeakKeyDictionary()
+_types_lock = Lock()
+
+XSD_NAMESPACE = 'http://www.w3.org/2001/XMLSchema'
+
+
+class SoapService:
+    """Base dos serviços do ECM. O cliente zeep é obtido do registro compartilhado apenas no primeiro uso."""
+
+    service_name = None
+
+    # Indica se o serviço utiliza o cliente assíncrono, cujas operações retornam corrotinas.
+    asynchronous = False
+
+    def __init__(self, server, user, password, company_id, user_id, process_id=None):
+        self.server = server
+        self.url = registry.wsdl_url(server, self.service_name)
+        self.user = user
+        self.password = password
+        self.company_id = company_id
+        self.user_id = user_id
+        self.process_id = process_id
+
+    @property
+    def client(self):
+        """Cliente zeep do serviço, compartilhado entre todas as instâncias que apontam para o mesmo servidor."""
+        if self.asynchronous:
+            return registry.get_async(self.server, self.service_name)
+        return registry.get(self.server, self.service_name)
+
+    def _get_type(self, name):
+        """Retorna um tipo do webservice pelo nome local.
+
+        O tipo é procurado pela URI dos namespaces do WSDL, e não pelo prefixo, que depende da ordem em que os
+        documentos foram carregados. A busca é feita uma única vez por cliente.
+        """
+        client = self.client
+        with _types_lock:
+            types = _types.setdefault(client, {})
+        if name not in types:
+            types[name] = self._resolve_type(client, name)
+        return types[name]
+
+    @staticmethod
+    def _resolve_type(client, name):
+        """Procura o tipo com o nome local informado em todos os namespaces do WSDL."""
+        from zeep import exceptions
+
+        schema = client.wsdl.types
+        for namespace in schema.namespaces:
+            if namespace == XSD_NAMESPACE:
+                continue
+            try:
+                return schema.get_type('{%s}%s' % (namespace, name))
+            except exceptions.LookupError:
+                continue
+        raise exceptions.LookupError('O tipo %s não foi encontrado no WSDL do %s.' % (name, client.wsdl.location))
+
+    def _read(self, operation, *args, decoder=None):
+        """Executa uma operação de consulta, compartilhando a chamada com as consultas idênticas simultâneas.
+
+        As consultas são identificadas pelo servidor, serviço, operação e argumentos, que incluem o usuário, a empresa
+        e a solicitação. Cada thread recebe o próprio resultado, e as alterações enviadas ao mesmo servidor descartam
+        as consultas compartilhadas. As operações assíncronas são executadas diretamente.
+
+        Args:
+            operation(str): Nome da operação no webservice.
+            decoder(callable): Decodificador da resposta, utilizado no lugar do zeep. Veja _decode_reply.
+
+        Returns:
+            object: Resultado da operação.
+        """
+        if self.asynchronous:
+            return self._execute(operation, lambda: getattr(self.client.service, operation)(*args))
+
+        key = (self.server.rstrip('/'), self.service_name, operation, decoder) + args
+        try:
+            hash(key)
+        except TypeError:
+            return self.__call(operation, args, decoder)
+        return single_flight.do(key, lambda: self.__call(operation, args, decoder))
+
+    def __call(self, operation, args, decoder):
+        if decoder is None:
+            return self._execute(operation, lambda: getattr(self.client.service, operation)(*args))
+
+        def call():
+            with self.client.settings(raw_response=True):
+                response = getattr(self.client.service, operation)(*args)
+            return self._decode_reply(operation, response, decoder)
+        return self._execute(operation, call)
+
+    def _execute(self, operation, function):
+        """Executa a função que envia a operação, com os tempos máximos, as novas tentativas e o limite de chamadas
+        simultâneas do call_executor, medindo a chamada quando a instrumentação está ativa.
+
+        As operações que alteram o ECM descartam as consultas compartilhadas do servidor ao terminar, mesmo com falha.
+        O descarte é feito por servidor, pois nem todas as alterações informam a solicitação, como updateCardData.
+
+        Nos serviços assíncronos, a função retorna uma corrotina, e o resultado também é uma corrotina.
+        """
+        if self.asynchronous:
+            def call():
+                return call_executor.aexecute(self.server, operation, function)
+        else:
+            def call():
+                return call_executor.execute(self.server, operation, function)
+        if instrumentacao.ativo:
+            measure = instrumentacao.amedir if self.asynchronous else instrumentacao.medir
+            call = partial(measure, self.service_name, operation, call)
+        if operation in IDEMPOTENT_OPERATIONS:
+            return call()
+        if self.asynchronous:
+            return self.__invalidate_after(call())
+        try:
+            return call()
+        finally:
+            single_flight.invalidate(self.server.rstrip('/'))
+
+    async def __invalidate_after(self, coroutine):
+        try:
+            return await coroutine
+        finally:
+            single_flight.invalidate(self.server.rstrip('/'))
+
+    def _create_envelope(self, operation, *args, **kwargs):
+        """Cria o envelope SOAP de uma operação sem serializá-lo.
+
+        Os dados de formulário do tipo BulkCardData, informados por nome, são montados diretamente no envelope.
+
+        Returns:
+            tuple: Endereço do serviço, envelope e cabeçalhos HTTP.
+        """
+        from lxml import etree
+
+        client = self.client
+        bulk = {name: value for name, value in kwargs.items() if isinstance(value, BulkCardData)}
+        kwargs.update((name, value.template()) for name, value in bulk.items())
+
+        options = client.service._binding_options
+        envelope, headers = client.service._binding._create(operation, args, kwargs, client=client, options=options)
+        if bulk:
+            # Os parâmetros são os filhos do elemento da operação, no corpo do envelope.
+            body = next(child for child in envelope if etree.QName(child).localname == 'Body')
+            for element in body[0]:
+                name = etree.QName(element).localname
+                if name in bulk:
+                    bulk[name].render(element)
+        return options['address'], envelope, headers
+
+    def _create_request(self, operation, *args, **kwargs):
+        """Cria o envelope SOAP de uma operação sem enviá-lo, para as operações cujo envio é feito pela biblioteca.
+
+        Returns:
+            tuple: Endereço do serviço, conteúdo do envelope e cabeçalhos HTTP.
+        """
+        from zeep.wsdl.utils import etree_to_string
+
+        address, envelope, headers = self._create_envelope(operation, *args, **kwargs)
+        return address, etree_to_string(envelope), headers
+
+    def _send(self, operation, *args, **kwargs):
+        """Envia uma operação. Com dados de formulário do tipo BulkCardData, o envelope é montado pela biblioteca."""
+        if not any(isinstance(value, BulkCardData) for value in kwargs.values()):
+            return self._execute(operation, lambda: getattr(self.client.service, operation)(*args, **kwargs))
+        return self._execute(operation, lambda: self.__send_bulk(operation, args, kwargs))
+
+    def __send_bulk(self, operation, args, kwargs):
+        address, envelope, headers = self._create_envelope(operation, *args, **kwargs)
+        response = self.client.transport.post_xml(address, envelope, headers)
+        if self.asynchronous:
+            return self.__process_async_reply(operation, response)
+        return self._process_reply(operation, response)
+
+    async def __process_async_reply(self, operation, response):
+        return self._process_reply(operation, await response)
+
+    def _process_reply(self, operation, response):
+        """Interpreta a resposta de uma operação enviada pela biblioteca."""
+        binding = self.client.service._binding
+        return binding.process_reply(self.client, binding.get(operation), response)
+
+    def _decode_reply(self, operation, response, decoder):
+        """Decodifica a resposta de uma operação com o decodificador informado, sem os objetos do zeep.
+
+        As respostas de erro são interpretadas pelo zeep, que lança a falha retornada pelo servidor.
+        """
+        if response.status_code != 200:
+            return self._process_reply(operation, response)
+        return decoder(response.content)
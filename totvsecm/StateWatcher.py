@@ -0,0 +1,288 @@
+
+import asyncio
+import heapq
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .RateLimiter import rate_limiters
+from .WorkflowEngineService import WorkflowEngineService
+
+ATIVIDADE_ALTERADA = 'atividade_alterada'
+FINALIZADO = 'finalizado'
+ERRO = 'erro'
+
+Evento = namedtuple('Evento', ['numero_solicitacao', 'tipo', 'anterior', 'atual', 'erro'])
+Evento.__new__.__defaults__ = (None,)
+Evento.__doc__ = """Mudança observada numa solicitação.
+
+Args:
+    numero_solicitacao(int): Número da solicitação.
+    tipo(str): ATIVIDADE_ALTERADA, FINALIZADO ou ERRO.
+    anterior(list): Atividades anteriores, ou None na primeira consulta da solicitação.
+    atual(list): Atividades atuais, no formato de BaseService.atividade_atual: [-1] quando finalizada.
+    erro(Exception): Falha da consulta, nos eventos do tipo ERRO.
+"""
+
+# Marca o fim dos eventos na fila entre a thread de observação e o loop asyncio.
+_FIM = object()
+
+
+class StateWatcher:
+    """Acompanha as atividades de muitas solicitações, consultando getAllActiveStates num pool limitado de threads.
+
+    Cada solicitação é consultada num intervalo próprio, que cresce enquanto a solicitação não muda e volta ao mínimo
+    quando ela muda, de forma que as solicitações paradas consomem poucas requisições. As solicitações finalizadas
+    deixam de ser consultadas. A primeira consulta de cada solicitação também gera um evento, com anterior=None.
+
+    Uso:
+        watcher = StateWatcher(url_servidor, usuario, senha, usuario_responsavel, numeros, limite_por_segundo=20)
+        for evento in watcher.observar():
+            if evento.tipo == FINALIZADO:
+                ...
+
+        async for evento in watcher.aobservar():
+            ...
+    """
+
+    def __init__(self, url_servidor, usuario, senha, usuario_responsavel, numeros=(), id_empresa=1, max_workers=8,
+                 intervalo_minimo=5, intervalo_maximo=300, fator=2, limite_por_segundo=None):
+        """Inicia o acompanhamento.
+
+        Args:
+            url_servidor(str): URL do servidor ECM.
+            usuario(str): Username do usuário do ECM.
+            senha(str): Senha do usuário do ECM.
+            usuario_responsavel(str): Username do usuário responsável no ECM.
+            numeros(iterable): Números das solicitações acompanhadas.
+            id_empresa(int): Identificador da empresa no ECM.
+            max_workers(int): Quantidade máxima de consultas simultâneas.
+            intervalo_minimo(float): Intervalo entre as consultas de uma solicitação que acabou de mudar, em segundos.
+            intervalo_maximo(float): Intervalo máximo entre as consultas de uma solicitação, em segundos.
+            fator(float): Fator de crescimento do intervalo a cada consulta sem mudança ou com falha.
+            limite_por_segundo(float): Quantidade máxima de consultas iniciadas por segundo.
+                O limite é compartilhado com as demais requisições ao mesmo servidor, prevalecendo o último valor
+                informado.
+        """
+        assert 0 < intervalo_minimo <= intervalo_maximo, 'Os intervalos de consulta são inválidos.'
+        assert fator >= 1, 'O fator de crescimento do intervalo deve ser maior ou igual a 1.'
+        self.__workflowservice = WorkflowEngineService(url_servidor, user=usuario, password=senha,
+                                                       company_id=id_empresa, user_id=usuario_responsavel)
+        self.max_workers = max_workers
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        self.fator = fator
+        self.rate_limiter = rate_limiters.get(url_servidor, limite_por_segundo) if limite_por_segundo else None
+        self.__lock = threading.Lock()
+        self.__parado = threading.Event()
+        # Eventos das observações em andamento, sinalizados quando há algo a fazer antes do fim da espera.
+        self.__despertadores = set()
+        self.__atividades = {}
+        self.__intervalos = {}
+        self.__agenda = []
+        self.adicionar(numeros)
+
+    def adicionar(self, numeros):
+        """Inclui solicitações no acompanhamento. Podem ser incluídas inclusive durante a observação."""
+        agora = time.monotonic()
+        with self.__lock:
+            for numero in numeros:
+                if numero not in self.__intervalos:
+                    self.__atividades[numero] = None
+                    self.__intervalos[numero] = self.intervalo_minimo
+                    heapq.heappush(self.__agenda, (agora, numero))
+            self.__acordar()
+
+    def __acordar(self):
+        # Deve ser chamado com self.__lock.
+        for despertador in self.__despertadores:
+            despertador.set()
+
+    def remover(self, numero):
+        """Deixa de acompanhar uma solicitação."""
+        with self.__lock:
+            self.__atividades.pop(numero, None)
+            self.__intervalos.pop(numero, None)
+
+    def parar(self):
+        """Encerra a observação em andamento, após o término das consultas já iniciadas.
+
+        Quando chamado antes do início da observação, a observação termina imediatamente. Para observar novamente após
+        parar, utilize reiniciar.
+        """
+        self.__parado.set()
+        with self.__lock:
+            self.__acordar()
+
+    def reiniciar(self):
+        """Permite uma nova observação após parar."""
+        self.__parado.clear()
+
+    @property
+    def acompanhadas(self):
+        """Atividades atuais das solicitações acompanhadas, ou None para as ainda não consultadas."""
+        with self.__lock:
+            return dict(self.__atividades)
+
+    def __consultar(self, numero):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        rs = self.__workflowservice.get_all_active_states(numero)
+        return [int(n) for n in rs] if rs else [-1]
+
+    def __agendar(self, numero, intervalo):
+        # Espalha as consultas, para que as solicitações incluídas juntas não sejam consultadas sempre juntas.
+        self.__intervalos[numero] = intervalo
+        heapq.heappush(self.__agenda, (time.monotonic() + intervalo * random.uniform(0.9, 1.1), numero))
+
+    def __registrar(self, numero, future):
+        """Registra o resultado da consulta de uma solicitação, reagendando-a, e retorna o evento gerado."""
+        with self.__lock:
+            if numero not in self.__intervalos:
+                return None
+            anterior = self.__atividades[numero]
+            intervalo = min(self.intervalo_maximo, self.__intervalos[numero] * self.fator)
+            try:
+                atual = future.result()
+            except Exception as e:
+                self.__agendar(numero, intervalo)
+                return Evento(numero, ERRO, anterior, anterior, e)
+
+            if atual == anterior:
+                self.__agendar(numero, intervalo)
+                return None
+
+            if atual == [-1]:
+                del self.__atividades[numero]
+                del self.__intervalos[numero]
+                return Evento(numero, FINALIZADO, anterior, atual)
+
+            self.__atividades[numero] = atual
+            self.__agendar(numero, self.intervalo_minimo)
+            return Evento(numero, ATIVIDADE_ALTERADA, anterior, atual)
+
+    def __proximas(self, limite):
+        """Retira da agenda as solicitações cuja consulta já deve ser feita, e o tempo até a próxima."""
+        agora = time.monotonic()
+        numeros = []
+        with self.__lock:
+            while self.__agenda and len(numeros) < limite:
+                momento, numero = self.__agenda[0]
+                if numero not in self.__intervalos:
+                    heapq.heappop(self.__agenda)
+                elif momento <= agora:
+                    heapq.heappop(self.__agenda)
+                    numeros.append(numero)
+                else:
+                    return numeros, momento - agora
+            return numeros, None
+
+    def observar(self, timeout=None):
+        """Consulta as solicitações acompanhadas, retornando os eventos à medida que são observados.
+
+        A observação termina quando todas as solicitações são finalizadas ou removidas, quando parar é chamado, mesmo
+        antes do início da observação, ou ao fim do tempo máximo.
+
+        Args:
+            timeout(float): Tempo máximo de observação, em segundos. Se None, não há limite.
+
+        Returns:
+            generator: Eventos das solicitações.
+        """
+        return self.__observar(timeout, threading.Event())
+
+    def __observar(self, timeout, encerrada):
+        """Consulta as solicitações até que parar seja chamado ou a observação seja encerrada pelo evento informado,
+        que é próprio de cada observação."""
+        despertador = threading.Event()
+        with self.__lock:
+            self.__despertadores.add(despertador)
+        try:
+            yield from self.__consultar_agenda(timeout, encerrada, despertador)
+        finally:
+            with self.__lock:
+                self.__despertadores.discard(despertador)
+
+    def __consultar_agenda(self, timeout, encerrada, despertador):
+        fim = time.monotonic() + timeout if timeout is not None else None
+        pendentes = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self.__parado.is_set() and not encerrada.is_set():
+                # A espera é interrompida pelo término de uma consulta, por adicionar, parar ou pelo encerramento.
+                despertador.clear()
+                numeros, espera = self.__proximas(self.max_workers - len(pendentes))
+                for numero in numeros:
+                    future = executor.submit(self.__consultar, numero)
+                    future.add_done_callback(lambda _: despertador.set())
+                    pendentes[future] = numero
+                if not pendentes and not numeros and espera is None:
+                    break
+
+                if fim is not None:
+                    restante = fim - time.monotonic()
+                    if restante <= 0:
+                        break
+                    espera = restante if espera is None else min(espera, restante)
+
+                concluidas = [future for future in pendentes if future.done()]
+                if not concluidas:
+                    despertador.wait(espera)
+                    concluidas = [future for future in pendentes if future.done()]
+                for future in concluidas:
+                    evento = self.__registrar(pendentes.pop(future), future)
+                    if evento is not None:
+                        yield evento
+
+    def executar(self, callback, timeout=None):
+        """Observa as solicitações, chamando a função informada a cada evento.
+
+        Args:
+            callback(callable): Função chamada com cada Evento.
+            timeout(float): Tempo máximo de observação, em segundos. Se None, não há limite.
+        """
+        for evento in self.observar(timeout):
+            callback(evento)
+
+    async def aobservar(self, timeout=None):
+        """Versão assíncrona de observar. As consultas são feitas no pool de threads, fora do loop asyncio.
+
+        Returns:
+            async_generator: Eventos das solicitações.
+        """
+        loop = asyncio.get_running_loop()
+        fila = asyncio.Queue()
+        encerrada = threading.Event()
+
+        def enviar(item):
+            try:
+                loop.call_soon_threadsafe(fila.put_nowait, item)
+            except RuntimeError:
+                # O loop já foi encerrado, após o fim da observação.
+                encerrada.set()
+
+        def observar():
+            try:
+                for evento in self.__observar(timeout, encerrada):
+                    enviar(evento)
+            except Exception as e:
+                enviar(e)
+            finally:
+                enviar(_FIM)
+
+        thread = threading.Thread(target=observar, name='StateWatcher', daemon=True)
+        thread.start()
+        try:
+            while True:
+                evento = await fila.get()
+                if evento is _FIM:
+                    break
+                if isinstance(evento, Exception):
+                    raise evento
+                yield evento
+        finally:
+            # Encerra apenas esta observação, sem impedir as próximas.
+            encerrada.set()
+            with self.__lock:
+                self.__acordar()
@@ -0,0 +1,472 @@
+
+import base64
+import os
+import re
+from contextlib import closing, nullcontext
+from io import BytesIO
+from urllib.parse import unquote
+from uuid import uuid4
+
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+XOP_NAMESPACE = 'http://www.w3.org/2004/08/xop/include'
+
+# Status HTTP com os quais o servidor indica que não aceita requisições MTOM/XOP.
+MTOM_UNSUPPORTED = (400, 415)
+
+# Profundidade do elemento com o conteúdo na resposta: Envelope > Body > Resposta > Conteúdo.
+CONTENT_DEPTH = 4
+
+_whitespace = re.compile(rb'\s+')
+
+
+class Base64Decoder:
+    """Decodifica um texto em base64 recebido em partes, sem manter o texto completo em memória."""
+
+    def __init__(self):
+        self.__pending = b''
+
+    def decode(self, text):
+        """Decodifica a parte recebida, retornando os bytes que já podem ser decodificados."""
+        if isinstance(text, str):
+            text = text.encode('ascii')
+        data = self.__pending + _whitespace.sub(b'', text)
+        size = len(data) - len(data) % 4
+        self.__pending = data[size:]
+        return base64.b64decode(data[:size]) if size else b''
+
+    def flush(self):
+        """Decodifica o restante do texto recebido."""
+        data, self.__pending = self.__pending, b''
+        return base64.b64decode(data) if data else b''
+
+
+class Base64Encoder:
+    """Codifica em base64 um conteúdo lido em partes de tamanhos arbitrários, de forma que as partes codificadas
+    possam ser concatenadas."""
+
+    def __init__(self):
+        self.__pending = b''
+
+    def encode(self, data):
+        """Codifica a parte recebida, retornando o texto dos bytes que já podem ser codificados."""
+        if self.__pending:
+            data = self.__pending + data
+        size = len(data) - len(data) % 3
+        self.__pending = bytes(data[size:])
+        return base64.b64encode(data[:size]) if size else b''
+
+    def flush(self):
+        """Codifica o restante do conteúdo recebido, com o preenchimento final."""
+        data, self.__pending = self.__pending, b''
+        return base64.b64encode(data) if data else b''
+
+
+class _ContentTarget:
+    """Alvo do parser do lxml que decodifica o conteúdo da resposta à medida que o XML é recebido."""
+
+    def __init__(self):
+        self.depth = 0
+        self.fault = False
+        self.fault_string = []
+        self.in_fault_string = False
+        self.decoder = Base64Decoder()
+        self.chunks = []
+        self.include = None
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.depth == 3 and tag == '{%s}Fault' % SOAP_ENV:
+            self.fault = True
+        elif self.depth == CONTENT_DEPTH + 1 and tag == '{%s}Include' % XOP_NAMESPACE and not self.fault:
+            # Nas respostas MTOM/XOP, o conteúdo é uma referência à parte binária da mensagem.
+            self.include = attrib.get('href')
+        self.in_fault_string = self.fault and tag == 'faultstring'
+
+    def end(self, tag):
+        self.depth -= 1
+        self.in_fault_string = False
+
+    def data(self, text):
+        if self.in_fault_string:
+            self.fault_string.append(text)
+        elif self.depth == CONTENT_DEPTH and not self.fault:
+            chunk = self.decoder.decode(text)
+            if chunk:
+                self.chunks.append(chunk)
+
+    def close(self):
+        chunk = self.decoder.flush()
+        if chunk:
+            self.chunks.append(chunk)
+
+
+class ResponseContentParser:
+    """Interpreta uma resposta SOAP recebida em partes, retornando o conteúdo em base64 já decodificado."""
+
+    def __init__(self, status_code, content_type):
+        from lxml import etree
+        from zeep.exceptions import TransportError
+
+        if 'xml' not in content_type:
+            raise TransportError('Server returned HTTP status %d (%s)' % (status_code, content_type),
+                                 status_code=status_code)
+        self.status_code = status_code
+        self.target = _ContentTarget()
+        self.parser = etree.XMLParser(target=self.target, huge_tree=True)
+
+    def feed(self, block):
+        """Interpreta uma parte da resposta, retornando as partes do conteúdo já decodificadas."""
+        self.parser.feed(block)
+        chunks, self.target.chunks = self.target.chunks, []
+        return chunks
+
+    def close(self):
+        """Finaliza a interpretação da resposta, retornando as últimas partes do conteúdo.
+
+        Raises:
+            Fault: Caso o servidor tenha retornado uma falha.
+            TransportError: Caso o servidor tenha retornado um status HTTP de erro.
+        """
+        from zeep.exceptions import Fault, TransportError
+
+        self.parser.close()
+        if self.target.fault:
+            raise Fault(''.join(self.target.fault_string))
+        if self.status_code != 200:
+            raise TransportError('Server returned HTTP status %d' % self.status_code, status_code=self.status_code)
+        return self.target.chunks
+
+
+def _content_type_params(content_type):
+    """Retorna os parâmetros de um cabeçalho Content-Type, como boundary e start."""
+    from email.message import Message
+
+    message = Message()
+    message['Content-Type'] = content_type
+    return dict((name.lower(), value) for name, value in message.get_params([])[1:])
+
+
+def _content_id(value):
+    """Normaliza um Content-ID (<id>) ou uma referência a ele (cid:id) para comparação."""
+    value = value.strip()
+    if value.lower().startswith('cid:'):
+        value = unquote(value[4:])
+    return value.strip('<>')
+
+
+class MultipartContentParser:
+    """Interpreta uma resposta MTOM/XOP (multipart/related) recebida em partes.
+
+    O envelope SOAP, na primeira parte, é interpretado por ResponseContentParser. O conteúdo referenciado pelo
+    xop:Include do envelope é retornado diretamente da parte binária correspondente, sem decodificação em base64.
+    """
+
+    # Estados da interpretação: conteúdo de uma parte, linha do delimitador, cabeçalhos da parte e fim da mensagem.
+    BODY, DELIMITER, HEADERS, END = range(4)
+
+    def __init__(self, status_code, content_type):
+        from zeep.exceptions import TransportError
+
+        params = _content_type_params(content_type)
+        if not params.get('boundary'):
+            raise TransportError('Server returned HTTP status %d (%s)' % (status_code, content_type),
+                                 status_code=status_code)
+        self.status_code = status_code
+        self.start = _content_id(params['start']) if params.get('start') else None
+        self.delimiter = b'\r\n--' + params['boundary'].encode('ascii')
+        # O delimitador inicial não é precedido por uma quebra de linha.
+        self.buffer = bytearray(b'\r\n')
+        self.state = self.BODY
+        self.part = None
+        self.root = None
+        self.include = None
+        self.found = False
+
+    def feed(self, block):
+        """Interpreta uma parte da resposta, retornando as partes do conteúdo já recebidas."""
+        self.buffer += block
+        chunks = []
+        while self.__step(chunks):
+            pass
+        return chunks
+
+    def __step(self, chunks):
+        """Avança a interpretação com o conteúdo acumulado, indicando se é possível continuar."""
+        buffer = self.buffer
+        if self.state == self.BODY:
+            index = buffer.find(self.delimiter)
+            if index < 0:
+                # Mantém o final do conteúdo, que pode ser o início de um delimitador.
+                self.__emit(len(buffer) - len(self.delimiter) + 1, chunks)
+                return False
+            self.__emit(index, chunks)
+            del buffer[:len(self.delimiter)]
+            self.__end_part(chunks)
+            self.state = self.DELIMITER
+            return True
+        if self.state == self.DELIMITER:
+            if buffer[:2] == b'--':
+                self.state = self.END
+                return False
+            index = buffer.find(b'\r\n')
+            if index < 0:
+                return False
+            del buffer[:index]
+            self.state = self.HEADERS
+            return True
+        if self.state == self.HEADERS:
+            index = buffer.find(b'\r\n\r\n')
+            if index < 0:
+                return False
+            headers = bytes(buffer[2:index]).decode('latin-1')
+            del buffer[:index + 4]
+            self.__start_part(headers)
+            self.state = self.BODY
+            return True
+        # Epílogo da mensagem, que é ignorado.
+        buffer.clear()
+        return False
+
+    def __emit(self, size, chunks):
+        if size <= 0:
+            return
+        with memoryview(self.buffer) as view:
+            data = bytes(view[:size])
+        del self.buffer[:size]
+        if self.part == 'root':
+            chunks.extend(self.root.feed(data))
+        elif self.part == 'content':
+            chunks.append(data)
+
+    def __start_part(self, headers):
+        fields = {}
+        for line in headers.split('\r\n'):
+            name, _, value = line.partition(':')
+            fields[name.strip().lower()] = value.strip()
+        content_id = _content_id(fields.get('content-id', ''))
+
+        self.part = None
+        if self.root is None:
+            if self.start is None or content_id == self.start:
+                self.part = 'root'
+                self.root = ResponseContentParser(self.status_code, fields.get('content-type', ''))
+        elif self.include is not None and content_id == self.include:
+            self.part = 'content'
+            self.found = True
+
+    def __end_part(self, chunks):
+        if self.part == 'root':
+            chunks.extend(self.root.close())
+            if self.root.target.include is not None:
+                self.include = _content_id(self.root.target.include)
+        self.part = None
+
+    def close(self):
+        """Finaliza a interpretação da resposta.
+
+        Raises:
+            TransportError: Caso a resposta esteja incompleta ou não possua a parte binária referenciada.
+        """
+        from zeep.exceptions import TransportError
+
+        if self.state != self.END or self.root is None or (self.include is not None and not self.found):
+            raise TransportError('Resposta MTOM/XOP incompleta.', status_code=self.status_code)
+        return []
+
+
+def content_parser(status_code, content_type):
+    """Retorna o interpretador adequado à resposta: MultipartContentParser para as respostas MTOM/XOP, ou
+    ResponseContentParser para os envelopes com o conteúdo em base64."""
+    if content_type.lower().startswith('multipart/related'):
+        return MultipartContentParser(status_code, content_type)
+    return ResponseContentParser(status_code, content_type)
+
+
+def iter_response_content(response, chunk_size=64 * 1024):
+    """Percorre a resposta SOAP recebida em modo stream, retornando o conteúdo já decodificado em partes. As respostas
+    MTOM/XOP também são aceitas.
+
+    Args:
+        response(requests.Response): Resposta obtida com stream=True.
+        chunk_size(int): Tamanho dos blocos lidos da conexão.
+
+    Returns:
+        generator: Partes do conteúdo decodificado.
+    """
+    with closing(response):
+        parser = content_parser(response.status_code, response.headers.get('Content-Type', ''))
+        for block in response.iter_content(chunk_size):
+            yield from parser.feed(block)
+        yield from parser.close()
+
+
+class StreamingBody:
+    """Corpo de requisição que insere o conteúdo dos arquivos, codificado em base64, no envelope SOAP à medida que é
+    enviado, sem manter os arquivos em memória.
+
+    O envelope é serializado com marcadores no lugar do conteúdo dos arquivos. O tamanho total é conhecido de antemão,
+    o que permite o envio com Content-Length.
+    """
+
+    # Tamanho dos blocos lidos dos arquivos. Múltiplo de 3 para que os blocos lidos por inteiro não deixem sobras.
+    CHUNK_SIZE = 3 * 64 * 1024
+
+    def __init__(self, message, sources):
+        """Inicia o corpo da requisição.
+
+        Args:
+            message(bytes): Envelope SOAP serializado com os marcadores.
+            sources(dict): Arquivo correspondente a cada marcador, codificado em base64.
+        """
+        self.parts = []
+        pattern = re.compile(b'|'.join(re.escape(marker) for marker in sources))
+        position = 0
+        for match in pattern.finditer(message):
+            self.parts.append(message[position:match.start()])
+            self.parts.append(sources[match.group(0)])
+            position = match.end()
+        self.parts.append(message[position:])
+
+    def __len__(self):
+        return sum(len(part) if isinstance(part, bytes) else encoded_size(part.size) for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            # As leituras podem retornar menos bytes que o solicitado. As sobras de um bloco que não é múltiplo de 3 são
+            # codificadas com o bloco seguinte.
+            encoder = Base64Encoder()
+            with part.open() as fh:
+                while True:
+                    chunk = fh.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    text = encoder.encode(chunk)
+                    if text:
+                        yield text
+            text = encoder.flush()
+            if text:
+                yield text
+
+
+class MtomBody:
+    """Corpo de requisição MTOM/XOP (multipart/related), no qual o conteúdo dos arquivos é enviado em partes binárias,
+    sem codificação em base64.
+
+    O envelope SOAP é a primeira parte, com um elemento xop:Include no lugar de cada marcador. O conteúdo dos arquivos
+    segue nas partes seguintes, lido à medida que é enviado. O tamanho total é conhecido de antemão.
+    """
+
+    # Tamanho dos blocos lidos dos arquivos.
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, message, sources):
+        """Inicia o corpo da requisição.
+
+        Args:
+            message(bytes): Envelope SOAP serializado com os marcadores.
+            sources(dict): Arquivo correspondente a cada marcador, codificado em base64.
+        """
+        boundary = 'MIMEBoundary_%s' % uuid4().hex
+        self.start = '<root.message@totvsecm>'
+        self.content_type = ('multipart/related; type="application/xop+xml"; boundary="%s"; start="%s"; '
+                             'start-info="text/xml"' % (boundary, self.start))
+        delimiter = ('\r\n--%s\r\n' % boundary).encode('ascii')
+
+        envelope = []
+        attachments = []
+        pattern = re.compile(b'|'.join(re.escape(marker) for marker in sources))
+        position = 0
+        for match in pattern.finditer(message):
+            content_id = '%s@totvsecm' % uuid4().hex
+            envelope.append(message[position:match.start()])
+            envelope.append(b'<xop:Include xmlns:xop="%s" href="cid:%s"/>' % (XOP_NAMESPACE.encode('ascii'),
+                                                                                content_id.encode('ascii')))
+            attachments.append((content_id, sources[match.group(0)]))
+            position = match.end()
+        envelope.append(message[position:])
+
+        self.parts = [delimiter[2:] + self.__headers('application/xop+xml; charset=utf-8; type="text/xml"',
+                                                       self.start)]
+        self.parts.extend(envelope)
+        for content_id, source in attachments:
+            self.parts.append(delimiter + self.__headers('application/octet-stream', '<%s>' % content_id))
+            self.parts.append(source)
+        self.parts.append(('\r\n--%s--\r\n' % boundary).encode('ascii'))
+
+    @staticmethod
+    def __headers(content_type, content_id):
+        return ('Content-Type: %s\r\nContent-Transfer-Encoding: binary\r\nContent-ID: %s\r\n\r\n'
+                % (content_type, content_id)).encode('ascii')
+
+    def __len__(self):
+        return sum(len(part) if isinstance(part, bytes) else part.size for part in self.parts)
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part.chunks(self.CHUNK_SIZE)
+
+
+class FileSource:
+    """Arquivo a ser enviado, informado pelo caminho ou por um objeto de arquivo aberto para leitura binária."""
+
+    def __init__(self, file):
+        self.file = file
+        if isinstance(file, (str, bytes, os.PathLike)):
+            self.size = os.path.getsize(file)
+        else:
+            self.position = file.tell()
+            self.size = file.seek(0, os.SEEK_END) - self.position
+            file.seek(self.position)
+
+    def open(self):
+        """Abre o arquivo para leitura. Objetos de arquivo são lidos a partir da posição inicial e não são fechados, o
+        que permite reenviá-los."""
+        if isinstance(self.file, (str, bytes, os.PathLike)):
+            return open(self.file, 'rb')
+        self.file.seek(self.position)
+        return nullcontext(self.file)
+
+    def chunks(self, chunk_size):
+        """Percorre o conteúdo do arquivo em blocos do tamanho informado."""
+        with self.open() as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class BytesSource:
+    """Conteúdo já carregado em memória, enviado em blocos que referenciam o próprio conteúdo, sem cópias."""
+
+    def __init__(self, content):
+        self.content = content
+        self.size = len(content)
+
+    def open(self):
+        """Abre o conteúdo para leitura."""
+        return nullcontext(BytesIO(self.content))
+
+    def chunks(self, chunk_size):
+        """Percorre o conteúdo em blocos do tamanho informado."""
+        view = memoryview(self.content)
+        for position in range(0, self.size, chunk_size):
+            yield view[position:position + chunk_size]
+
+
+def encoded_size(size):
+    """Retorna o tamanho em base64 de um conteúdo com o tamanho informado."""
+    return (size + 2) // 3 * 4
+
+
+async def aiter_chunks(chunks):
+    """Percorre um iterável de blocos de forma assíncrona, para envio pelos clientes assíncronos."""
+    for chunk in chunks:
+        yield chunk
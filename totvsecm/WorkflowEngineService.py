@@ -1,28 +1,27 @@
 ﻿
-from sys import getsizeof
-from zeep import Client
+import base64
+import time
+from uuid import uuid4
 
+from .BulkCardData import BULK_THRESHOLD, BulkCardData
+from .CallExecutor import operation_timeout
+from .ClientRegistry import registry
+from .Instrumentation import registrar_requisicao
+from .SoapService import SoapService
+from .Streaming import MTOM_UNSUPPORTED, BytesSource, FileSource, MtomBody, StreamingBody
 
-class WorkflowEngineService:
-    def __init__(self, server, user, password, company_id, user_id, process_id=None):
-        self.url = '%s/webdesk/WorkflowEngineService?wsdl' % server
-        self.client = Client(self.url)
-        self.user = user
-        self.password = password
-        self.company_id = company_id
-        self.user_id = user_id
-        self.process_id = process_id
+
+class WorkflowEngineService(SoapService):
+    service_name = 'WorkflowEngineService'
 
     def __get_card_data(self, data):
-        """Transforma o dicionário em parâmetros."""
+        """Transforma o dicionário em parâmetros. Formulários grandes são montados diretamente no envelope."""
         if bool(data):
             # Obtém classes do webservice.
-            try:
-                kv_dto_array = self.client.get_type('ns0:keyValueDtoArray')
-                kv_dto = self.client.get_type('ns0:keyValueDto')
-            except:
-                kv_dto_array = self.client.get_type('ns1:keyValueDtoArray')
-                kv_dto = self.client.get_type('ns1:keyValueDto')
+            kv_dto_array = self._get_type('keyValueDtoArray')
+            kv_dto = self._get_type('keyValueDto')
+            if len(data) >= BULK_THRESHOLD:
+                return BulkCardData(data, kv_dto_array, kv_dto, 'key')
 
             # Transforma o dicionário recebido nos objetos do webservice.
             fields = []
@@ -34,30 +33,41 @@ class WorkflowEngineService:
         else:
             return {}
 
-    def __get_document_array(self, data):
-        """Transforma o dicionário com informações dos anexos no tipo Document Array nativo do webservice ."""
+    def __get_document_array(self, data, sources=None, mtom=False):
+        """Transforma o dicionário com informações dos anexos no tipo Document Array nativo do webservice .
+
+        Os anexos informados pelo caminho ('path') ou por um objeto de arquivo ('file') não são lidos: o conteúdo é
+        substituído por um marcador e o arquivo correspondente é registrado em sources, para envio em stream. Com
+        mtom, o mesmo é feito com o conteúdo já lido ('content'), enviado numa parte binária MTOM/XOP.
+        """
         # Instanciamento dos tipos de dados.
-        try:
-            attachment_type = self.client.get_type('ns0:attachment')
-            document_type = self.client.get_type('ns0:processAttachmentDto')
-            documents_type = self.client.get_type('ns0:processAttachmentDtoArray')
-        except:
-            attachment_type = self.client.get_type('ns1:attachment')
-            document_type = self.client.get_type('ns1:processAttachmentDto')
-            documents_type = self.client.get_type('ns1:processAttachmentDtoArray')
+        attachment_type = self._get_type('attachment')
+        document_type = self._get_type('processAttachmentDto')
+        documents_type = self._get_type('processAttachmentDtoArray')
 
         documents = []
 
         # Para todos os arquivos presentes na lista de arquivos.
         for file_name, file_info in data.items():
             # Informações do arquivo.
-            file_content = file_info['content']
             file_description = file_info['description']
+            if 'content' in file_info and not mtom:
+                file_content = file_info['content']
+                file_size = len(file_content)
+            else:
+                # O marcador possui tamanho múltiplo de 3, para que sua codificação em base64 não tenha preenchimento.
+                if 'content' in file_info:
+                    source = BytesSource(file_info['content'])
+                else:
+                    source = FileSource(file_info['path'] if 'path' in file_info else file_info['file'])
+                file_content = uuid4().bytes + uuid4().bytes[:2]
+                file_size = source.size
+                sources[base64.b64encode(file_content)] = source
 
             # Criação do anexo.
             attachment = attachment_type(
                 fileName=file_name,
-                fileSize=getsizeof(file_content),
+                fileSize=file_size,
                 filecontent=file_content,
             )
 
@@ -94,8 +104,8 @@ class WorkflowEngineService:
         Returns:
             str: Objeto DeadLineDto que contem variáveis com a data e hora.
         """
-        result = self.client.service.calculateDeadLineHours(self.user, self.password, self.company_id, self.user_id,
-                                                            data, segundos, prazo, period_id)
+        result = self._read('calculateDeadLineHours', self.user, self.password, self.company_id, self.user_id, data,
+                            segundos, prazo, period_id)
         return result
 
     def cancel_instance(self, process_instance_id, cancel_text):
@@ -108,8 +118,8 @@ class WorkflowEngineService:
         Returns:
             str: Mensagem de retorno do cancelamento.
         """
-        result = self.client.service.cancelInstance(self.user, self.password, self.company_id, process_instance_id,
-                                                    self.user_id, cancel_text)
+        result = self._send('cancelInstance', self.user, self.password, self.company_id, process_instance_id,
+                            self.user_id, cancel_text)
         return result
 
     def get_all_active_states(self, process_instance_id):
@@ -121,8 +131,8 @@ class WorkflowEngineService:
         Returns:
             list: Número da atividade.
         """
-        result = self.client.service.getAllActiveStates(self.user, self.password, self.company_id, self.user_id,
-                                                        process_instance_id)
+        result = self._read('getAllActiveStates', self.user, self.password, self.company_id, self.user_id,
+                            process_instance_id)
         return result
 
     def get_attachments(self, process_instance_id):
@@ -134,8 +144,8 @@ class WorkflowEngineService:
         Returns:
             list: Lista de anexos.
         """
-        result = self.client.service.getAttachments(self.user, self.password, self.company_id, self.user_id,
-                                                    process_instance_id)
+        result = self._read('getAttachments', self.user, self.password, self.company_id, self.user_id,
+                            process_instance_id)
         return result
 
     def get_card_value(self, process_instance_id, card_field_name):
@@ -148,8 +158,8 @@ class WorkflowEngineService:
         Returns:
             str: Valor do campo.
         """
-        result = self.client.service.getCardValue(self.user, self.password, self.company_id, process_instance_id,
-                                                  self.user_id, card_field_name)
+        result = self._read('getCardValue', self.user, self.password, self.company_id, process_instance_id,
+                            self.user_id, card_field_name)
         return result
 
     def get_histories(self, process_instance_id):
@@ -161,10 +171,24 @@ class WorkflowEngineService:
         Returns:
             list: Lista com as informações do formulário.
         """
-        result = self.client.service.getHistories(self.user, self.password, self.company_id, self.user_id,
-                                                  process_instance_id)
+        result = self._read('getHistories', self.user, self.password, self.company_id, self.user_id,
+                            process_instance_id)
         return result
 
+    def get_history_records(self, process_instance_id):
+        """Retorna o histórico tratado de um processo, decodificado diretamente da resposta do ECM.
+
+        Args:
+            process_instance_id(int): Número da solicitação.
+
+        Returns:
+            list: Registros do histórico, idênticos aos obtidos a partir de get_histories.
+        """
+        from .RawDecoder import decode_histories
+
+        return self._read('getHistories', self.user, self.password, self.company_id, self.user_id,
+                          process_instance_id, decoder=decode_histories)
+
     def get_instance_card_data(self, process_instance_id):
         """Retorna o valor dos campos da ficha de uma solicitação.
 
@@ -174,10 +198,24 @@ class WorkflowEngineService:
         Returns:
             list: Lista com as informações do formulário.
         """
-        result = self.client.service.getInstanceCardData(self.user, self.password, self.company_id, self.user_id,
-                                                         process_instance_id)
+        result = self._read('getInstanceCardData', self.user, self.password, self.company_id, self.user_id,
+                            process_instance_id)
         return result
 
+    def get_instance_card_items(self, process_instance_id):
+        """Retorna o valor dos campos da ficha de uma solicitação, decodificados diretamente da resposta do ECM.
+
+        Args:
+            process_instance_id(int): Número da solicitação.
+
+        Returns:
+            list: Nome e valor de cada campo, acessíveis da mesma forma que os de get_instance_card_data.
+        """
+        from .RawDecoder import decode_card_data
+
+        return self._read('getInstanceCardData', self.user, self.password, self.company_id, self.user_id,
+                          process_instance_id, decoder=decode_card_data)
+
     def save_and_send_task_classic(self, process_instance_id, choosed_state, colleague_ids, comments, card_data,
                                    manager_mode=False, thread_sequence=0, complete_task=True):
         """Movimenta solicitação para próxima atividade e retorna um array de objeto com chave e valor.
@@ -197,11 +235,10 @@ class WorkflowEngineService:
         Returns:
             list: Lista com informações do objeto movimentado.
         """
-        result = self.client.service.saveAndSendTaskClassic(self.user, self.password, self.company_id,
-                                                            process_instance_id, choosed_state, colleague_ids, comments,
-                                                            self.user_id, complete_task, attachments={},
-                                                            cardData=self.__get_card_data(card_data), appointment={},
-                                                            managerMode=manager_mode, threadSequence=thread_sequence)
+        result = self._send('saveAndSendTaskClassic', self.user, self.password, self.company_id, process_instance_id,
+                            choosed_state, colleague_ids, comments, self.user_id, complete_task, attachments={},
+                            cardData=self.__get_card_data(card_data), appointment={}, managerMode=manager_mode,
+                            threadSequence=thread_sequence)
         return result
 
     def start_process_classic(self, process_id, colleague_ids, card_data, comments, attachments=None,
@@ -213,7 +250,11 @@ class WorkflowEngineService:
             colleague_ids(list): Colaborador que receberá a tarefa.
             card_data(dict): Dados da ficha dicionarizados.
             comments(str): Comentários.
-            attachments(dict): Dicionário com nome e conteúdo lido dos arquivos anexos.
+            attachments(dict): Dicionário com nome e informações dos arquivos anexos. Cada anexo possui a descrição
+                ('description') e o conteúdo lido ('content'), o caminho ('path') ou um objeto de arquivo aberto para
+                leitura binária ('file'). Os anexos informados por caminho ou objeto de arquivo são enviados em stream,
+                sem serem carregados em memória. Com o MTOM/XOP habilitado no registro de clientes e anunciado pelo
+                servidor, o conteúdo dos anexos é enviado em partes binárias, sem codificação em base64.
             complete_task(bool): Indica se deve completar a tarefa (True) ou somente salvar (False).
             choosed_state(int): Número da atividade.
             manager_mode(bool): Indica se colaborador esta iniciando a solicitação como gestor do processo.
@@ -221,10 +262,44 @@ class WorkflowEngineService:
         Returns:
             list: Lista com informações do objeto criado.
         """
-        result = self.client.service.startProcessClassic(self.user, self.password, self.company_id, process_id,
-                                                         choosed_state, colleague_ids, comments, self.user_id,
-                                                         complete_task, appointment={},
-                                                         attachments=self.__get_document_array(attachments),
-                                                         cardData=self.__get_card_data(card_data),
-                                                         managerMode=manager_mode)
-        return result
+        mtom = bool(attachments) and registry.supports_mtom(self.client)
+        args, kwargs, sources = self._start_process_classic_arguments(process_id, colleague_ids, card_data, comments,
+                                                                      attachments, complete_task, choosed_state,
+                                                                      manager_mode, mtom)
+        if not sources:
+            return self._send('startProcessClassic', *args, **kwargs)
+
+        # Envia o envelope em stream, inserindo o conteúdo dos arquivos no lugar dos marcadores.
+        def call():
+            address, message, headers = self._create_request('startProcessClassic', *args, **kwargs)
+            transport = self.client.transport
+            if mtom:
+                body = MtomBody(message, sources)
+                response = self.__post(transport, address, body, dict(headers, **{'Content-Type': body.content_type}))
+                if response.status_code not in MTOM_UNSUPPORTED:
+                    return self._process_reply('startProcessClassic', response)
+                # O servidor recusou a requisição MTOM/XOP: os anexos são reenviados em base64, que passa a ser
+                # utilizado no serviço.
+                registry.disable_mtom(self.client)
+            response = self.__post(transport, address, StreamingBody(message, sources), headers)
+            return self._process_reply('startProcessClassic', response)
+        return self._execute('startProcessClassic', call)
+
+    @staticmethod
+    def __post(transport, address, body, headers):
+        inicio = time.perf_counter()
+        response = transport.session.post(address, data=body, headers=headers,
+                                          timeout=operation_timeout(transport.operation_timeout))
+        registrar_requisicao(inicio, len(body), len(response.content))
+        return response
+
+    def _start_process_classic_arguments(self, process_id, colleague_ids, card_data, comments, attachments,
+                                         complete_task, choosed_state, manager_mode, mtom=False):
+        """Retorna os argumentos da operação startProcessClassic e os arquivos a serem enviados em stream."""
+        sources = {}
+        attachments = self.__get_document_array(attachments or {}, sources, mtom)
+        args = (self.user, self.password, self.company_id, process_id, choosed_state, colleague_ids, comments,
+                self.user_id, complete_task)
+        kwargs = dict(appointment={}, attachments=attachments, cardData=self.__get_card_data(card_data),
+                      managerMode=manager_mode)
+        return args, kwargs, sources
@@ -0,0 +1,183 @@
+
+import argparse
+import json
+import os
+import sys
+import time
+from hashlib import sha1
+
+# Versão do ECM para a qual os WSDLs empacotados foram gerados.
+ECM_VERSION = '48-EP12'
+
+# Diretório dos WSDLs empacotados com a biblioteca.
+BUNDLED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wsdl', ECM_VERSION)
+
+# Marcador que substitui a URL do servidor nos WSDLs empacotados.
+SERVER_PLACEHOLDER = '{{TOTVSECM_SERVER}}'
+
+# Serviços do ECM utilizados pela biblioteca.
+SERVICES = ('WorkflowEngineService', 'DocumentService', 'CardService')
+
+# Os caches implementam a interface de zeep.cache.Base (add e get) sem herdar dela, para que o zeep seja importado apenas
+# na criação dos clientes.
+
+
+class WsdlCache:
+    """Cache persistente em disco dos documentos WSDL e XSD do ECM.
+
+    Os documentos são gravados num subdiretório identificado pela versão do cache, de forma que a troca da versão da
+    biblioteca ou do ECM invalida automaticamente os documentos gravados anteriormente.
+    """
+
+    DEFAULT_TIMEOUT = 7 * 24 * 60 * 60
+
+    def __init__(self, path=None, timeout=DEFAULT_TIMEOUT, version=None):
+        """Inicia o cache.
+
+        Args:
+            path(str): Diretório do cache. Por padrão, ~/.cache/totvsecm.
+            timeout(int): Tempo de validade dos documentos, em segundos. Se None, os documentos não expiram.
+            version(str): Versão dos documentos. Por padrão, a combinação das versões da biblioteca e do ECM.
+        """
+        from . import __version__
+
+        path = path or os.environ.get('TOTVSECM_CACHE_DIR') or os.path.join('~', '.cache', 'totvsecm')
+        self.version = version or '%s-%s' % (__version__, ECM_VERSION)
+        self.path = os.path.join(os.path.expanduser(path), self.version)
+        self.timeout = timeout
+
+    def __filename(self, url):
+        return os.path.join(self.path, sha1(url.encode('utf-8')).hexdigest())
+
+    def add(self, url, content):
+        """Grava o documento no cache."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        os.makedirs(self.path, exist_ok=True)
+
+        # A gravação é feita num arquivo temporário para que outros processos nunca leiam um documento incompleto.
+        filename = self.__filename(url)
+        temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temp_filename, 'wb') as fh:
+            fh.write(content)
+        os.replace(temp_filename, filename)
+
+    def get(self, url):
+        """Retorna o documento gravado no cache, ou None caso não exista ou esteja expirado."""
+        filename = self.__filename(url)
+        try:
+            if self.timeout is not None and time.time() - os.path.getmtime(filename) > self.timeout:
+                return None
+            with open(filename, 'rb') as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+
+class BundledWsdlCache:
+    """Fornece os documentos WSDL e XSD a partir de um snapshot local, sem acessar o servidor.
+
+    Os documentos do snapshot são gravados com a URL do servidor substituída por um marcador, o que permite utilizar o
+    mesmo snapshot com qualquer servidor da mesma versão do ECM. Nenhum documento é obtido do servidor: a ausência do
+    snapshot ou de um documento nele é um erro, e não uma nova consulta ao servidor.
+    """
+
+    def __init__(self, server, path=BUNDLED_DIR):
+        """Inicia o cache.
+
+        Raises:
+            FileNotFoundError: Caso o snapshot não exista no diretório informado.
+        """
+        self.server = server.rstrip('/')
+        self.path = path
+        try:
+            with open(os.path.join(path, 'manifest.json')) as fh:
+                self.manifest = json.load(fh)
+        except FileNotFoundError:
+            raise FileNotFoundError('O snapshot dos WSDLs não foi encontrado em %s. Gere-o com: python -m '
+                                    'totvsecm.WsdlCache <url_servidor> %s' % (path, path))
+
+    def add(self, url, content):
+        """Os documentos do snapshot não são alterados."""
+
+    def get(self, url):
+        """Retorna o documento do snapshot com a URL do servidor restaurada.
+
+        Raises:
+            FileNotFoundError: Caso o documento não faça parte do snapshot.
+        """
+        filename = self.manifest.get(url[len(self.server):]) if url.startswith(self.server) else None
+        if filename is None:
+            raise FileNotFoundError('O documento %s não faz parte do snapshot dos WSDLs em %s.' % (url, self.path))
+        with open(os.path.join(self.path, filename), 'rb') as fh:
+            content = fh.read()
+        return content.replace(SERVER_PLACEHOLDER.encode('utf-8'), self.server.encode('utf-8'))
+
+
+class _RecordingCache:
+    """Cache que apenas registra os documentos obtidos do servidor."""
+
+    def __init__(self):
+        self.documents = {}
+
+    def add(self, url, content):
+        self.documents[url] = content
+
+    def get(self, url):
+        return None
+
+
+def gerar_snapshot(server, path=BUNDLED_DIR):
+    """Baixa os documentos WSDL e XSD dos serviços do ECM e os grava como snapshot para o modo empacotado.
+
+    Args:
+        server(str): URL do servidor ECM utilizado como origem.
+        path(str): Diretório de destino do snapshot.
+
+    Returns:
+        dict: Mapeamento entre o caminho de cada documento no servidor e o arquivo gravado.
+    """
+    from zeep import Client
+    from zeep.transports import Transport
+
+    from .ClientRegistry import ClientRegistry
+
+    server = server.rstrip('/')
+    recorder = _RecordingCache()
+    for service_name in SERVICES:
+        Client(ClientRegistry.wsdl_url(server, service_name), transport=Transport(cache=recorder))
+
+    os.makedirs(path, exist_ok=True)
+    manifest = {}
+    for url, content in recorder.documents.items():
+        if not url.startswith(server):
+            continue
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        filename = '%s.xml' % sha1(url[len(server):].encode('utf-8')).hexdigest()
+        with open(os.path.join(path, filename), 'wb') as fh:
+            fh.write(content.replace(server.encode('utf-8'), SERVER_PLACEHOLDER.encode('utf-8')))
+        manifest[url[len(server):]] = filename
+
+    with open(os.path.join(path, 'manifest.json'), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+def main(argv=None):
+    """Gera o snapshot dos WSDLs pela linha de comando."""
+    parser = argparse.ArgumentParser(
+        prog='python -m totvsecm.WsdlCache',
+        description='Baixa os documentos WSDL e XSD dos serviços do ECM e os grava como snapshot para o modo '
+                    'empacotado.')
+    parser.add_argument('url_servidor')
+    parser.add_argument('destino', nargs='?', default=BUNDLED_DIR,
+                        help='Diretório do snapshot. Por padrão, o diretório dos WSDLs empacotados.')
+    args = parser.parse_args(argv)
+    manifest = gerar_snapshot(args.url_servidor, args.destino)
+    print('%d documentos gravados em %s.' % (len(manifest), args.destino))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,38 @@
 # Just another python module
+from importlib import import_module
+
+__version__ = '1.6.0'
+
+# Nomes públicos disponíveis diretamente no pacote, e o módulo de cada um. Os módulos são importados apenas no primeiro
+# acesso, e o zeep apenas na criação do primeiro cliente. As classes com o mesmo nome do seu módulo, como
+# BaseService, continuam sendo importadas do módulo: from totvsecm.BaseService import BaseService.
+_EXPORTS = {
+    'registry': 'ClientRegistry',
+    'WSDL_ONLINE': 'ClientRegistry',
+    'WSDL_CACHE': 'ClientRegistry',
+    'WSDL_BUNDLED': 'ClientRegistry',
+    'single_flight': 'SingleFlight',
+    'instrumentacao': 'Instrumentation',
+    'Metricas': 'Instrumentation',
+    'Medicao': 'Instrumentation',
+    'DescritorServico': 'ServiceDescriptor',
+    'mapear_solicitacoes': 'ServiceDescriptor',
+    'RegistroHistorico': 'Records',
+    'RegistroAnexo': 'Records',
+    'HistoricoColunar': 'Records',
+    'TabelaCampos': 'Records',
+    'Evento': 'StateWatcher',
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
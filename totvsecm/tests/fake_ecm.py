@@ -0,0 +1,323 @@
+
+"""Servidor SOAP local que simula os serviços do ECM utilizados pela biblioteca."""
+
+import base64
+import gzip
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from uuid import uuid4
+
+from lxml import etree
+
+from totvsecm.WsdlCache import SERVER_PLACEHOLDER
+
+WSDL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'wsdl')
+
+SOAP_ENV = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+XOP_NAMESPACE = 'http://www.w3.org/2004/08/xop/include'
+
+# Política com a qual o WSDL anuncia o suporte a MTOM/XOP, como nos serviços JAX-WS anotados com @MTOM.
+MTOM_POLICY = (b'<wsp:Policy xmlns:wsp="http://www.w3.org/ns/ws-policy" '
+               b'xmlns:wsoma="http://schemas.xmlsoap.org/ws/2004/09/policy/optimizedmimeserialization">'
+               b'<wsoma:OptimizedMimeSerialization/></wsp:Policy>')
+
+# Elementos das respostas cujo conteúdo é enviado numa parte binária MTOM/XOP.
+MTOM_ELEMENTS = ('folder',)
+
+NAMESPACES = {
+    'WorkflowEngineService': 'http://ws.workflow.ecm.technology.totvs.com/',
+    'DocumentService': 'http://ws.dm.ecm.technology.totvs.com/',
+    'CardService': 'http://ws.dm.ecm.technology.totvs.com/',
+}
+
+
+def to_xml(parent, name, value):
+    """Acrescenta ao elemento pai o valor informado, convertendo listas em elementos repetidos."""
+    if isinstance(value, list):
+        for item in value:
+            to_xml(parent, name, item)
+        return
+    element = etree.SubElement(parent, name)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            to_xml(element, key, item)
+    elif isinstance(value, bytes):
+        element.text = base64.b64encode(value).decode('ascii')
+    elif isinstance(value, bool):
+        element.text = 'true' if value else 'false'
+    elif isinstance(value, (date, datetime)):
+        element.text = value.isoformat()
+    elif value is not None:
+        element.text = str(value)
+
+
+def fault(message):
+    """Retorna um envelope SOAP de falha com a mensagem informada."""
+    response = etree.Element('{%s}Envelope' % SOAP_ENV, nsmap={'soap': SOAP_ENV})
+    response_fault = etree.SubElement(etree.SubElement(response, '{%s}Body' % SOAP_ENV), '{%s}Fault' % SOAP_ENV)
+    etree.SubElement(response_fault, 'faultcode').text = 'soap:Server'
+    etree.SubElement(response_fault, 'faultstring').text = message
+    return etree.tostring(response, xml_declaration=True, encoding='UTF-8')
+
+
+def parse_multipart(body, content_type):
+    """Interpreta uma requisição MTOM/XOP, retornando o envelope com o conteúdo das partes binárias em base64."""
+    boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode('ascii')
+    parts = {}
+    root = None
+    for segment in body.split(b'--' + boundary)[1:]:
+        if segment.startswith(b'--'):
+            break
+        headers, _, content = segment[2:].partition(b'\r\n\r\n')
+        content_id = re.search(rb'Content-ID:\s*<([^>]+)>', headers, re.IGNORECASE).group(1).decode('ascii')
+        parts[content_id] = content[:-2]
+        if root is None:
+            root = content_id
+
+    envelope = etree.fromstring(parts[root], etree.XMLParser(huge_tree=True))
+    for include in envelope.iter('{%s}Include' % XOP_NAMESPACE):
+        parent = include.getparent()
+        parent.remove(include)
+        parent.text = base64.b64encode(parts[include.get('href')[4:]]).decode('ascii')
+    return etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')
+
+
+def to_multipart(response):
+    """Converte um envelope de resposta em MTOM/XOP, enviando o conteúdo de MTOM_ELEMENTS em partes binárias.
+
+    Returns:
+        tuple: Conteúdo e Content-Type da resposta.
+    """
+    envelope = etree.fromstring(response, etree.XMLParser(huge_tree=True))
+    boundary = 'uuid:%s' % uuid4()
+    delimiter = ('\r\n--%s\r\n' % boundary).encode('ascii')
+    binaries = []
+    for element in envelope.iter(*MTOM_ELEMENTS):
+        content_id = '%s@example.jaxws.sun.com' % uuid4()
+        binaries.append(delimiter + ('Content-Id: <%s>\r\nContent-Type: application/octet-stream\r\n'
+                                     'Content-Transfer-Encoding: binary\r\n\r\n' % content_id).encode('ascii'))
+        binaries.append(base64.b64decode(element.text or ''))
+        element.text = None
+        etree.SubElement(element, '{%s}Include' % XOP_NAMESPACE, nsmap={'xop': XOP_NAMESPACE},
+                         href='cid:%s' % content_id.replace('@', '%40'))
+    root = ('--%s\r\nContent-Id: <rootpart*%s@example.jaxws.sun.com>\r\n'
+            'Content-Type: application/xop+xml;charset=utf-8;type="text/xml"\r\n'
+            'Content-Transfer-Encoding: binary\r\n\r\n' % (boundary, boundary[5:])).encode('ascii')
+    content = b''.join([root, etree.tostring(envelope, xml_declaration=True, encoding='UTF-8')] + binaries +
+                       [('\r\n--%s--' % boundary).encode('ascii')])
+    content_type = ('multipart/related;start="<rootpart*%s@example.jaxws.sun.com>";type="application/xop+xml";'
+                    'boundary="%s";start-info="text/xml"' % (boundary[5:], boundary))
+    return content, content_type
+
+
+def history(tasks):
+    """Retorna o histórico de uma solicitação com uma movimentação para cada tarefa informada.
+
+    Args:
+        tasks(list): Tuplas com a próxima atividade, o responsável e a observação de cada tarefa.
+    """
+    return [{'movementSequence': position + 1, 'stateSequence': choosed_sequence,
+             'tasks': [{'choosedSequence': choosed_sequence, 'colleagueId': colleague_id,
+                        'historCompleteColleague': '%s\nEnviada para %d' % ((colleague_id or 'Sistema').title(),
+                                                                              choosed_sequence),
+                        'taskCompletionDate': datetime(2020, 1, 1) + timedelta(days=position),
+                        'taskCompletionHour': 3600 * 8 + 60 * position, 'taskObservation': observation}]}
+            for position, (choosed_sequence, colleague_id, observation) in enumerate(tasks)]
+
+
+class FakeEcm:
+    """Estado do ECM simulado e respostas de cada operação."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = []
+        self.requests = []
+        self.active_states = {}
+        self.attachments = {}
+        self.documents = {}
+        self.histories = {}
+        self.card_data = {}
+        self.next_instance = 1000
+
+    @staticmethod
+    def params(operation_element):
+        return {child.tag: child for child in operation_element}
+
+    def getActiveDocument(self, params):
+        document_id = int(params['nrDocumentId'].text)
+        version, name, _ = self.documents[document_id]
+        return {'result': {'item': [{'companyId': 1, 'documentId': document_id, 'phisicalFile': name,
+                                     'phisicalFileSize': 0, 'version': version}]}}
+
+    def getDocumentContent(self, params):
+        _, _, content = self.documents[int(params['nrDocumentId'].text)]
+        return {'folder': content}
+
+    def getAllActiveStates(self, params):
+        return {'result': {'item': self.active_states.get(int(params['processInstanceId'].text), [])}}
+
+    def getAttachments(self, params):
+        return {'result': {'item': self.attachments.get(int(params['processInstanceId'].text), [])}}
+
+    def getHistories(self, params):
+        return {'result': {'item': self.histories.get(int(params['processInstanceId'].text), [])}}
+
+    def getInstanceCardData(self, params):
+        card_data = self.card_data.get(int(params['processInstanceId'].text), {})
+        return {'result': {'item': [{'item': [name, value]} for name, value in card_data.items()]}}
+
+    def getCardValue(self, params):
+        card_data = self.card_data.get(int(params['processInstanceId'].text), {})
+        return {'result': card_data.get(params['cardFieldName'].text)}
+
+    def calculateDeadLineHours(self, params):
+        hora = int(params['hora'].text) + 3600 * int(params['prazo'].text)
+        return {'result': {'date': params['data'].text, 'hora': hora}}
+
+    def cancelInstance(self, params):
+        self.active_states[int(params['processInstanceId'].text)] = []
+        return {'result': 'OK'}
+
+    def startProcessClassic(self, params):
+        with self.lock:
+            self.next_instance += 1
+            instance = self.next_instance
+        self.active_states[instance] = [int(params['choosedState'].text) or 1]
+        return {'result': {'item': [{'key': 'iProcess', 'value': instance},
+                                    {'key': 'WDNrDocto', 'value': instance}]}}
+
+    def saveAndSendTaskClassic(self, params):
+        self.active_states[int(params['processInstanceId'].text)] = [int(params['choosedState'].text)]
+        return {'result': {'item': [{'key': 'iTask', 'value': params['choosedState'].text}]}}
+
+    def updateCardData(self, params):
+        card_id = int(params['cardId'].text)
+        card_data = self.card_data.setdefault(card_id, {})
+        for item in params['cardData']:
+            card_data[item.findtext('field')] = item.findtext('value')
+        return {'result': {'item': [{'documentId': card_id, 'version': 1000, 'webServiceMessage': 'ok'}]}}
+
+    def respond(self, service_name, body):
+        """Processa o envelope recebido e retorna o envelope de resposta."""
+        envelope = etree.fromstring(body, etree.XMLParser(huge_tree=True))
+        operation_element = envelope.find('{%s}Body' % SOAP_ENV)[0]
+        operation = etree.QName(operation_element).localname
+        with self.lock:
+            self.calls.append(operation)
+            self.requests.append(body)
+
+        response = etree.Element('{%s}Envelope' % SOAP_ENV, nsmap={'soap': SOAP_ENV})
+        response_body = etree.SubElement(response, '{%s}Body' % SOAP_ENV)
+        namespace = NAMESPACES[service_name]
+        wrapper = etree.SubElement(response_body, '{%s}%sResponse' % (namespace, operation), nsmap={'ns2': namespace})
+        for name, value in getattr(self, operation)(self.params(operation_element)).items():
+            to_xml(wrapper, name, value)
+        return etree.tostring(response, xml_declaration=True, encoding='UTF-8')
+
+
+class FakeEcmHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Cabeçalhos e corpo são enviados separadamente, e o algoritmo de Nagle atrasaria as respostas em ~40 ms.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def service_name(self):
+        return self.path.split('?')[0].rstrip('/').split('/')[-1]
+
+    def send(self, status, content, content_type='text/xml; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if self.server.gzip_responses and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            content = gzip.compress(content)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        filename = os.path.join(WSDL_DIR, '%s.wsdl' % self.service_name())
+        if not self.path.endswith('?wsdl') or not os.path.exists(filename):
+            return self.send(404, b'')
+        with open(filename, 'rb') as fh:
+            content = fh.read().replace(SERVER_PLACEHOLDER.encode('utf-8'), self.server.url.encode('utf-8'))
+        if self.server.mtom:
+            content = content.replace(b'</definitions>', MTOM_POLICY + b'</definitions>')
+        self.send(200, content)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.bytes_received += len(body)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            if not self.server.accept_gzip:
+                return self.send(415, b'', 'text/plain')
+            body = gzip.decompress(body)
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/related'):
+            if not self.server.mtom:
+                return self.send(415, b'', 'text/plain')
+            with self.server.lock:
+                self.server.mtom_requests += 1
+            body = parse_multipart(body, content_type)
+        try:
+            response = self.server.ecm.respond(self.service_name(), body)
+            if self.server.mtom and 'multipart/related' in self.headers.get('Accept', ''):
+                return self.send(200, *to_multipart(response))
+            self.send(200, response)
+        except Exception as e:
+            self.send(500, fault(repr(e)))
+
+
+class FakeEcmServer(ThreadingHTTPServer):
+    """Servidor HTTP do ECM simulado, executado numa thread própria.
+
+    Registra a quantidade de conexões aceitas e de bytes recebidos. Aceita requisições comprimidas com gzip, exceto
+    com accept_gzip=False, e comprime as respostas com gzip_responses=True. Com latency, cada operação demora os
+    segundos informados para responder, simulando a latência de um servidor remoto. Com mtom=True, o WSDL anuncia o
+    suporte a MTOM/XOP, as requisições MTOM/XOP são aceitas e o conteúdo dos documentos é retornado em partes binárias
+    aos clientes que as aceitam. Sem mtom, as requisições MTOM/XOP são recusadas.
+
+    Uso:
+        with FakeEcmServer() as server:
+            BaseService(server.url, ...)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, ecm=None, handler=FakeEcmHandler, accept_gzip=True, gzip_responses=False, latency=0,
+                 mtom=False):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.ecm = ecm or FakeEcm()
+        self.accept_gzip = accept_gzip
+        self.gzip_responses = gzip_responses
+        self.latency = latency
+        self.mtom = mtom
+        self.lock = Lock()
+        self.connections = 0
+        self.bytes_received = 0
+        self.mtom_requests = 0
+        self.url = 'http://127.0.0.1:%d' % self.server_address[1]
+        self.thread = Thread(target=self.serve_forever, daemon=True)
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
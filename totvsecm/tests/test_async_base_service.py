@@ -0,0 +1,98 @@
+
+import os
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from unittest import IsolatedAsyncioTestCase
+
+from totvsecm import Cache as cache_module
+from totvsecm.AsyncBaseService import AsyncBaseService
+from totvsecm.AsyncDocumentService import AsyncDocumentService
+from totvsecm.ClientRegistry import registry
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+from totvsecm.tests.test_document_service import MtomRejectingHandler
+
+
+class AsyncBaseServiceTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.service = AsyncBaseService(self.server.url, 'yoda', 'senha', 'yoda', id_processo='selecao_jedi')
+
+    async def asyncTearDown(self):
+        await registry.aclose()
+
+    async def test_iniciar_e_movimentar(self):
+        await self.service.iniciar_solicitacao({'nome': 'Anakin'}, ['yoda'], 'Iniciado',
+                                               anexos={'a.txt': {'description': 'A', 'file': BytesIO(b'a')}})
+        numero = int(self.service.numero_solicitacao)
+        self.assertEqual(await self.service.atividade_atual, [1])
+
+        self.ecm.attachments[numero] = [{'attachmentSequence': 1, 'documentId': 77}]
+        self.ecm.card_data[numero] = {'nome': 'Anakin', 'WKDef': 'selecao_jedi'}
+        await self.service.movimentar(1, 5, nome='Darth Vader')
+        self.assertEqual(self.ecm.card_data[77], {'nome': 'Darth Vader'})
+        self.assertEqual(await self.service.atividade_atual, [5])
+        self.assertFalse(await self.service.finalizado)
+
+    async def test_projetar_campos(self):
+        for numero in (1, 2):
+            self.ecm.card_data[numero] = {'nome': 'Anakin %d' % numero, 'mestre': 'Obi-Wan'}
+        tabela = await self.service.projetar_campos(['nome', 'mestre'], [2, 1])
+        self.assertEqual(dict(tabela), {2: ('Anakin 2', 'Obi-Wan'), 1: ('Anakin 1', 'Obi-Wan')})
+        self.assertEqual(dict(await self.service.projetar_campos(['nome'], [1], limite_campos=0)), {1: ('Anakin 1',)})
+        self.assertEqual(self.ecm.calls, ['getCardValue'] * 4 + ['getInstanceCardData'])
+
+    async def test_historicos_colunares(self):
+        for numero in (1, 2):
+            self.ecm.histories[numero] = history([(5, 'yoda', 'Aprovado'), (numero, 'obiwan', None)])
+        for decodificacao_rapida in (False, True):
+            self.service.decodificacao_rapida = decodificacao_rapida
+            colunas = await self.service.historicos_colunares([2, 1])
+            self.assertEqual(list(colunas.numero_solicitacao), [2, 2, 1, 1])
+            self.assertEqual(list(colunas.proxima_atividade), [5, 2, 5, 1])
+        self.assertEqual(len(self.ecm.calls), 4)
+
+    async def test_calcular_prazos(self):
+        cache_module.prazos.clear()
+        prazos = await self.service.calcular_prazos([('2020-01-01', 0, hora, 'Default') for hora in (1, 2, 1)])
+        self.assertEqual(prazos, [{'date': '2020-01-01', 'hora': 3600 * hora} for hora in (1, 2, 1)])
+        self.assertEqual(await self.service.calcular_prazo('2020-01-01', 0, 2, 'Default'), prazos[1])
+        self.assertEqual(self.ecm.calls, ['calculateDeadLineHours'] * 2)
+
+    async def test_anexos_com_conteudo(self):
+        content = os.urandom(256 * 1024)
+        self.ecm.documents[10] = (1000, 'relatorio.pdf', content)
+        self.ecm.attachments[1] = [{'attachmentSequence': 2, 'colleagueId': 'yoda', 'documentId': 10,
+                                    'version': 1000}]
+        self.service.numero_solicitacao = 1
+        with TemporaryDirectory() as diretorio:
+            anexos = await self.service.listar_anexos(com_conteudo=True, diretorio=diretorio)
+            with open(anexos['relatorio.pdf']['caminho'], 'rb') as fh:
+                self.assertEqual(fh.read(), content)
+
+    async def test_mtom(self):
+        registry.configure(mtom=True)
+        self.addCleanup(registry.configure)
+        server = FakeEcmServer(mtom=True).__enter__()
+        self.addCleanup(server.__exit__)
+        content = os.urandom(256 * 1024)
+        server.ecm.documents[10] = (1000, 'relatorio.pdf', content)
+        service = AsyncBaseService(server.url, 'yoda', 'senha', 'yoda', id_processo='selecao_jedi')
+        await service.iniciar_solicitacao({'nome': 'Anakin'}, ['yoda'], 'Iniciado',
+                                          anexos={'a.txt': {'description': 'A', 'content': content}})
+        self.assertEqual(server.mtom_requests, 1)
+        self.assertLess(server.bytes_received, len(content) * 4 // 3)
+        documentos = AsyncDocumentService(server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertEqual(await documentos.get_document_content(10, 'yoda', 1000, 'relatorio.pdf'), content)
+
+    async def test_mtom_recusado(self):
+        registry.configure(mtom=True)
+        self.addCleanup(registry.configure)
+        server = FakeEcmServer(handler=MtomRejectingHandler, mtom=True).__enter__()
+        self.addCleanup(server.__exit__)
+        server.ecm.documents[10] = (1000, 'relatorio.pdf', b'conteudo')
+        documentos = AsyncDocumentService(server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertEqual(await documentos.get_document_content(10, 'yoda', 1000, 'relatorio.pdf'), b'conteudo')
+        self.assertEqual(server.rejected, 1)
+        self.assertFalse(registry.supports_mtom(documentos.client))
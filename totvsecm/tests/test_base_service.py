@@ -0,0 +1,176 @@
+
+import json
+from threading import Lock
+from unittest import TestCase
+from unittest.mock import patch
+
+from totvsecm import DocumentService as document_module
+from totvsecm import Cache as cache_module
+from totvsecm.BaseService import BaseService
+from totvsecm.DocumentService import DocumentService
+from totvsecm.Records import RegistroAnexo
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def anexo(sequencia, documento, versao=1000):
+    return {'attachmentSequence': sequencia, 'documentId': documento, 'colleagueId': 'yoda', 'version': versao}
+
+
+class AnexosTest(TestCase):
+    def setUp(self):
+        document_module._document_info_cache.clear()
+        self.consultas = []
+        self.lock = Lock()
+
+        def get_active_document(service, nr_document_id, colleague_id):
+            with self.lock:
+                self.consultas.append(nr_document_id)
+            return [{'phisicalFile': 'arquivo%d.pdf' % nr_document_id, 'version': 1000}]
+
+        attachments = [anexo(1, 10)] + [anexo(sequencia, 100 + sequencia) for sequencia in range(2, 40)]
+        patches = [
+            patch.object(WorkflowEngineService, 'get_attachments', return_value=attachments),
+            patch.object(DocumentService, 'get_active_document', get_active_document),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        self.service = BaseService('http://ecm', 'yoda', 'senha', 'yoda', numero_solicitacao=1, concorrencia=4)
+
+    def test_ordem_e_formato(self):
+        anexos = self.service.anexos
+        self.assertEqual(list(anexos), ['arquivo%d.pdf' % (100 + sequencia) for sequencia in range(2, 40)])
+        self.assertEqual(anexos['arquivo102.pdf'], {'colleague_id': 'yoda', 'document_id': 102, 'version': 1000})
+        self.assertNotIn('arquivo10.pdf', anexos)
+
+    def test_dicionarios_e_registros(self):
+        anexos = self.service.anexos
+        self.assertIs(type(anexos['arquivo102.pdf']), dict)
+        json.dumps(anexos)
+        anexos['arquivo102.pdf']['descricao'] = 'Contrato'
+
+        registros = self.service.listar_anexos(registros=True)
+        self.assertIsInstance(registros['arquivo102.pdf'], RegistroAnexo)
+        self.assertEqual(registros['arquivo102.pdf'].document_id, 102)
+
+    def test_informacoes_reaproveitadas(self):
+        self.service.anexos
+        self.service.anexos
+        self.assertEqual(sorted(self.consultas), list(range(102, 140)))
+
+
+class CacheTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.ecm.active_states[1] = [1]
+        self.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        self.ecm.card_data[1] = {'nome': 'Anakin', 'WKDef': 'selecao_jedi'}
+        self.ecm.histories[1] = [{'movementDate': '2020-01-01T10:00:00', 'movementHour': 0, 'stateSequence': 1}]
+
+    def servico(self, cache):
+        return BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1, cache=cache)
+
+    def test_movimentar_consulta_atividade_uma_vez(self):
+        self.servico(cache=False).movimentar(1, 5, nome='Darth Vader')
+        self.assertEqual(self.ecm.calls, ['getAttachments', 'getInstanceCardData', 'getAllActiveStates',
+                                          'updateCardData', 'saveAndSendTaskClassic'])
+        self.assertEqual(self.ecm.card_data[77], {'nome': 'Darth Vader'})
+
+    def test_consultas_memorizadas(self):
+        service = self.servico(cache=True)
+        service.carregar_solicitacao()
+        service.carregar_solicitacao()
+        for _ in range(3):
+            service.atividade_atual
+            service.finalizado
+            service.historico_tratado
+        self.assertEqual(self.ecm.calls, ['getAttachments', 'getInstanceCardData', 'getAllActiveStates',
+                                          'getHistories'])
+
+    def test_alteracao_invalida_cache(self):
+        service = self.servico(cache=True)
+        self.assertEqual(service.atividade_atual, [1])
+        service.avancar(5)
+        self.assertEqual(service.atividade_atual, [5])
+        service.cancelar_solicitacao('Cancelado')
+        self.assertTrue(service.finalizado)
+        self.assertEqual(self.ecm.calls.count('getAllActiveStates'), 3)
+
+    def test_sem_cache(self):
+        service = self.servico(cache=False)
+        service.atividade_atual
+        service.atividade_atual
+        self.assertEqual(self.ecm.calls, ['getAllActiveStates', 'getAllActiveStates'])
+
+
+class PrazoTest(TestCase):
+    def setUp(self):
+        cache_module.prazos.clear()
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.service = BaseService(self.server.url, 'yoda', 'senha', 'yoda', concorrencia=4)
+
+    def test_calcular_prazo(self):
+        self.assertEqual(self.service.calcular_prazo('2020-01-01', 3600, 2, 'Default'),
+                         {'date': '2020-01-01', 'hora': 3600 * 3})
+        # Valores com aspas não afetam a conversão do resultado.
+        self.assertEqual(self.service.calcular_prazo("2020-01-01'", 0, 1, 'Default'),
+                         {'date': "2020-01-01'", 'hora': 3600})
+
+    def test_prazos_memorizados(self):
+        prazo = self.service.calcular_prazo('2020-01-01', 3600, 2, 'Default')
+        prazo['hora'] = 0
+        outro = BaseService(self.server.url, 'yoda', 'senha', 'yoda')
+        self.assertEqual(outro.calcular_prazo('2020-01-01', 3600, 2, 'Default')['hora'], 3600 * 3)
+        self.assertEqual(self.ecm.calls, ['calculateDeadLineHours'])
+
+        # Empresas diferentes não compartilham os prazos.
+        BaseService(self.server.url, 'yoda', 'senha', 'yoda', id_empresa=2).calcular_prazo('2020-01-01', 3600, 2,
+                                                                                           'Default')
+        self.assertEqual(len(self.ecm.calls), 2)
+
+    def test_calcular_prazos(self):
+        entradas = [('2020-01-01', 3600 * hora, 2, 'Default') for hora in (8, 9, 8, 10, 9, 8)]
+        prazos = self.service.calcular_prazos(entradas)
+        self.assertEqual([prazo['hora'] for prazo in prazos], [3600 * hora for hora in (10, 11, 10, 12, 11, 10)])
+        self.assertEqual(self.ecm.calls, ['calculateDeadLineHours'] * 3)
+        self.assertIsNot(prazos[0], prazos[2])
+
+
+class ProjecaoTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        for numero in range(1, 6):
+            self.ecm.card_data[numero] = {'nome': 'Anakin %d' % numero, 'sobrenome': 'Skywalker', 'mestre': 'Obi-Wan',
+                                          'WKDef': 'selecao_jedi'}
+        self.service = BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=2, concorrencia=4)
+
+    def test_poucos_campos_consultados_individualmente(self):
+        tabela = self.service.projetar_campos(['nome', 'inexistente'], [3, 1, 3])
+        self.assertEqual(list(tabela), [3, 1])
+        self.assertEqual(tabela[3], ('Anakin 3', None))
+        self.assertEqual(tabela.registro(1), {'nome': 'Anakin 1', 'inexistente': None})
+        self.assertEqual(tabela.coluna('nome'), ['Anakin 3', 'Anakin 1'])
+        self.assertEqual(sorted(self.ecm.calls), ['getCardValue'] * 4)
+
+    def test_muitos_campos_consultam_o_formulario(self):
+        tabela = self.service.projetar_campos(['nome', 'sobrenome', 'mestre', 'inexistente'], range(1, 6))
+        self.assertEqual(len(tabela), 5)
+        self.assertEqual(tabela[5], ('Anakin 5', 'Skywalker', 'Obi-Wan', None))
+        self.assertEqual(self.ecm.calls, ['getInstanceCardData'] * 5)
+
+        rapido = BaseService(self.server.url, 'yoda', 'senha', 'yoda', decodificacao_rapida=True)
+        self.assertEqual(dict(rapido.projetar_campos(['nome', 'mestre'], [1, 2], limite_campos=0)), {
+            1: ('Anakin 1', 'Obi-Wan'), 2: ('Anakin 2', 'Obi-Wan')})
+
+    def test_solicitacao_da_instancia(self):
+        self.assertEqual(dict(self.service.projetar_campos(['sobrenome'])), {2: ('Skywalker',)})
+        self.assertEqual(dict(self.service.projetar_campos(['nome'], [])), {})
+        self.assertNotIn('getAttachments', self.ecm.calls)
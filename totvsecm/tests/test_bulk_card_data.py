@@ -0,0 +1,80 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from zeep.exceptions import LookupError
+
+from totvsecm.AsyncCardService import AsyncCardService
+from totvsecm.BulkCardData import BULK_THRESHOLD, BulkCardData
+from totvsecm.CardService import CardService
+from totvsecm.ClientRegistry import registry
+from totvsecm.SoapService import SoapService
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def formulario(quantidade=3 * BULK_THRESHOLD):
+    data = {'campo%d' % i: 'valor %d' % i for i in range(quantidade)}
+    data.update({'vazio': '', 'nulo': None, 'numero': 42, 'simbolos': '<&> "aspas"', 'acentos': 'ação'})
+    return data
+
+
+class BulkCardDataTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.card_service = CardService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        self.workflow_service = WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+
+    def envelopes(self, service, operation, array_name, item_name, key_name, args, kwargs):
+        """Retorna o envelope montado pelo zeep, com um objeto por campo, e o montado por BulkCardData."""
+        data = formulario()
+        array_type, item_type = service._get_type(array_name), service._get_type(item_name)
+        zeep = array_type(item=[item_type(**{key_name: key, 'value': value}) for key, value in data.items()])
+        bulk = BulkCardData(data, array_type, item_type, key_name)
+        return (service._create_request(operation, *args, cardData=zeep, **kwargs)[1],
+                service._create_request(operation, *args, cardData=bulk, **kwargs)[1])
+
+    def test_envelope_identico(self):
+        esperado, obtido = self.envelopes(self.card_service, 'updateCardData', 'cardFieldDtoArray', 'cardFieldDto',
+                                          'field', (1, 'yoda', 'senha', 77), {})
+        self.assertEqual(obtido, esperado)
+
+        esperado, obtido = self.envelopes(self.workflow_service, 'saveAndSendTaskClassic', 'keyValueDtoArray',
+                                          'keyValueDto', 'key', ('yoda', 'senha', 1, 10, 5, ['yoda'], 'Ok', 'yoda',
+                                                                 True),
+                                          dict(attachments={}, appointment={}, managerMode=False, threadSequence=0))
+        self.assertEqual(obtido, esperado)
+
+    def test_formulario_grande_enviado(self):
+        data = formulario()
+        self.card_service.update_card_data(77, data)
+        self.assertEqual(self.server.ecm.card_data[77],
+                         {key: None if value is None else str(value) for key, value in data.items()})
+
+        self.server.ecm.active_states[10] = [1]
+        self.workflow_service.save_and_send_task_classic(10, 5, ['yoda'], 'Ok', data)
+        self.assertEqual(self.server.ecm.active_states[10], [5])
+
+    def test_tipos_resolvidos_uma_vez(self):
+        with patch.object(SoapService, '_resolve_type', wraps=SoapService._resolve_type) as resolve_type:
+            for _ in range(3):
+                self.card_service.update_card_data(77, {'nome': 'Yoda'})
+                CardService(self.server.url, 'yoda', 'senha', 1, 'yoda')._get_type('cardFieldDto')
+        self.assertEqual(sorted(call.args[1] for call in resolve_type.call_args_list),
+                         ['cardFieldDto', 'cardFieldDtoArray'])
+        self.assertRaises(LookupError, self.card_service._get_type, 'inexistente')
+
+
+class AsyncBulkCardDataTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    async def asyncTearDown(self):
+        await registry.aclose()
+
+    async def test_formulario_grande_enviado(self):
+        data = formulario()
+        await AsyncCardService(self.server.url, 'yoda', 'senha', 1, 'yoda').update_card_data(77, data)
+        self.assertEqual(self.server.ecm.card_data[77],
+                         {key: None if value is None else str(value) for key, value in data.items()})
@@ -0,0 +1,90 @@
+
+import time
+from unittest import TestCase
+
+from totvsecm.BulkExecutor import BulkExecutor, Operacao
+from totvsecm.RateLimiter import RateLimiter, rate_limiters
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+class BulkExecutorTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.executor = BulkExecutor(self.server.url, 'yoda', 'senha', 'yoda', id_processo='selecao_jedi',
+                                     max_workers=4)
+
+    def test_operacao_nao_suportada(self):
+        resultados = list(self.executor.executar([Operacao('remover_tudo', 1),
+                                                   Operacao('cancelar_solicitacao', 2, {'mensagem': 'Cancelada'})]))
+        erros = {r.operacao.metodo: r.erro for r in resultados}
+        # A operação inválida é retornada com erro, sem interromper as demais.
+        self.assertIsInstance(erros['remover_tudo'], ValueError)
+        self.assertIsNone(erros['cancelar_solicitacao'])
+        self.assertEqual(self.executor.relatorio.erros, 1)
+
+    def test_limite_por_requisicao(self):
+        self.addCleanup(rate_limiters.clear)
+        for numero in (1, 2):
+            self.server.ecm.active_states[numero] = [1]
+            self.server.ecm.attachments[numero] = [{'attachmentSequence': 1, 'documentId': 77}]
+            self.server.ecm.card_data[numero] = {'nome': 'Anakin'}
+        executor = BulkExecutor(self.server.url, 'yoda', 'senha', 'yoda', max_workers=4, limite_por_segundo=4)
+        inicio = time.monotonic()
+        resultados = list(executor.executar(Operacao('movimentar', n, {'origem': 1, 'destino': 5, 'nome': 'Luke'})
+                                            for n in (1, 2)))
+        duracao = time.monotonic() - inicio
+        self.assertTrue(all(r.erro is None for r in resultados))
+        # Cada requisição SOAP consome o limite: as 4 primeiras são imediatas e as demais, 4 por segundo.
+        requisicoes = len(self.server.ecm.calls)
+        self.assertGreater(requisicoes, 4)
+        self.assertGreaterEqual(duracao, (requisicoes - 4) / 4 * 0.9)
+
+    def test_resultados_e_relatorio(self):
+        lidas = []
+
+        def operacoes():
+            for numero in range(1, 41):
+                lidas.append(numero)
+                yield Operacao('cancelar_solicitacao', numero, {'mensagem': 'Cancelada em lote'})
+            yield Operacao('atualizar_formulario', 1, {'dados_formulario': {'a': 'b'}})
+
+        resultados = self.executor.executar(operacoes())
+        next(resultados)
+        # Apenas uma janela limitada da entrada é lida antes dos primeiros resultados.
+        self.assertLessEqual(len(lidas), 9)
+
+        resultados = [next(resultados)] + list(resultados)
+        self.assertEqual(len(resultados), 40)
+        self.assertEqual(sum(r.erro is not None for r in resultados), 1)
+
+        relatorio = self.executor.relatorio
+        self.assertEqual((relatorio.total, relatorio.erros), (41, 1))
+        self.assertGreater(relatorio.ops_por_segundo, 0)
+        self.assertLessEqual(relatorio.p50, relatorio.p95)
+
+
+class RateLimiterTest(TestCase):
+    def test_limite(self):
+        limiter = RateLimiter(50, burst=1)
+        inicio = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.19)
+
+    def test_limitador_compartilhado_por_servidor(self):
+        self.addCleanup(rate_limiters.clear)
+        primeiro = BulkExecutor('http://ecm', 'yoda', 'senha', 'yoda', limite_por_segundo=50)
+        segundo = BulkExecutor('http://ecm/', 'luke', 'senha', 'luke', limite_por_segundo=20)
+        outro = BulkExecutor('http://outro', 'yoda', 'senha', 'yoda', limite_por_segundo=50)
+        self.assertIs(primeiro.rate_limiter, segundo.rate_limiter)
+        self.assertIsNot(primeiro.rate_limiter, outro.rate_limiter)
+        # Prevalece o último limite informado para o servidor, mesmo que maior que o anterior.
+        self.assertEqual((primeiro.rate_limiter.rate, primeiro.rate_limiter.capacity), (20, 20))
+        BulkExecutor('http://ecm', 'yoda', 'senha', 'yoda', limite_por_segundo=1)
+        BulkExecutor('http://ecm', 'yoda', 'senha', 'yoda', limite_por_segundo=200)
+        self.assertEqual(primeiro.rate_limiter.rate, 200)
+        inicio = time.monotonic()
+        for _ in range(100):
+            primeiro.rate_limiter.acquire()
+        self.assertLess(time.monotonic() - inicio, 0.5)
@@ -0,0 +1,124 @@
+
+import csv
+import gzip
+import io
+import json
+import os
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from totvsecm.BulkExporter import BulkExporter, main
+from totvsecm.ClientRegistry import registry
+from totvsecm.tests.fake_ecm import FakeEcm, FakeEcmServer, history
+
+
+class BrokenEcm(FakeEcm):
+    """ECM simulado que falha ao consultar o histórico da solicitação 13."""
+
+    def getHistories(self, params):
+        if int(params['processInstanceId'].text) == 13:
+            raise ValueError('histórico indisponível')
+        return super().getHistories(params)
+
+
+def interromper(numeros, depois_de):
+    """Gera os números, interrompendo a exportação após a quantidade informada."""
+    for i, numero in enumerate(numeros):
+        if i == depois_de:
+            raise KeyboardInterrupt
+        yield numero
+
+
+def ler_jsonl(caminho):
+    abrir = gzip.open if caminho.endswith('.gz') else open
+    with abrir(caminho, 'rt', encoding='utf-8') as fh:
+        return [json.loads(linha) for linha in fh]
+
+
+class BulkExporterTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer(BrokenEcm()).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.addCleanup(registry.clear)
+        ecm = self.server.ecm
+        for numero in range(1, 41):
+            ecm.histories[numero] = history([(5, 'yoda', 'Aprovado'), (7, 'vader', 'Concluído %d' % numero)])
+            ecm.card_data[numero] = {'nome': 'Anakin %d' % numero, 'WKDef': 'selecao_jedi'}
+            ecm.attachments[numero] = [{'attachmentSequence': 1, 'colleagueId': 'yoda', 'description': 'Ficha',
+                                        'documentId': 1000 + numero, 'version': 1000}]
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def exporter(self, **kwargs):
+        return BulkExporter(self.server.url, 'yoda', 'senha', 'yoda', self.tmp.name, max_workers=4, **kwargs)
+
+    def test_exportacao_jsonl(self):
+        resumo = self.exporter().exportar(range(1, 21))
+        self.assertEqual((resumo.exportadas, resumo.erros, resumo.retomadas), (19, 1, 0))
+
+        historico = ler_jsonl(os.path.join(self.tmp.name, 'historico.jsonl'))
+        self.assertEqual(len(historico), 38)
+        registro = next(r for r in historico if r['numero_solicitacao'] == 2 and r['proxima_atividade'] == 7)
+        self.assertEqual(registro['observacao'], 'Concluído 2')
+        self.assertEqual(registro['data_hora'], '2020-01-02T08:01:00')
+
+        formulario = ler_jsonl(os.path.join(self.tmp.name, 'formulario.jsonl'))
+        self.assertIn({'numero_solicitacao': 12, 'campo': 'nome', 'valor': 'Anakin 12'}, formulario)
+        self.assertEqual(len(formulario), 38)
+        anexos = ler_jsonl(os.path.join(self.tmp.name, 'anexos.jsonl'))
+        # Os registros de uma solicitação com falha não são gravados.
+        self.assertEqual(sorted(a['documento'] for a in anexos), [1000 + n for n in range(1, 21) if n != 13])
+
+        erros = ler_jsonl(os.path.join(self.tmp.name, 'erros.jsonl'))
+        self.assertEqual([e['numero_solicitacao'] for e in erros], [13])
+
+    def test_csv_comprimido(self):
+        self.exporter(formato='csv', comprimir=True, tipos=['formulario']).exportar(range(1, 6))
+        with gzip.open(os.path.join(self.tmp.name, 'formulario.csv.gz'), 'rt', encoding='utf-8', newline='') as fh:
+            linhas = list(csv.reader(fh))
+        self.assertEqual(linhas[0], ['numero_solicitacao', 'campo', 'valor'])
+        self.assertEqual(sorted(linhas[1:])[0], ['1', 'WKDef', 'selecao_jedi'])
+        self.assertEqual(len(linhas), 11)
+        self.assertNotIn('getHistories', self.server.ecm.calls)
+
+    def test_retomada_apos_interrupcao(self):
+        numeros = list(range(1, 41))
+        with self.assertRaises(KeyboardInterrupt):
+            self.exporter(comprimir=True, intervalo_checkpoint=5).exportar(interromper(numeros, 25))
+        with open(os.path.join(self.tmp.name, 'checkpoint.json')) as fh:
+            checkpoint = json.load(fh)
+        self.assertGreaterEqual(checkpoint['posicao'], 5)
+
+        # Dados gravados após o checkpoint, como numa interrupção durante a gravação, são descartados.
+        with open(os.path.join(self.tmp.name, 'historico.jsonl.gz'), 'ab') as fh:
+            fh.write(gzip.compress(b'{"incompleto": '))
+
+        self.server.ecm.calls.clear()
+        resumo = self.exporter(comprimir=True, intervalo_checkpoint=5).exportar(numeros)
+        self.assertEqual(resumo.exportadas + resumo.erros + resumo.retomadas, 40)
+        self.assertGreater(resumo.retomadas, 0)
+        self.assertEqual(self.server.ecm.calls.count('getHistories'), 40 - resumo.retomadas)
+
+        historico = ler_jsonl(os.path.join(self.tmp.name, 'historico.jsonl.gz'))
+        numeros_exportados = sorted(r['numero_solicitacao'] for r in historico)
+        self.assertEqual(numeros_exportados, sorted([n for n in numeros if n != 13] * 2))
+
+    def test_configuracao_diferente_na_retomada(self):
+        self.exporter().exportar(range(1, 3))
+        with self.assertRaisesRegex(AssertionError, 'outra configuração'):
+            self.exporter(formato='csv').exportar(range(1, 3))
+
+    def test_linha_de_comando(self):
+        arquivo = os.path.join(self.tmp.name, 'numeros.txt')
+        with open(arquivo, 'w') as fh:
+            fh.write('# solicitações\n1\n2\n\n3\n')
+        destino = os.path.join(self.tmp.name, 'saida')
+        os.environ['TOTVSECM_SENHA'] = 'senha'
+        self.addCleanup(os.environ.pop, 'TOTVSECM_SENHA')
+        saida = io.StringIO()
+        with redirect_stdout(saida):
+            codigo = main([self.server.url, 'yoda', destino, '--arquivo', arquivo, '--tipos', 'anexos'])
+        self.assertEqual(codigo, 0)
+        self.assertIn('3 solicitações exportadas', saida.getvalue())
+        self.assertEqual(len(ler_jsonl(os.path.join(destino, 'anexos.jsonl'))), 3)
@@ -0,0 +1,222 @@
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from requests import Timeout
+from zeep.exceptions import TransportError
+
+from totvsecm.AsyncDocumentService import AsyncDocumentService
+from totvsecm.AsyncWorkflowEngineService import AsyncWorkflowEngineService
+from totvsecm.CallExecutor import AdaptiveLimiter, CallExecutor, call_executor
+from totvsecm.ClientRegistry import registry
+from totvsecm.DocumentService import DocumentService
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmHandler, FakeEcmServer
+
+
+class UnavailableHandler(FakeEcmHandler):
+    """Responde 503 às primeiras operações, como um servidor sobrecarregado."""
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.posts += 1
+            unavailable = self.server.posts <= self.server.failures
+        if not unavailable:
+            return super().do_POST()
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send(503, b'', 'text/plain')
+
+
+def unavailable_server(failures):
+    server = FakeEcmServer(handler=UnavailableHandler).__enter__()
+    server.posts = 0
+    server.failures = failures
+    return server
+
+
+class AdaptiveLimiterTest(TestCase):
+    def test_aumento_aditivo_e_reducao_multiplicativa(self):
+        limiter = AdaptiveLimiter(initial=4, maximum=5)
+        for _ in range(8):
+            limiter.release('op', limiter.acquire(), False)
+        self.assertEqual(limiter.limit, 5)
+
+        limiter.release('op', limiter.acquire(), True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_uma_reducao_por_janela(self):
+        limiter = AdaptiveLimiter(initial=8)
+        starts = [limiter.acquire() for _ in range(4)]
+        for start in starts:
+            limiter.release('op', start, True)
+        # Apenas a primeira falha reduz o limite: as demais chamadas foram iniciadas antes da redução.
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_latencia_das_transferencias_nao_reduz_o_limite(self):
+        limiter = AdaptiveLimiter(initial=10, latency_tolerance=3)
+        for _ in range(AdaptiveLimiter.MIN_SAMPLES):
+            limiter.release('getDocumentContent', limiter.acquire() - 0.01, False)
+        limit = limiter.limit
+        limiter.acquire()
+        limiter.release('getDocumentContent', time.monotonic() - 10, False)
+        self.assertGreaterEqual(limiter.limit, limit)
+
+    def test_latencia_acima_da_tolerancia_reduz_o_limite(self):
+        limiter = AdaptiveLimiter(initial=10, latency_tolerance=3)
+        now = time.monotonic()
+        for _ in range(AdaptiveLimiter.MIN_SAMPLES):
+            limiter.release('op', limiter.acquire() - 0.01, False)
+        limit = limiter.limit
+        limiter.acquire()
+        limiter.release('op', now - 1, False)
+        self.assertEqual(limiter.limit, limit // 2)
+
+    def test_chamadas_simultaneas_limitadas(self):
+        limiter = AdaptiveLimiter(initial=3, maximum=3)
+        lock = Lock()
+        active = [0, 0]
+
+        def call():
+            start = limiter.acquire()
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            limiter.release('op', start, False)
+
+        with ThreadPoolExecutor(10) as executor:
+            list(executor.map(lambda _: call(), range(30)))
+        self.assertEqual(active[1], 3)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class CallExecutorTest(TestCase):
+    def setUp(self):
+        self.addCleanup(call_executor.configure)
+        call_executor.configure(backoff=0.01)
+
+    def service(self, server):
+        self.addCleanup(server.__exit__)
+        self.addCleanup(registry.clear)
+        return WorkflowEngineService(server.url, 'yoda', 'senha', 1, 'yoda')
+
+    def test_consulta_repetida_apos_indisponibilidade(self):
+        call_executor.configure(backoff=0.01, adaptive=True)
+        server = unavailable_server(2)
+        service = self.service(server)
+        service.client
+        server.ecm.active_states[1] = [5]
+        self.assertEqual(service.get_all_active_states(1), [5])
+        self.assertEqual(server.posts, 3)
+        self.assertLess(call_executor.limiter(server.url).limit, 32)
+
+    def test_tentativas_esgotadas(self):
+        call_executor.configure(backoff=0.01, retries=1)
+        server = unavailable_server(5)
+        service = self.service(server)
+        service.client
+        with self.assertRaises(TransportError):
+            service.get_all_active_states(1)
+        self.assertEqual(server.posts, 2)
+
+    def test_operacoes_nao_idempotentes_nunca_repetidas(self):
+        server = unavailable_server(1)
+        service = self.service(server)
+        service.client
+        with self.assertRaises(TransportError):
+            service.start_process_classic('selecao_jedi', ['yoda'], {'nome': 'Anakin'}, 'Iniciado')
+        self.assertEqual(server.posts, 1)
+        self.assertEqual(server.ecm.calls, [])
+
+    def test_tempo_maximo_por_operacao(self):
+        call_executor.configure(timeouts={'getAllActiveStates': 0.1}, retries=0)
+        server = FakeEcmServer(latency=0.5).__enter__()
+        service = self.service(server)
+        service.client
+        with self.assertRaises(Timeout):
+            service.get_all_active_states(1)
+        # As demais operações utilizam o tempo máximo do transporte.
+        self.assertFalse(service.get_attachments(1))
+
+    def test_limitador_desativado_por_padrao(self):
+        executor = CallExecutor()
+        self.assertFalse(executor.adaptive)
+        self.assertEqual(executor.execute('http://ecm', 'getHistories', lambda: 'ok'), 'ok')
+        self.assertEqual(executor.limiter('http://ecm').in_flight, 0)
+
+    def test_stream_mantem_a_vaga_ate_o_fim_da_leitura(self):
+        executor = CallExecutor()
+        executor.configure(adaptive=True)
+        limiter = executor.limiter('http://ecm')
+        chunks = executor.stream('http://ecm', 'getDocumentContent', lambda: iter([b'a', b'b']))
+        self.assertEqual(next(chunks), b'a')
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(list(chunks), [b'b'])
+        self.assertEqual(limiter.in_flight, 0)
+
+        chunks = executor.stream('http://ecm', 'getDocumentContent', lambda: iter([b'a', b'b']))
+        next(chunks)
+        chunks.close()
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_stream_repetido_antes_da_primeira_parte(self):
+        executor = CallExecutor()
+        executor.configure(backoff=0.01)
+        attempts = []
+
+        def function():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise TransportError(status_code=503)
+            yield b'conteudo'
+
+        self.assertEqual(list(executor.stream('http://ecm', 'getDocumentContent', function)), [b'conteudo'])
+        self.assertEqual(len(attempts), 2)
+
+    def test_stream_de_documento_pelo_limitador(self):
+        call_executor.configure(adaptive=True, initial_limit=1, max_limit=1)
+        server = FakeEcmServer().__enter__()
+        server.ecm.documents[10] = (1000, 'documento.pdf', b'conteudo')
+        service = DocumentService(server.url, 'yoda', 'senha', 1, 'yoda')
+        self.addCleanup(server.__exit__)
+        chunks = service.iter_document_content(10, 'yoda', 1000, 'documento.pdf')
+        self.assertEqual(next(chunks), b'conteudo')
+        self.assertEqual(call_executor.limiter(server.url).in_flight, 1)
+        chunks.close()
+        self.assertEqual(call_executor.limiter(server.url).in_flight, 0)
+
+
+class AsyncCallExecutorTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.addCleanup(call_executor.configure)
+        call_executor.configure(backoff=0.01)
+        self.server = unavailable_server(1)
+        self.addCleanup(self.server.__exit__)
+
+    async def asyncTearDown(self):
+        await registry.aclose()
+
+    async def test_consulta_repetida_apos_indisponibilidade(self):
+        self.server.ecm.active_states[1] = [5]
+        service = AsyncWorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertEqual(await service.get_all_active_states(1), [5])
+        self.assertEqual(self.server.posts, 2)
+
+    async def test_stream_de_documento_pelo_limitador(self):
+        call_executor.configure(backoff=0.01, adaptive=True)
+        self.server.ecm.documents[10] = (1000, 'documento.pdf', b'conteudo')
+        service = AsyncDocumentService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        limiter = call_executor.limiter(self.server.url)
+        chunks = []
+        # A primeira requisição recebe 503 e é repetida, pois nenhuma parte havia sido recebida.
+        async for chunk in service.iter_document_content(10, 'yoda', 1000, 'documento.pdf'):
+            self.assertEqual(limiter.in_flight, 1)
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), b'conteudo')
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(self.server.posts, 2)
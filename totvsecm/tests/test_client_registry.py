@@ -0,0 +1,84 @@
+
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import ClientRegistry, registry
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+class ClientRegistryTest(TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+        self.created = []
+
+        def create_client(server, service_name):
+            self.created.append((server, service_name))
+            return object()
+
+        self.registry._create_client = create_client
+
+    def test_cliente_reutilizado(self):
+        client = self.registry.get('http://ecm/', 'WorkflowEngineService')
+        self.assertIs(client, self.registry.get('http://ecm', 'WorkflowEngineService'))
+        self.assertIsNot(client, self.registry.get('http://ecm', 'DocumentService'))
+        self.assertEqual(self.created, [('http://ecm', 'WorkflowEngineService'), ('http://ecm', 'DocumentService')])
+
+    def test_criacao_unica_entre_threads(self):
+        threads = [Thread(target=self.registry.get, args=('http://ecm', 'CardService')) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.created), 1)
+
+    def test_base_service_nao_cria_clientes(self):
+        with patch.object(registry, '_create_client') as create_client:
+            BaseService('http://ecm', 'usuario', 'senha', 'usuario', numero_solicitacao=1)
+            BaseService('http://ecm', 'outro', 'outra', 'outro', numero_solicitacao=2)
+            create_client.assert_not_called()
+
+
+class PooledTransportTest(TestCase):
+    def servidor(self, **kwargs):
+        server = FakeEcmServer(**kwargs).__enter__()
+        self.addCleanup(server.__exit__)
+        server.ecm.active_states[1] = [1]
+        server.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        server.ecm.card_data[1] = {'campo%d' % i: 'valor %d' % i for i in range(200)}
+        return server
+
+    def comprimir(self):
+        registry.configure(compress_requests=True)
+        self.addCleanup(registry.configure)
+
+    def test_conexao_compartilhada(self):
+        server = self.servidor(gzip_responses=True)
+        for _ in range(3):
+            service = BaseService(server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+            service.carregar_solicitacao()
+            service.atualizar_formulario({'campo1': 'alterado'})
+            service.anexos
+        self.assertEqual(server.connections, 1)
+        sessions = {registry.get(server.url, name).transport.session
+                    for name in ('WorkflowEngineService', 'DocumentService', 'CardService')}
+        self.assertEqual(len(sessions), 1)
+
+    def test_requisicoes_comprimidas(self):
+        self.comprimir()
+        server = self.servidor()
+        BaseService(server.url, 'yoda', 'senha', 'yoda', numero_ficha=77).atualizar_formulario(
+            server.ecm.card_data[1])
+        self.assertEqual(server.ecm.card_data[77], server.ecm.card_data[1])
+        self.assertLess(server.bytes_received * 3, len(server.ecm.requests[-1]))
+
+    def test_servidor_sem_compressao(self):
+        self.comprimir()
+        server = self.servidor(accept_gzip=False)
+        service = BaseService(server.url, 'yoda', 'senha', 'yoda', numero_ficha=77)
+        service.atualizar_formulario(server.ecm.card_data[1])
+        service.atualizar_formulario(server.ecm.card_data[1])
+        self.assertEqual(server.ecm.card_data[77], server.ecm.card_data[1])
+        self.assertEqual(server.ecm.calls, ['updateCardData', 'updateCardData'])
+        self.assertFalse(registry.get(server.url, 'CardService').transport.compress_requests)
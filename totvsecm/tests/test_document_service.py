@@ -0,0 +1,178 @@
+
+import base64
+import os
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from zeep.exceptions import Fault, TransportError
+
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import registry
+from totvsecm.DocumentService import DocumentService
+from totvsecm.Streaming import Base64Decoder, FileSource, MultipartContentParser, StreamingBody
+from totvsecm.tests.fake_ecm import FakeEcm, FakeEcmHandler, FakeEcmServer, fault, to_multipart
+
+
+class MtomRejectingHandler(FakeEcmHandler):
+    """Anuncia o MTOM/XOP no WSDL, mas recusa as requisições que aceitam respostas MTOM/XOP."""
+
+    def do_POST(self):
+        if 'multipart/related' not in self.headers.get('Accept', ''):
+            return super().do_POST()
+        self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.rejected = getattr(self.server, 'rejected', 0) + 1
+        self.send(415, b'', 'text/plain')
+
+
+class Base64DecoderTest(TestCase):
+    def test_partes_arbitrarias(self):
+        content = os.urandom(1000)
+        text = base64.encodebytes(content)
+        decoder = Base64Decoder()
+        decoded = b''.join(decoder.decode(text[i:i + 7]) for i in range(0, len(text), 7)) + decoder.flush()
+        self.assertEqual(decoded, content)
+
+
+class ShortReadFile(BytesIO):
+    """Arquivo cujas leituras retornam menos bytes que o solicitado, como pipes e sockets."""
+
+    def read(self, size=-1):
+        return super().read(min(size, 1000) if size > 0 else size)
+
+
+class StreamingBodyTest(TestCase):
+    def test_leituras_parciais(self):
+        content = os.urandom(10000)
+        body = StreamingBody(b'<a>MARCADOR</a>', {b'MARCADOR': FileSource(ShortReadFile(content))})
+        enviado = b''.join(body)
+        self.assertEqual(len(enviado), len(body))
+        self.assertEqual(base64.b64decode(enviado[3:-4]), content)
+
+
+class MultipartContentParserTest(TestCase):
+    def resposta(self, content):
+        ecm = FakeEcm()
+        ecm.documents[10] = (1000, 'relatorio.pdf', content)
+        envelope = ecm.respond('DocumentService', (
+            b'<Envelope xmlns="http://schemas.xmlsoap.org/soap/envelope/"><Body>'
+            b'<getDocumentContent xmlns="http://ws.dm.ecm.technology.totvs.com/">'
+            b'<nrDocumentId xmlns="">10</nrDocumentId></getDocumentContent></Body></Envelope>'))
+        return to_multipart(envelope)
+
+    def test_partes_arbitrarias(self):
+        content = os.urandom(10000) + b'\r\n--uuid:'
+        body, content_type = self.resposta(content)
+        parser = MultipartContentParser(200, content_type)
+        chunks = []
+        for i in range(0, len(body), 7):
+            chunks.extend(parser.feed(body[i:i + 7]))
+        chunks.extend(parser.close())
+        self.assertEqual(b''.join(chunks), content)
+
+    def test_resposta_incompleta(self):
+        body, content_type = self.resposta(b'conteudo')
+        parser = MultipartContentParser(200, content_type)
+        parser.feed(body[:-20])
+        with self.assertRaises(TransportError):
+            parser.close()
+
+    def test_falha_do_servidor(self):
+        body = b'--limite\r\nContent-Type: application/xop+xml; type="text/xml"\r\n\r\n%s\r\n--limite--' % (
+            fault('Documento inexistente'))
+        parser = MultipartContentParser(500, 'multipart/related; type="application/xop+xml"; boundary=limite')
+        with self.assertRaises(Fault):
+            parser.feed(body)
+
+
+class DocumentContentTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.content = os.urandom(3 * 1024 * 1024 + 1)
+        self.server.ecm.documents[10] = (1000, 'relatorio.pdf', self.content)
+        self.service = DocumentService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+
+    def test_conteudo_em_partes(self):
+        chunks = list(self.service.iter_document_content(10, 'yoda', 1000, 'relatorio.pdf', chunk_size=4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), self.content)
+
+    def test_download_para_arquivo(self):
+        destino = BytesIO()
+        self.assertEqual(self.service.download_document_content(10, 'yoda', 1000, 'relatorio.pdf', destino),
+                         len(self.content))
+        self.assertEqual(destino.getvalue(), self.content)
+
+    def test_falha_do_servidor(self):
+        with TemporaryDirectory() as diretorio:
+            destino = os.path.join(diretorio, 'inexistente.pdf')
+            with self.assertRaises(Fault):
+                self.service.download_document_content(99, 'yoda', 1000, 'inexistente.pdf', destino)
+            self.assertFalse(os.path.exists(destino))
+
+    def test_destino_invalido_preservado(self):
+        with TemporaryDirectory() as diretorio:
+            with self.assertRaises(IsADirectoryError) as contexto:
+                self.service.download_document_content(10, 'yoda', 1000, 'relatorio.pdf', diretorio)
+            # A falha ao abrir o destino não é mascarada pela remoção de um arquivo que não foi criado.
+            self.assertIsNone(contexto.exception.__context__)
+            self.assertTrue(os.path.isdir(diretorio))
+        self.assertNotIn('getDocumentContent', self.server.ecm.calls)
+
+    def test_anexos_com_conteudo(self):
+        self.server.ecm.documents[11] = (1000, 'foto.png', b'png')
+        self.server.ecm.attachments[1] = [
+            {'attachmentSequence': sequencia, 'colleagueId': 'yoda', 'companyId': 1, 'documentId': documento,
+             'version': 1000}
+            for sequencia, documento in ((1, 5), (2, 10), (3, 11))
+        ]
+        service = BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+        with TemporaryDirectory() as diretorio:
+            anexos = service.listar_anexos(com_conteudo=True, diretorio=diretorio)
+            self.assertEqual(list(anexos), ['relatorio.pdf', 'foto.png'])
+            with open(anexos['foto.png']['caminho'], 'rb') as fh:
+                self.assertEqual(fh.read(), b'png')
+            with open(os.path.join(diretorio, 'relatorio.pdf'), 'rb') as fh:
+                self.assertEqual(fh.read(), self.content)
+
+
+class MtomDocumentContentTest(TestCase):
+    def setUp(self):
+        registry.configure(mtom=True)
+        self.addCleanup(registry.configure)
+        self.server = FakeEcmServer(mtom=True).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.content = os.urandom(1024 * 1024 + 1)
+        self.server.ecm.documents[10] = (1000, 'relatorio.pdf', self.content)
+        self.service = DocumentService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+
+    def test_conteudo(self):
+        self.assertTrue(registry.supports_mtom(self.service.client))
+        self.assertEqual(self.service.get_document_content(10, 'yoda', 1000, 'relatorio.pdf'), self.content)
+
+    def test_conteudo_em_partes(self):
+        chunks = list(self.service.iter_document_content(10, 'yoda', 1000, 'relatorio.pdf', chunk_size=4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), self.content)
+
+    def test_servidor_sem_suporte(self):
+        server = FakeEcmServer().__enter__()
+        self.addCleanup(server.__exit__)
+        server.ecm.documents[10] = (1000, 'relatorio.pdf', b'base64')
+        service = DocumentService(server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertFalse(registry.supports_mtom(service.client))
+        self.assertEqual(service.get_document_content(10, 'yoda', 1000, 'relatorio.pdf'), b'base64')
+
+    def test_servidor_recusa_mtom(self):
+        server = FakeEcmServer(handler=MtomRejectingHandler, mtom=True).__enter__()
+        self.addCleanup(server.__exit__)
+        server.ecm.documents[10] = (1000, 'relatorio.pdf', self.content)
+        service = DocumentService(server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertTrue(registry.supports_mtom(service.client))
+        self.assertEqual(service.get_document_content(10, 'yoda', 1000, 'relatorio.pdf'), self.content)
+        # Após a recusa, o conteúdo passa a ser pedido em base64.
+        self.assertFalse(registry.supports_mtom(service.client))
+        self.assertEqual(b''.join(service.iter_document_content(10, 'yoda', 1000, 'relatorio.pdf')), self.content)
+        self.assertEqual(server.rejected, 1)
@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from lxml import etree
+
+from totvsecm.BaseService import BaseService
+from totvsecm.Formulario import Formulario
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+def carddata(campos):
+    return [{'item': [campo, valor]} for campo, valor in campos.items()]
+
+
+class FormularioTest(TestCase):
+    def test_alteracoes(self):
+        formulario = Formulario(carddata({'nome': 'Anakin', 'lado': 'luz', 'mestre': None}))
+        self.assertEqual(formulario.alteracoes, {})
+        formulario['nome'] = 'Darth Vader'
+        formulario['lado'] = 'sombrio'
+        formulario['lado'] = 'luz'
+        self.assertEqual(formulario.alteracoes, {'nome': 'Darth Vader'})
+
+        formulario.confirmar({'nome': 'Darth Vader'})
+        self.assertEqual(formulario.alteracoes, {})
+        self.assertEqual(dict(formulario), {'nome': 'Darth Vader', 'lado': 'luz', 'mestre': None})
+
+    def test_campos_fixos(self):
+        formulario = Formulario(carddata({'nome': 'Anakin'}))
+        self.assertRaisesRegex(Exception, 'não possui o campo "idade"', formulario.__setitem__, 'idade', 9)
+        self.assertRaises(TypeError, formulario.__delitem__, 'nome')
+
+
+class AtualizarFormularioTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.ecm.active_states[1] = [1]
+        self.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        self.ecm.card_data[1] = dict({'campo%d' % i: 'valor %d' % i for i in range(300)}, nome='Anakin')
+        self.service = BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+
+    def campos_enviados(self):
+        envelope = etree.fromstring(self.ecm.requests[self.ecm.calls.index('updateCardData')])
+        return {item.findtext('field'): item.findtext('value') for item in envelope.iter('item')}
+
+    def test_alteracoes_dos_atributos(self):
+        self.service.carregar_solicitacao()
+        self.service.nome = 'Darth Vader'
+        self.service.atualizar_formulario()
+        self.assertEqual(self.campos_enviados(), {'nome': 'Darth Vader'})
+
+        self.assertIsNone(self.service.atualizar_formulario())
+        self.assertEqual(self.ecm.calls.count('updateCardData'), 1)
+
+    def test_atributos_do_servico_nao_enviados(self):
+        self.ecm.card_data[1].update(usuario='campo do formulário', cache='outro campo')
+        self.service.carregar_solicitacao()
+        # Os campos com o nome de atributos do serviço não substituem os atributos.
+        self.assertEqual((self.service.usuario, self.service.cache), ('yoda', False))
+        self.assertEqual(self.service.formulario['usuario'], 'campo do formulário')
+
+        self.service.usuario = 'luke'
+        self.service.concorrencia = 2
+        self.service.atributo_proprio = 'valor'
+        self.assertEqual(self.service.formulario.alteracoes, {})
+        self.assertIsNone(self.service.atualizar_formulario())
+
+        self.service.movimentar(1, 5, usuario='Darth Vader')
+        self.assertEqual(self.campos_enviados(), {'usuario': 'Darth Vader'})
+        self.assertEqual(self.service.usuario, 'luke')
+
+    def test_movimentar_envia_apenas_alteracoes(self):
+        self.service.movimentar(1, 5, nome='Darth Vader', campo7='valor 7')
+        self.assertEqual(self.campos_enviados(), {'nome': 'Darth Vader'})
+        self.assertEqual(self.ecm.active_states[1], [5])
+
+    def test_movimentar_sem_alteracoes(self):
+        self.service.movimentar(1, 5, nome='Anakin')
+        self.assertNotIn('updateCardData', self.ecm.calls)
+        self.assertRaisesRegex(Exception, 'não possui o campo', self.service.movimentar, 5, 6, idade=9)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from totvsecm.BaseService import BaseService
+from totvsecm.HistoryStore import HistoryStore
+from totvsecm.AsyncBaseService import AsyncBaseService
+from totvsecm.ClientRegistry import registry
+from totvsecm.tests.fake_ecm import FakeEcm, FakeEcmServer, history
+
+
+class FinishingEcm(FakeEcm):
+    """ECM simulado em que a solicitação é finalizada logo após a consulta do histórico, ainda incompleto."""
+
+    def getHistories(self, params):
+        result = super().getHistories(params)
+        self.active_states[int(params['processInstanceId'].text)] = []
+        return result
+
+
+class HistoryStoreTest(TestCase):
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = HistoryStore(os.path.join(directory.name, 'historico.sqlite3'))
+        self.addCleanup(self.store.close)
+
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.ecm.histories[1] = history([(5, 'yoda', 'Aprovado'), (7, 'Pool:Role:jedi', None), (7, 'obiwan', 'Ok'),
+                                         (9, 'pooltester', 'Minúsculo')])
+
+    def servico(self, historico_persistente):
+        return BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1,
+                           historico_persistente=historico_persistente)
+
+    def test_finalizado_armazenado(self):
+        esperado = self.servico(None).historico_tratado
+        self.assertEqual(self.servico(self.store).historico_tratado, esperado)
+        self.assertTrue(self.store.contem(self.server.url + '/', 1))
+
+        self.ecm.calls.clear()
+        self.assertEqual(self.servico(self.store).historico_tratado, esperado)
+        self.assertEqual(self.ecm.calls, [])
+
+    def test_filtro_igual_ao_da_lista(self):
+        sem_armazenamento = self.servico(None)
+        self.servico(self.store).historico_tratado
+        self.ecm.calls.clear()
+        for sequencia in ([7], [5, 9], [], [8]):
+            for excluir_automaticos in (True, False):
+                self.assertEqual(self.servico(self.store).filtrar_historico(sequencia, excluir_automaticos),
+                                 sem_armazenamento.filtrar_historico(sequencia, excluir_automaticos))
+        # Apenas o serviço sem armazenamento consulta o ECM.
+        self.assertEqual(self.ecm.calls, ['getHistories'] * 8)
+
+    def test_tarefa_sem_responsavel(self):
+        self.ecm.histories[1] = history([(5, None, 'Sem responsável'), (7, 'Pool:Role:jedi', None), (7, None, None)])
+        sem_armazenamento = self.servico(None)
+        self.servico(self.store).historico_tratado
+        self.assertTrue(self.store.contem(self.server.url, 1))
+        # As tarefas sem responsável não são automáticas e não são excluídas do filtro.
+        filtrado = self.servico(self.store).filtrar_historico([5, 7])
+        self.assertEqual([h['observacao'] for h in filtrado], ['Sem responsável', None])
+        self.assertEqual(filtrado, sem_armazenamento.filtrar_historico([5, 7]))
+        self.assertEqual(len(self.servico(self.store).filtrar_historico([5, 7], excluir_automaticos=False)), 3)
+
+    def test_finalizado_apos_a_consulta_nao_armazenado(self):
+        self.server = FakeEcmServer(FinishingEcm()).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.ecm.active_states[1] = [7]
+        self.server.ecm.histories[1] = history([(5, 'yoda', 'Aprovado')])
+        self.servico(self.store).historico_tratado
+        self.assertFalse(self.store.contem(self.server.url, 1))
+
+    def test_finalizado_apos_a_consulta_nao_armazenado_assincrono(self):
+        self.server = FakeEcmServer(FinishingEcm()).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.ecm.active_states[1] = [7]
+        self.server.ecm.histories[1] = history([(5, 'yoda', 'Aprovado')])
+
+        async def consultar():
+            try:
+                return await AsyncBaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1,
+                                              historico_persistente=self.store).historico_tratado
+            finally:
+                await registry.aclose()
+
+        asyncio.run(consultar())
+        self.assertFalse(self.store.contem(self.server.url, 1))
+
+    def test_em_andamento_nao_armazenado(self):
+        self.ecm.active_states[1] = [7]
+        self.servico(self.store).historico_tratado
+        self.assertFalse(self.store.contem(self.server.url, 1))
+        self.assertIsNone(self.store.filtrar(self.server.url, 1, [7]))
@@ -0,0 +1,30 @@
+
+import subprocess
+import sys
+from unittest import TestCase
+
+import totvsecm
+from totvsecm.ClientRegistry import registry
+
+
+def modulos_carregados(codigo):
+    """Executa o código num interpretador novo e retorna as dependências pesadas carregadas."""
+    codigo += '\nimport sys; print(" ".join(m for m in ("zeep", "lxml", "requests", "httpx") if m in sys.modules))'
+    return subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True).stdout.split()
+
+
+class ImportTest(TestCase):
+    def test_importacao_sem_zeep(self):
+        self.assertEqual(modulos_carregados('import totvsecm.BaseService, totvsecm.AsyncBaseService'), [])
+
+    def test_servico_sem_cliente_nao_carrega_zeep(self):
+        self.assertEqual(modulos_carregados(
+            'from totvsecm.BaseService import BaseService\n'
+            'servico = BaseService("http://ecm", "yoda", "senha", "yoda", numero_solicitacao=1)\n'
+            'servico.descritor'), [])
+
+    def test_nomes_publicos(self):
+        self.assertIs(totvsecm.registry, registry)
+        self.assertIn('mapear_solicitacoes', dir(totvsecm))
+        with self.assertRaises(AttributeError):
+            totvsecm.inexistente
@@ -0,0 +1,137 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import TestCase
+
+from totvsecm.AsyncWorkflowEngineService import AsyncWorkflowEngineService
+from totvsecm.BaseService import BaseService
+from totvsecm.CallExecutor import call_executor
+from totvsecm.ClientRegistry import registry
+from totvsecm.Instrumentation import Medicao, Metricas, instrumentacao
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+class InstrumentacaoTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.ecm.active_states[1] = [1]
+        self.ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+        self.ecm.card_data[1] = {'nome': 'Anakin', 'WKDef': 'selecao_jedi'}
+        self.medicoes = []
+        self.addCleanup(instrumentacao.remover, self.medicoes.append)
+        instrumentacao.adicionar(self.medicoes.append)
+
+    def test_fases_e_tamanhos(self):
+        registry.clear()
+        self.assertEqual(WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda').get_all_active_states(1),
+                         [1])
+        cliente, chamada = self.medicoes
+        self.assertEqual(cliente.operacao, 'criar_cliente')
+        self.assertGreater(cliente.bytes_recebidos, 0)
+
+        self.assertEqual((chamada.servico, chamada.operacao, chamada.requisicoes, chamada.erro),
+                         ('WorkflowEngineService', 'getAllActiveStates', 1, None))
+        self.assertEqual(chamada.bytes_enviados, len(self.ecm.requests[0]))
+        self.assertGreater(chamada.bytes_recebidos, 0)
+        fases = chamada.serializacao + chamada.rede + chamada.interpretacao
+        self.assertLessEqual(fases, chamada.duracao)
+        self.assertGreater(fases, chamada.duracao * 0.9)
+
+    def test_novas_tentativas_medidas_a_parte(self):
+        from totvsecm.tests.test_call_executor import unavailable_server
+
+        server = unavailable_server(2)
+        self.addCleanup(server.__exit__)
+        call_executor.configure(backoff=0.1)
+        self.addCleanup(call_executor.configure)
+        WorkflowEngineService(server.url, 'yoda', 'senha', 1, 'yoda').get_all_active_states(1)
+        chamada = self.medicoes[-1]
+        self.assertEqual((chamada.operacao, chamada.tentativas, chamada.requisicoes, chamada.erro),
+                         ('getAllActiveStates', 3, 3, None))
+        self.assertGreater(chamada.intervalo, 0)
+        fases = chamada.serializacao + chamada.rede + chamada.interpretacao
+        # A serialização de cada tentativa não inclui os intervalos entre as tentativas.
+        self.assertLess(chamada.serializacao, chamada.intervalo)
+        self.assertLessEqual(fases + chamada.intervalo, chamada.duracao)
+        self.assertGreater(fases + chamada.intervalo, chamada.duracao * 0.9)
+
+    def test_espera_pelo_limite(self):
+        # O servidor demora a responder, para que a segunda chamada aguarde a vaga da primeira.
+        server = FakeEcmServer(latency=0.2).__enter__()
+        self.addCleanup(server.__exit__)
+        call_executor.configure(adaptive=True, initial_limit=1, max_limit=1)
+        self.addCleanup(call_executor.configure)
+        service = WorkflowEngineService(server.url, 'yoda', 'senha', 1, 'yoda')
+        service.get_all_active_states(1)
+        self.medicoes.clear()
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(service.get_all_active_states, (1, 2)))
+        primeira, segunda = sorted(self.medicoes, key=lambda medicao: medicao.espera)
+        self.assertLess(primeira.espera, 0.1)
+        self.assertGreater(segunda.espera, 0.1)
+        # A espera pela vaga não é contada como montagem do envelope.
+        self.assertLess(segunda.serializacao, 0.1)
+        self.assertEqual(segunda.tentativas, 1)
+
+    def test_chamadas_de_movimentar(self):
+        metricas = Metricas()
+        with instrumentacao.coletando(metricas):
+            BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1).movimentar(1, 5, nome='Luke')
+        self.assertEqual(metricas.chamadas, 5)
+        self.assertEqual({operacao for _, operacao in metricas.resumo()} - {'criar_cliente'},
+                         {'getAttachments', 'getInstanceCardData', 'getAllActiveStates', 'updateCardData',
+                          'saveAndSendTaskClassic'})
+
+    def test_erro(self):
+        service = WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        self.assertRaises(Exception, service.get_card_value, 'nao-numerico', 'nome')
+        self.assertEqual(self.medicoes[-1].operacao, 'getCardValue')
+        self.assertIsNotNone(self.medicoes[-1].erro)
+
+    def test_stream(self):
+        service = WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        service.start_process_classic('processo', ['yoda'], {}, '', {'a.bin': {'description': 'A',
+                                                                               'file': BytesIO(b'a' * 1000)}})
+        self.assertEqual(self.medicoes[-1].operacao, 'startProcessClassic')
+        self.assertEqual(self.medicoes[-1].bytes_enviados, len(self.ecm.requests[-1]))
+
+    def test_assincrono(self):
+        async def consultar():
+            service = AsyncWorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+            try:
+                return await asyncio.gather(service.get_all_active_states(1), service.get_instance_card_items(1))
+            finally:
+                await registry.aclose()
+
+        asyncio.run(consultar())
+        chamadas = sorted((medicao for medicao in self.medicoes if medicao.operacao != 'criar_cliente'),
+                          key=lambda medicao: medicao.operacao)
+        self.assertEqual([(medicao.operacao, medicao.requisicoes) for medicao in chamadas],
+                         [('getAllActiveStates', 1), ('getInstanceCardData', 1)])
+
+    def test_desativada(self):
+        instrumentacao.remover(self.medicoes.append)
+        self.assertFalse(instrumentacao.ativo)
+        WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda').get_all_active_states(1)
+        instrumentacao.adicionar(self.medicoes.append)
+        self.assertEqual(self.medicoes, [])
+
+
+class MetricasTest(TestCase):
+    def test_prometheus(self):
+        metricas = Metricas()
+        metricas(Medicao('WorkflowEngineService', 'getHistories', 0.5, 0.1, 0.3, 0.1, 100, 2000, 1, None))
+        metricas(Medicao('WorkflowEngineService', 'getHistories', 0.25, None, None, None, 0, 0, 0, Exception()))
+        texto = metricas.prometheus()
+        rotulos = 'servico="WorkflowEngineService",operacao="getHistories"'
+        self.assertIn('# TYPE totvsecm_chamadas_total counter\n', texto)
+        self.assertIn('totvsecm_chamadas_total{%s} 2\n' % rotulos, texto)
+        self.assertIn('totvsecm_erros_total{%s} 1\n' % rotulos, texto)
+        self.assertIn('totvsecm_duracao_segundos_total{%s} 0.75\n' % rotulos, texto)
+        self.assertIn('totvsecm_fase_segundos_total{%s,fase="rede"} 0.3\n' % rotulos, texto)
+        self.assertIn('totvsecm_bytes_recebidos_total{%s} 2000\n' % rotulos, texto)
+        self.assertIn('totvsecm_fase_segundos_total{%s,fase="espera"} 0.0\n' % rotulos, texto)
+        self.assertIn('totvsecm_tentativas_total{%s} 2\n' % rotulos, texto)
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from zeep.exceptions import Fault
+
+from totvsecm.AsyncBaseService import AsyncBaseService
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import registry
+from totvsecm.RawDecoder import decode_card_data
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+
+
+def preparar(ecm):
+    """Cria no ECM simulado uma solicitação com histórico e formulário variados."""
+    ecm.histories[1] = history([(5, 'yoda', 'Aprovado'), (7, 'Pool:Role:jedi', None),
+                                (9, 'obiwan', '  espaços  & <símbolos>\nem várias linhas  ')]) + [
+        {'movementSequence': 4, 'tasks': [
+            {'choosedSequence': 11, 'colleagueId': 'anakin', 'historCompleteColleague': 'Anakin',
+             'taskCompletionDate': datetime(2020, 3, 1, tzinfo=timezone(timedelta(hours=-3))),
+             'taskCompletionHour': 59},
+            {'choosedSequence': 12, 'colleagueId': 'padme', 'historCompleteColleague': 'Padmé\n'},
+        ]},
+    ]
+    ecm.attachments[1] = [{'attachmentSequence': 1, 'documentId': 77}]
+    ecm.card_data[1] = {'nome': 'Anakin & Padmé', 'vazio': '', 'espacos': '  a  ', 'WKDef': 'selecao_jedi'}
+
+
+class RawDecoderTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        preparar(self.server.ecm)
+
+    def servico(self, decodificacao_rapida):
+        return BaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1,
+                           decodificacao_rapida=decodificacao_rapida)
+
+    def test_historico_identico(self):
+        esperado = self.servico(False).historico_tratado
+        obtido = self.servico(True).historico_tratado
+        self.assertEqual(len(obtido), 5)
+        self.assertEqual(obtido, esperado)
+        self.assertEqual([type(v) for r in obtido for v in r.values()],
+                         [type(v) for r in esperado for v in r.values()])
+        self.assertEqual([r['data_hora'].utcoffset() for r in obtido if r['data_hora']],
+                         [r['data_hora'].utcoffset() for r in esperado if r['data_hora']])
+
+    def test_formulario_identico(self):
+        lento, rapido = self.servico(False), self.servico(True)
+        esperado, obtido = lento.carregar_solicitacao(), rapido.carregar_solicitacao()
+        self.assertEqual([list(item['item']) for item in obtido], [list(item['item']) for item in esperado])
+        for atributo in ('numero_ficha', 'id_processo', 'nome', 'vazio', 'espacos'):
+            self.assertEqual(getattr(rapido, atributo), getattr(lento, atributo))
+        self.assertEqual(dict(rapido.formulario), dict(lento.formulario))
+
+    def test_falha_do_servidor(self):
+        def falhar(params):
+            raise ValueError('Solicitação inexistente')
+        self.server.ecm.getHistories = falhar
+        with self.assertRaisesRegex(Fault, 'Solicitação inexistente'):
+            self.servico(True).historico_tratado
+
+
+class DecodeCardDataTest(TestCase):
+    def resposta(self, wrapper):
+        return (b'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+                b'<ns2:getInstanceCardDataResponse xmlns:ns2="http://ws.workflow.ecm.technology.totvs.com/">'
+                b'<%s><item><item>nome</item><item>Anakin</item></item><item><item>vazio</item><item/></item></%s>'
+                b'</ns2:getInstanceCardDataResponse></soap:Body></soap:Envelope>' % (wrapper, wrapper))
+
+    def test_elemento_do_resultado_com_outros_nomes(self):
+        for wrapper in (b'result', b'return', b'item'):
+            self.assertEqual(decode_card_data(self.resposta(wrapper)),
+                             [{'item': ['nome', 'Anakin']}, {'item': ['vazio', None]}], wrapper)
+
+
+class AsyncRawDecoderTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        preparar(self.server.ecm)
+
+    async def asyncTearDown(self):
+        await registry.aclose()
+
+    async def test_historico_e_formulario(self):
+        lento = AsyncBaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1)
+        rapido = AsyncBaseService(self.server.url, 'yoda', 'senha', 'yoda', numero_solicitacao=1,
+                                  decodificacao_rapida=True)
+        self.assertEqual(await rapido.historico_tratado, await lento.historico_tratado)
+        self.assertEqual([list(item['item']) for item in await rapido.carregar_solicitacao()],
+                         [list(item['item']) for item in await lento.carregar_solicitacao()])
@@ -0,0 +1,74 @@
+import json
+import pickle
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import TestCase
+
+from totvsecm.BaseService import BaseService
+from totvsecm.Records import RegistroAnexo, RegistroHistorico
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+
+
+def tarefa(data, hora, texto='Mestre Yoda\nAprovado'):
+    return SimpleNamespace(taskCompletionDate=data, taskCompletionHour=hora, choosedSequence='5',
+                           taskObservation='Ok', colleagueId='yoda', historCompleteColleague=texto)
+
+
+class RegistroHistoricoTest(TestCase):
+    def test_compativel_com_dicionario(self):
+        registro = RegistroHistorico.da_tarefa(tarefa(datetime(2020, 1, 2), 3600 * 9 + 60 * 30))
+        self.assertEqual(registro, {
+            'data_hora': datetime(2020, 1, 2, 9, 30),
+            'data_hora_formatada': '02/01/2020 09:30',
+            'proxima_atividade': 5,
+            'observacao': 'Ok',
+            'colleague_id': 'yoda',
+            'texto': 'Mestre Yoda\nAprovado',
+            'nome_responsavel': 'Mestre Yoda',
+        })
+        self.assertEqual(registro['nome_responsavel'], registro.nome_responsavel)
+        self.assertRaises(KeyError, registro.__getitem__, 'inexistente')
+        self.assertFalse(hasattr(registro, '__dict__'))
+
+    def test_tarefa_nao_finalizada(self):
+        registro = RegistroHistorico.da_tarefa(tarefa(None, 0))
+        self.assertIsNone(registro.data_hora)
+        self.assertEqual(registro.data_hora_formatada, u'Tarefa não finalizada')
+
+    def test_pickle(self):
+        registro = RegistroHistorico.da_tarefa(tarefa(datetime(2020, 1, 2), 0))
+        self.assertEqual(pickle.loads(pickle.dumps(registro)), registro)
+        anexo = RegistroAnexo('yoda', 10, 1000, '/tmp/a.pdf')
+        self.assertEqual(pickle.loads(pickle.dumps(anexo)), anexo)
+
+    def test_anexo_sem_caminho(self):
+        self.assertEqual(dict(RegistroAnexo('yoda', 10, 1000)), {'colleague_id': 'yoda', 'document_id': 10,
+                                                                   'version': 1000})
+        self.assertIn('caminho', RegistroAnexo('yoda', 10, 1000, '/tmp/a.pdf'))
+
+
+class HistoricoColunarTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        for numero in range(1, 6):
+            self.server.ecm.histories[numero] = history([(5, 'yoda', 'Aprovado'), (numero, 'obiwan', None)])
+        self.service = BaseService(self.server.url, 'yoda', 'senha', 'yoda', concorrencia=3)
+
+    def test_colunas_na_ordem_das_solicitacoes(self):
+        colunas = self.service.historicos_colunares([3, 1, 5])
+        self.assertEqual(len(colunas), 6)
+        self.assertEqual(list(colunas.numero_solicitacao), [3, 3, 1, 1, 5, 5])
+        self.assertEqual(list(colunas.proxima_atividade), [5, 3, 5, 1, 5, 5])
+        self.assertIs(colunas.colleague_id[0], colunas.colleague_id[2])
+
+        self.service.numero_solicitacao = 1
+        self.assertEqual(list(colunas)[2:4], self.service.historico_tratado)
+        self.assertEqual(list(colunas)[2:4], self.service.registros_historico)
+
+    def test_historico_tratado_em_dicionarios(self):
+        self.service.numero_solicitacao = 1
+        historico = self.service.historico_tratado
+        self.assertIs(type(historico[0]), dict)
+        self.assertEqual(json.loads(json.dumps(historico, default=str))[0]['colleague_id'], 'yoda')
+        self.assertIsInstance(self.service.registros_historico[0], RegistroHistorico)
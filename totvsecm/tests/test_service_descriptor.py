@@ -0,0 +1,53 @@
+import pickle
+from unittest import TestCase
+
+from totvsecm.BaseService import BaseService
+from totvsecm.ClientRegistry import WSDL_ONLINE, registry
+from totvsecm.ServiceDescriptor import DescritorServico, ResultadoSolicitacao, mapear_solicitacoes
+from totvsecm.tests.fake_ecm import FakeEcmServer, history
+
+
+def contar_tarefas(servico):
+    """Função executada nos processos do pool."""
+    if servico.numero_solicitacao == 13:
+        raise ValueError('Solicitação 13')
+    return len(servico.historico_tratado), servico.atividade_atual
+
+
+class DescritorServicoTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        for numero in range(1, 21):
+            self.server.ecm.active_states[numero] = [numero]
+            self.server.ecm.histories[numero] = history([(1, 'yoda', 'Tarefa')] * numero)
+
+    def test_pickle(self):
+        servico = BaseService(self.server.url, 'yoda', 'senha', 'luke', id_empresa=2, numero_solicitacao=5,
+                              decodificacao_rapida=True)
+        descritor = pickle.loads(pickle.dumps(servico.descritor))
+        self.assertEqual(descritor, servico.descritor)
+        self.assertNotIn('senha', repr(descritor))
+
+        recriado = descritor.servico()
+        self.assertEqual((recriado.url_servidor, recriado.numero_solicitacao, recriado.decodificacao_rapida),
+                         (self.server.url, 5, True))
+        self.assertEqual(recriado.descritor, descritor)
+        self.assertEqual(descritor.servico(numero_solicitacao=7).atividade_atual, [7])
+
+    def test_configuracao_do_registro(self):
+        registry.configure(max_connections=4)
+        self.addCleanup(registry.configure)
+        descritor = DescritorServico(self.server.url, 'yoda', 'senha', 'yoda')
+        self.assertEqual(descritor.configuracao_registro['max_connections'], 4)
+        self.assertEqual(descritor.configuracao_registro['wsdl_mode'], WSDL_ONLINE)
+
+    def test_mapear_solicitacoes(self):
+        descritor = BaseService(self.server.url, 'yoda', 'senha', 'yoda').descritor
+        resultados = list(mapear_solicitacoes(descritor, contar_tarefas, range(1, 21), max_workers=2, lote=3))
+
+        self.assertEqual([resultado.numero_solicitacao for resultado in resultados], list(range(1, 21)))
+        self.assertEqual(resultados[0], ResultadoSolicitacao(1, (1, [1]), None))
+        self.assertEqual(resultados[19], ResultadoSolicitacao(20, (20, [20]), None))
+        self.assertIsInstance(resultados[12].erro, ValueError)
+        self.assertEqual(len([resultado for resultado in resultados if resultado.erro]), 1)
@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from unittest import TestCase
+
+from totvsecm.DocumentService import DocumentService
+from totvsecm.SingleFlight import SingleFlight, single_flight
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcm, FakeEcmServer, history
+
+
+class SlowEcm(FakeEcm):
+    """ECM simulado que demora a responder, para que as consultas das várias threads sejam simultâneas."""
+
+    def respond(self, service_name, body):
+        time.sleep(0.3)
+        return super().respond(service_name, body)
+
+
+class SingleFlightTest(TestCase):
+    def test_consultas_simultaneas_compartilham_a_chamada(self):
+        flight = SingleFlight()
+        release = Event()
+        calls = []
+
+        def consulta():
+            calls.append(1)
+            release.wait(5)
+            return ['resultado']
+
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(flight.do, 'chave', consulta) for _ in range(8)]
+            time.sleep(0.2)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [['resultado']] * 8)
+        # Cada thread recebe o próprio resultado, que pode ser alterado sem afetar os demais.
+        self.assertEqual(len({id(result) for result in results}), 8)
+
+    def test_excecao_compartilhada(self):
+        flight = SingleFlight()
+        release = Event()
+
+        def consulta():
+            release.wait(5)
+            raise ValueError('falhou')
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(flight.do, 'chave', consulta) for _ in range(4)]
+            time.sleep(0.2)
+            release.set()
+            for future in futures:
+                self.assertRaisesRegex(ValueError, 'falhou', future.result)
+
+        # A falha não é mantida: a próxima consulta é executada novamente.
+        self.assertEqual(flight.do('chave', lambda: 'ok'), 'ok')
+
+    def test_consultas_sequenciais_sem_ttl(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do('chave', lambda: 1), 1)
+        self.assertEqual(flight.do('chave', lambda: 2), 2)
+
+    def test_ttl(self):
+        flight = SingleFlight(ttl=0.2)
+        self.assertEqual(flight.do('chave', lambda: 1), 1)
+        self.assertEqual(flight.do('chave', lambda: 2), 1)
+        self.assertEqual(flight.do('outra', lambda: 3), 3)
+        time.sleep(0.3)
+        self.assertEqual(flight.do('chave', lambda: 4), 4)
+
+    def test_resultado_mantido_copiado(self):
+        flight = SingleFlight(ttl=60)
+        flight.do('chave', lambda: ['resultado']).append('alterado')
+        result = flight.do('chave', lambda: None)
+        self.assertEqual(result, ['resultado'])
+        result.append('alterado')
+        self.assertEqual(flight.do('chave', lambda: None), ['resultado'])
+
+    def test_invalidate(self):
+        flight = SingleFlight(ttl=60)
+        flight.do(('servidor', 'a'), lambda: 1)
+        flight.do(('outro', 'a'), lambda: 2)
+        flight.invalidate('servidor')
+        self.assertEqual(flight.do(('servidor', 'a'), lambda: 3), 3)
+        self.assertEqual(flight.do(('outro', 'a'), lambda: 4), 2)
+
+    def test_invalidate_durante_a_consulta(self):
+        flight = SingleFlight(ttl=60)
+        started, release = Event(), Event()
+
+        def consulta():
+            started.set()
+            release.wait(5)
+            return 'antigo'
+
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(flight.do, ('servidor', 'a'), consulta)
+            started.wait(5)
+            flight.invalidate('servidor')
+            # A consulta seguinte não aguarda a consulta iniciada antes da alteração.
+            self.assertEqual(flight.do(('servidor', 'a'), lambda: 'novo'), 'novo')
+            release.set()
+            self.assertEqual(future.result(), 'antigo')
+        self.assertEqual(flight.do(('servidor', 'a'), lambda: 'outro'), 'novo')
+
+    def test_desabilitado(self):
+        flight = SingleFlight(enabled=False, ttl=10)
+        self.assertEqual(flight.do('chave', lambda: 1), 1)
+        self.assertEqual(flight.do('chave', lambda: 2), 2)
+
+
+class ServiceSingleFlightTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer(SlowEcm()).__enter__()
+        self.addCleanup(self.server.__exit__)
+        ecm = self.server.ecm
+        ecm.active_states[77] = [5]
+        ecm.active_states[78] = [9]
+        ecm.histories[77] = history([(5, 'yoda', 'Iniciada')])
+        ecm.documents[10] = (1000, 'documento.pdf', b'')
+
+    def consultar(self, *funcoes):
+        with ThreadPoolExecutor(len(funcoes)) as executor:
+            return list(executor.map(lambda funcao: funcao(), funcoes))
+
+    def workflow(self, user='yoda'):
+        return WorkflowEngineService(self.server.url, user, 'senha', 1, user)
+
+    def test_mesma_solicitacao(self):
+        results = self.consultar(*[lambda: self.workflow().get_all_active_states(77)] * 8)
+        self.assertEqual(results, [[5]] * 8)
+        self.assertEqual(self.server.ecm.calls, ['getAllActiveStates'])
+
+    def test_solicitacoes_e_usuarios_diferentes(self):
+        results = self.consultar(lambda: self.workflow().get_all_active_states(77),
+                                 lambda: self.workflow().get_all_active_states(78),
+                                 lambda: self.workflow('luke').get_all_active_states(77))
+        self.assertEqual(results, [[5], [9], [5]])
+        self.assertEqual(len(self.server.ecm.calls), 3)
+
+    def test_historico_decodificado_separado(self):
+        results = self.consultar(*[lambda: self.workflow().get_histories(77)] * 4,
+                                 *[lambda: self.workflow().get_history_records(77)] * 4)
+        self.assertEqual(len(results[0]), 1)
+        self.assertEqual(results[4][0].colleague_id, 'yoda')
+        self.assertEqual(self.server.ecm.calls, ['getHistories'] * 2)
+
+    def test_documento(self):
+        service = DocumentService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        results = self.consultar(*[lambda: service.get_active_document_info(10, 'yoda')] * 4)
+        self.assertEqual(results, [{'phisical_file': 'documento.pdf', 'version': 1000}] * 4)
+        self.assertEqual(self.server.ecm.calls, ['getActiveDocument'])
+
+    def test_ttl(self):
+        single_flight.configure(ttl=60)
+        self.addCleanup(single_flight.configure)
+        self.workflow().get_all_active_states(77)
+        self.workflow().get_all_active_states(77)
+        self.assertEqual(self.server.ecm.calls, ['getAllActiveStates'])
+
+    def test_leitura_apos_alteracao(self):
+        single_flight.configure(ttl=60)
+        self.addCleanup(single_flight.configure)
+        workflow = self.workflow()
+        self.assertEqual(workflow.get_all_active_states(77), [5])
+        workflow.save_and_send_task_classic(77, 9, ['yoda'], 'Enviada', {})
+        self.assertEqual(workflow.get_all_active_states(77), [9])
+        self.assertEqual(self.server.ecm.calls, ['getAllActiveStates', 'saveAndSendTaskClassic', 'getAllActiveStates'])
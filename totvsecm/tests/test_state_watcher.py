@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from totvsecm.RateLimiter import rate_limiters
+from totvsecm.StateWatcher import ATIVIDADE_ALTERADA, ERRO, FINALIZADO, Evento, StateWatcher
+from totvsecm.tests.fake_ecm import FakeEcm, FakeEcmServer
+
+
+class FlakyEcm(FakeEcm):
+    """ECM simulado que falha na primeira consulta de cada solicitação."""
+
+    def __init__(self):
+        super().__init__()
+        self.falhas = set()
+
+    def getAllActiveStates(self, params):
+        numero = int(params['processInstanceId'].text)
+        if numero not in self.falhas:
+            self.falhas.add(numero)
+            raise Exception('Servidor ocupado')
+        return super().getAllActiveStates(params)
+
+
+class StateWatcherTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.ecm = self.server.ecm
+        self.ecm.active_states.update({1: [5], 2: [5], 3: []})
+
+    def watcher(self, numeros, **kwargs):
+        kwargs.setdefault('intervalo_minimo', 0.05)
+        kwargs.setdefault('intervalo_maximo', 0.2)
+        return StateWatcher(self.server.url, 'yoda', 'senha', 'yoda', numeros, **kwargs)
+
+    def test_eventos(self):
+        watcher = self.watcher([1, 2, 3])
+        eventos = []
+        for evento in watcher.observar(timeout=10):
+            eventos.append(evento)
+            if len(eventos) == 3:
+                # Após a primeira consulta de todas, a solicitação 1 avança e a 2 é finalizada.
+                self.ecm.active_states[1] = [7]
+            elif evento == Evento(1, ATIVIDADE_ALTERADA, [5], [7]):
+                self.ecm.active_states[2] = []
+            elif evento.tipo == FINALIZADO and evento.anterior is not None:
+                watcher.parar()
+
+        self.assertEqual(sorted(eventos[:3]), [Evento(1, ATIVIDADE_ALTERADA, None, [5]),
+                                               Evento(2, ATIVIDADE_ALTERADA, None, [5]),
+                                               Evento(3, FINALIZADO, None, [-1])])
+        self.assertEqual(eventos[3:], [Evento(1, ATIVIDADE_ALTERADA, [5], [7]), Evento(2, FINALIZADO, [5], [-1])])
+        self.assertEqual(watcher.acompanhadas, {1: [7]})
+
+    def test_intervalo_cresce_sem_mudancas(self):
+        watcher = self.watcher([1], intervalo_minimo=0.05, intervalo_maximo=0.4)
+        self.assertEqual(list(watcher.observar(timeout=1)), [Evento(1, ATIVIDADE_ALTERADA, None, [5])])
+        # Intervalos de aproximadamente 0.1, 0.2 e 0.4 segundos, em vez de 20 consultas no intervalo mínimo.
+        self.assertLessEqual(self.ecm.calls.count('getAllActiveStates'), 7)
+
+    def test_callback_e_parar(self):
+        watcher = self.watcher([1, 3])
+        eventos = []
+
+        def callback(evento):
+            eventos.append(evento)
+            if evento.numero_solicitacao == 1:
+                watcher.parar()
+
+        watcher.executar(callback, timeout=10)
+        self.assertIn(Evento(1, ATIVIDADE_ALTERADA, None, [5]), eventos)
+
+    def test_parar_antes_de_observar(self):
+        watcher = self.watcher([1])
+        watcher.parar()
+        self.assertEqual(list(watcher.observar(timeout=10)), [])
+        self.assertNotIn('getAllActiveStates', self.ecm.calls)
+
+        watcher.reiniciar()
+        self.assertEqual(list(watcher.observar(timeout=0.2)), [Evento(1, ATIVIDADE_ALTERADA, None, [5])])
+
+    def test_parar_antes_de_aguardar(self):
+        watcher = self.watcher([1])
+
+        async def observar():
+            eventos = watcher.aobservar(timeout=10)
+            # A observação é interrompida mesmo que parar seja chamado antes do início da thread de consultas.
+            watcher.parar()
+            return [evento async for evento in eventos]
+
+        inicio = time.monotonic()
+        self.assertEqual(asyncio.run(observar()), [])
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertNotIn('getAllActiveStates', self.ecm.calls)
+
+    def test_falhas(self):
+        self.server = FakeEcmServer(FlakyEcm()).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.server.ecm.active_states[1] = []
+        eventos = list(self.watcher([1]).observar(timeout=10))
+        self.assertEqual([evento.tipo for evento in eventos], [ERRO, FINALIZADO])
+        self.assertIn('Servidor ocupado', str(eventos[0].erro))
+
+    def test_assincrono(self):
+        async def observar():
+            return [evento async for evento in self.watcher([2, 3]).aobservar(timeout=10)
+                    if evento.tipo == FINALIZADO or self.ecm.active_states.update({2: []})]
+
+        eventos = asyncio.run(observar())
+        self.assertEqual(sorted(eventos), [Evento(2, FINALIZADO, [5], [-1]), Evento(3, FINALIZADO, None, [-1])])
+
+    def test_assincrono_pode_ser_repetido(self):
+        watcher = self.watcher([1])
+
+        async def primeiro_evento():
+            async for evento in watcher.aobservar(timeout=10):
+                return evento
+
+        self.assertEqual(asyncio.run(primeiro_evento()), Evento(1, ATIVIDADE_ALTERADA, None, [5]))
+        # O fim da primeira observação não impede a segunda.
+        self.ecm.active_states[1] = [7]
+        self.assertEqual(asyncio.run(primeiro_evento()), Evento(1, ATIVIDADE_ALTERADA, [5], [7]))
+
+    def test_adicionar_durante_observacao(self):
+        watcher = self.watcher([1], intervalo_minimo=5, intervalo_maximo=5)
+        threading.Timer(0.3, watcher.adicionar, [[3]]).start()
+        eventos = []
+        inicio = time.monotonic()
+        for evento in watcher.observar(timeout=10):
+            eventos.append(evento)
+            if evento.numero_solicitacao == 3:
+                watcher.parar()
+
+        # A solicitação incluída é consultada sem aguardar o fim do intervalo da solicitação 1.
+        self.assertEqual(eventos, [Evento(1, ATIVIDADE_ALTERADA, None, [5]), Evento(3, FINALIZADO, None, [-1])])
+        self.assertLess(time.monotonic() - inicio, 3)
+
+    def test_encerrar_assincrono_libera_consultas(self):
+        watcher = self.watcher([1], intervalo_minimo=5, intervalo_maximo=5)
+
+        async def primeiro_evento():
+            async for evento in watcher.aobservar(timeout=10):
+                return evento
+
+        asyncio.run(primeiro_evento())
+        # A thread de consultas é encerrada sem aguardar o fim do intervalo.
+        inicio = time.monotonic()
+        while any(thread.name == 'StateWatcher' for thread in threading.enumerate()):
+            self.assertLess(time.monotonic() - inicio, 3)
+            time.sleep(0.05)
+
+    def test_limitador_compartilhado_por_servidor(self):
+        self.addCleanup(rate_limiters.clear)
+        watcher = self.watcher([1], limite_por_segundo=10)
+        self.assertIs(watcher.rate_limiter, rate_limiters.get(self.server.url, 10))
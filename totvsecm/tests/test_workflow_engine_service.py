@@ -0,0 +1,90 @@
+
+import base64
+import os
+from io import BytesIO
+from tempfile import NamedTemporaryFile
+from unittest import TestCase
+
+from lxml import etree
+
+from totvsecm.ClientRegistry import registry
+from totvsecm.WorkflowEngineService import WorkflowEngineService
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+
+class StartProcessClassicTest(TestCase):
+    def setUp(self):
+        self.server = FakeEcmServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.service = WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+
+    def enviados(self):
+        """Retorna o tamanho e o conteúdo de cada anexo recebido pelo servidor, pelo nome do arquivo."""
+        envelope = etree.fromstring(self.server.ecm.requests[-1])
+        return {
+            attachment.findtext('fileName'): (int(attachment.findtext('fileSize')),
+                                              base64.b64decode(attachment.findtext('filecontent')))
+            for attachment in envelope.iter('attachments') if attachment.find('fileName') is not None
+        }
+
+    def test_anexos_em_stream(self):
+        content = os.urandom(1024 * 1024 + 2)
+        with NamedTemporaryFile() as fh:
+            fh.write(content)
+            fh.flush()
+            result = self.service.start_process_classic('processo', ['yoda'], {'nome': 'Anakin'}, 'Iniciado', {
+                'caminho.bin': {'description': 'Por caminho', 'path': fh.name},
+                'objeto.bin': {'description': 'Por objeto', 'file': BytesIO(b'objeto')},
+                'memoria.bin': {'description': 'Em memória', 'content': b'memoria'},
+            })
+
+        self.assertEqual(result[0]['key'], 'iProcess')
+        self.assertEqual(self.enviados(), {
+            'caminho.bin': (len(content), content),
+            'objeto.bin': (6, b'objeto'),
+            'memoria.bin': (7, b'memoria'),
+        })
+
+
+class MtomStartProcessClassicTest(TestCase):
+    def setUp(self):
+        registry.configure(mtom=True)
+        self.addCleanup(registry.configure)
+        self.server = FakeEcmServer(mtom=True).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.service = WorkflowEngineService(self.server.url, 'yoda', 'senha', 1, 'yoda')
+        self.anexos = {
+            'objeto.bin': {'description': 'Por objeto', 'file': BytesIO(b'objeto')},
+            'memoria.bin': {'description': 'Em memória', 'content': os.urandom(300 * 1024)},
+        }
+
+    def enviados(self):
+        envelope = etree.fromstring(self.server.ecm.requests[-1])
+        return {attachment.findtext('fileName'): base64.b64decode(attachment.findtext('filecontent'))
+                for attachment in envelope.iter('attachments') if attachment.find('fileName') is not None}
+
+    def test_anexos_em_partes_binarias(self):
+        result = self.service.start_process_classic('processo', ['yoda'], {'nome': 'Anakin'}, 'Iniciado', self.anexos)
+        self.assertEqual(result[0]['key'], 'iProcess')
+        self.assertEqual(self.server.mtom_requests, 1)
+        self.assertEqual(self.enviados(), {'objeto.bin': b'objeto',
+                                           'memoria.bin': self.anexos['memoria.bin']['content']})
+        # Sem a codificação em base64, o corpo enviado é menor que o conteúdo codificado.
+        self.assertLess(self.server.bytes_received, 300 * 1024 * 4 // 3)
+
+    def test_servidor_sem_suporte(self):
+        self.server.mtom = False
+        registry.disable_mtom(self.service.client)
+        self.service.start_process_classic('processo', ['yoda'], {}, 'Iniciado', self.anexos)
+        self.assertEqual(self.server.mtom_requests, 0)
+        self.assertEqual(self.enviados()['objeto.bin'], b'objeto')
+
+    def test_recusa_reenvia_em_base64(self):
+        self.assertTrue(registry.supports_mtom(self.service.client))
+        # O servidor anuncia o suporte no WSDL, mas recusa as requisições MTOM/XOP.
+        self.server.mtom = False
+        self.service.start_process_classic('processo', ['yoda'], {}, 'Iniciado', self.anexos)
+        self.assertEqual(self.server.ecm.calls, ['startProcessClassic'])
+        self.assertEqual(self.enviados(), {'objeto.bin': b'objeto',
+                                           'memoria.bin': self.anexos['memoria.bin']['content']})
+        self.assertFalse(registry.supports_mtom(self.service.client))
@@ -0,0 +1,83 @@
+
+import json
+import os
+import socket
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from totvsecm.ClientRegistry import WSDL_BUNDLED, ClientRegistry
+from totvsecm.WsdlCache import SERVER_PLACEHOLDER, BundledWsdlCache, WsdlCache, gerar_snapshot, main
+from totvsecm.tests.fake_ecm import FakeEcmServer
+
+URL = 'http://ecm/webdesk/WorkflowEngineService?wsdl'
+
+
+class WsdlCacheTest(TestCase):
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.path = self.tempdir.name
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_documento_persistido(self):
+        WsdlCache(self.path).add(URL, b'<definitions/>')
+        self.assertEqual(WsdlCache(self.path).get(URL), b'<definitions/>')
+        self.assertIsNone(WsdlCache(self.path).get('http://ecm/webdesk/CardService?wsdl'))
+
+    def test_documento_expirado(self):
+        cache = WsdlCache(self.path, timeout=60)
+        cache.add(URL, b'<definitions/>')
+        expirado = time.time() - 120
+        os.utime(os.path.join(cache.path, os.listdir(cache.path)[0]), (expirado, expirado))
+        self.assertIsNone(cache.get(URL))
+
+    def test_versao_diferente_invalida(self):
+        WsdlCache(self.path, version='1').add(URL, b'<definitions/>')
+        self.assertIsNone(WsdlCache(self.path, version='2').get(URL))
+
+    def test_snapshot_empacotado(self):
+        with open(os.path.join(self.path, 'wfs.xml'), 'w') as fh:
+            fh.write('<address location="%s/webdesk/WorkflowEngineService"/>' % SERVER_PLACEHOLDER)
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as fh:
+            json.dump({'/webdesk/WorkflowEngineService?wsdl': 'wfs.xml'}, fh)
+
+        cache = BundledWsdlCache('http://ecm/', self.path)
+        self.assertEqual(cache.get(URL), b'<address location="http://ecm/webdesk/WorkflowEngineService"/>')
+        with self.assertRaises(FileNotFoundError):
+            cache.get('http://outro/webdesk/WorkflowEngineService?wsdl')
+        with self.assertRaises(FileNotFoundError):
+            cache.get('http://ecm/webdesk/CardService?wsdl')
+
+    def test_snapshot_ausente(self):
+        with self.assertRaisesRegex(FileNotFoundError, 'snapshot'):
+            BundledWsdlCache('http://ecm/', os.path.join(self.path, 'inexistente'))
+
+    def test_cliente_sem_acesso_a_rede(self):
+        with FakeEcmServer() as server:
+            gerar_snapshot(server.url, self.path)
+
+        registry = ClientRegistry()
+        registry.configure(wsdl_mode=WSDL_BUNDLED, bundled_dir=self.path)
+        self.addCleanup(registry.clear)
+
+        def conectar(*args):
+            raise AssertionError('Conexão de rede no modo empacotado.')
+        with patch.object(socket.socket, 'connect', conectar):
+            client = registry.get('http://ecm.offline', 'WorkflowEngineService')
+        self.assertEqual(client.service._binding_options['address'],
+                         'http://ecm.offline/webdesk/WorkflowEngineService')
+
+    def test_linha_de_comando(self):
+        with redirect_stderr(StringIO()), self.assertRaises(SystemExit) as contexto:
+            main([])
+        self.assertEqual(contexto.exception.code, 2)
+
+        with FakeEcmServer() as server, redirect_stdout(StringIO()) as saida:
+            self.assertEqual(main([server.url, self.path]), 0)
+        self.assertIn('documentos gravados', saida.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'manifest.json')))